@@ -23,3 +23,4 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from codeanalyzer import CodeAnalyzer
+from pathexplorer import PathExplorer
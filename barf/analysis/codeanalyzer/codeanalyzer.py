@@ -29,6 +29,7 @@ import barf.core.smt.smtsymbol as smtsymbol
 
 from barf.core.reil import ReilImmediateOperand
 from barf.core.reil import ReilRegisterOperand
+from barf.core.smt.smttranslator import SmtTranslator
 
 logger = logging.getLogger(__name__)
 
@@ -54,6 +55,30 @@ class CodeAnalyzer(object):
         """
         self._translator.reset()    # It also resets the solver.
 
+    def clone(self):
+        """Return a new analyzer for the same architecture with its own
+        solver (of the same type) and translator. The query cache of
+        the solver, if any, is shared.
+        """
+        solver = type(self._solver)(simplify=self._solver.simplify, cache=self._solver.cache)
+
+        translator = SmtTranslator(solver, self._arch_info.address_size)
+        translator.set_arch_alias_mapper(self._arch_info.alias_mapper)
+        translator.set_arch_registers_size(self._arch_info.registers_size)
+
+        return CodeAnalyzer(solver, translator, self._arch_info)
+
+    def push(self):
+        """Save current state of the analyzer. Instructions and
+        constraints added from now on are discarded by *pop*.
+        """
+        self._translator.push()     # It also pushes a solver scope.
+
+    def pop(self):
+        """Restore the state saved by the last *push*.
+        """
+        self._translator.pop()      # It also pops a solver scope.
+
     def get_operand_expr(self, operand, mode="post"):
         """Return a smt bit vector that represents a register (architectural or
         temporal).
@@ -0,0 +1,209 @@
+# Copyright (c) 2014, Fundacion Dr. Manuel Sadosky
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import logging
+
+from barf.core.reil import ReilMnemonic
+
+logger = logging.getLogger(__name__)
+
+
+class PathExplorer(object):
+
+    """Explores the paths of a control flow graph and checks their
+    satisfiability using a code analyzer. Paths are walked depth-first:
+    the instructions of a basic block are added once, inside a solver
+    scope, for all the paths that share it, and paths are pruned as soon
+    as a prefix is unsatisfiable.
+    """
+
+    def __init__(self, code_analyzer, cfg):
+
+        # A code analyzer instance.
+        self._analyzer = code_analyzer
+
+        # Control flow graph to explore.
+        self._cfg = cfg
+
+        # Basic blocks accessed by address.
+        self._bbs = dict([(bb.address, bb) for bb in cfg.basic_blocks])
+
+    def explore(self, start_address, end_address, values=None):
+        """Yield the satisfiable paths (lists of basic blocks) from
+        *start_address* to the basic block that contains *end_address*,
+        together with their models. The instructions of the last basic
+        block are not added, so models describe the state on entering
+        it.
+
+        *values* is a function that takes the code analyzer and returns
+        a dictionary of expressions; the model of each path maps its
+        keys to the values of the expressions (the model is None if
+        *values* is not given). While the generator is suspended, the
+        analyzer holds the constraints of the yielded path.
+        """
+        bb_start = self._find_basic_block(start_address)
+        bb_end = self._find_basic_block(end_address)
+
+        if not bb_start or not bb_end:
+            return
+
+        # Number of open scopes. They are all popped when the generator
+        # finishes or is closed.
+        scopes = 0
+
+        try:
+            path = [bb_start]
+
+            if bb_start == bb_end:
+                if self._analyzer.check() == "sat":
+                    yield list(path), self._get_model(values)
+
+                return
+
+            self._analyzer.push()
+            scopes += 1
+
+            cond = self._add_basic_block(bb_start, start_address)
+
+            stack = [(cond, self._successors(bb_start, path))]
+
+            while stack:
+                cond, successors = stack[-1]
+
+                for bb_next, goal in successors:
+                    self._analyzer.push()
+                    scopes += 1
+
+                    # Add branch condition goal constraint.
+                    if cond is not None and goal is not None:
+                        self._analyzer.add_constraint(cond == goal)
+
+                        if self._analyzer.check() != "sat":
+                            logger.debug("Pruned path: %s", _path_str(path + [bb_next]))
+
+                            self._analyzer.pop()
+                            scopes -= 1
+
+                            continue
+
+                    path.append(bb_next)
+
+                    if bb_next == bb_end:
+                        if self._analyzer.check() == "sat":
+                            yield list(path), self._get_model(values)
+
+                        path.pop()
+
+                        self._analyzer.pop()
+                        scopes -= 1
+
+                        continue
+
+                    # The scope of the branch condition also holds the
+                    # instructions of the next basic block.
+                    cond = self._add_basic_block(bb_next)
+
+                    stack.append((cond, self._successors(bb_next, path)))
+
+                    break
+                else:
+                    stack.pop()
+                    path.pop()
+
+                    self._analyzer.pop()
+                    scopes -= 1
+        finally:
+            for _ in xrange(scopes):
+                self._analyzer.pop()
+
+    # Auxiliary methods
+    # ======================================================================== #
+    def _find_basic_block(self, address):
+        for bb in self._cfg.basic_blocks:
+            if bb.contains(address):
+                return bb
+
+        return None
+
+    def _successors(self, bb, path):
+        """Return an iterator over the (basic block, branch condition
+        goal) pairs of the successors of a basic block that are not
+        already in the path. The goal is None for direct branches, and
+        for successors reached by more than one branch (for instance, a
+        conditional jump to the next instruction).
+        """
+        goals = {
+            'taken': 0x1,
+            'not-taken': 0x0,
+            'direct': None,
+        }
+
+        successors = []
+        successors_goals = {}
+
+        for address, branch_type in bb.branches:
+            if address not in self._bbs or self._bbs[address] in path:
+                continue
+
+            if address in successors_goals:
+                successors_goals[address] = None
+            else:
+                successors.append(address)
+                successors_goals[address] = goals[branch_type]
+
+        return iter([(self._bbs[address], successors_goals[address]) for address in successors])
+
+    def _add_basic_block(self, bb, start_address=None):
+        """Add the instructions of a basic block (from *start_address*,
+        if set) and return the condition of its final branch, if any.
+        """
+        for dinstr in bb:
+            if start_address is not None and dinstr.address < start_address:
+                continue
+
+            for reil_instr in dinstr.ir_instrs:
+                if reil_instr.mnemonic == ReilMnemonic.JCC:
+                    # Only the JCC instruction at the end of the basic
+                    # block is a branch (skip CALL instructions.)
+                    if dinstr.address + dinstr.asm_instr.size - 1 == bb.end_address:
+                        return self._analyzer.get_operand_expr(reil_instr.operands[0])
+
+                    continue
+
+                self._analyzer.add_instruction(reil_instr)
+
+        return None
+
+    def _get_model(self, values):
+        if not values:
+            return None
+
+        exprs = values(self._analyzer)
+
+        return dict([(name, self._analyzer.get_expr_value(expr)) for name, expr in exprs.items()])
+
+
+def _path_str(path):
+    return " -> ".join(["{:#x}".format(bb.address) for bb in path])
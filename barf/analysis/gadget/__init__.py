@@ -28,6 +28,8 @@ from gadget import TypedGadget
 
 from gadgetclassifier import GadgetClassifier
 
+from gadgetdb import GadgetDatabase
+
 from gadgetfinder import GadgetFinder
 
 from gadgetverifier import GadgetVerifier
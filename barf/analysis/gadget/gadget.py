@@ -33,8 +33,13 @@ each classified type and the RawGadget object is associated with them.
 
 """
 
+import hashlib
+
 from barf.core.reil import ReilEmptyOperand
 from barf.core.reil import ReilImmediateOperand
+from barf.core.reil import ReilMnemonic
+from barf.core.reil import ReilRegisterOperand
+from barf.core.reil import is_temporal_register
 
 
 class RawGadget(object):
@@ -45,6 +50,8 @@ class RawGadget(object):
     __slots__ = [
         '_instrs',
         '_id',
+        '_canonical_form',
+        '_canonical_hash',
     ]
 
     def __init__(self, instrs):
@@ -55,6 +62,12 @@ class RawGadget(object):
         # Id of gadget.
         self._id = None
 
+        # Canonical form of the REIL instructions (computed on demand).
+        self._canonical_form = None
+
+        # Hash of the canonical form (computed on demand).
+        self._canonical_hash = None
+
     @property
     def address(self):
         """Get gadget start address.
@@ -79,6 +92,29 @@ class RawGadget(object):
 
         return instrs
 
+    @property
+    def canonical_form(self):
+        """Get gadget IR instructions in canonical form, that is,
+        without addresses, with temporaries renumbered in order of
+        appearance and with normalized immediates. Gadgets with the same
+        canonical form are semantically equivalent.
+        """
+        if self._canonical_form is None:
+            self._canonical_form = canonicalize(self._instrs)
+
+        return self._canonical_form
+
+    @property
+    def canonical_hash(self):
+        """Get hash of the gadget canonical form.
+        """
+        if self._canonical_hash is None:
+            lines = [" ".join(str(item) for item in instr) for instr in self.canonical_form]
+
+            self._canonical_hash = hashlib.sha1("\n".join(lines)).hexdigest()
+
+        return self._canonical_hash
+
     @property
     def id(self):
         """Get gadget validity status.
@@ -149,6 +185,12 @@ class TypedGadget(RawGadget):
 
     # Properties
     # ======================================================================== #
+    @property
+    def gadget(self):
+        """Get raw gadget.
+        """
+        return self._gadget
+
     @property
     def sources(self):
         """Get gadget sources.
@@ -266,6 +308,22 @@ class TypedGadget(RawGadget):
 
     # Misc
     # ======================================================================== #
+    def clone(self, gadget):
+        """Return a copy of the typed gadget for another (semantically
+        equivalent) raw gadget.
+        """
+        typed_gadget = TypedGadget(gadget, self._gadget_type, gadget.instrs)
+
+        typed_gadget.sources = list(self._sources)
+        typed_gadget.destination = list(self._destination)
+        typed_gadget.modified_registers = list(self._modified_regs)
+        typed_gadget.operation = self._operation
+
+        if self._verified:
+            typed_gadget.is_valid = self._is_valid
+
+        return typed_gadget
+
     def __getattr__(self, name):
         return getattr(self._gadget, name)
 
@@ -304,6 +362,63 @@ class GadgetType(object):
         return strings[gadget_type]
 
 
+# Gadget canonicalization
+# ============================================================================ #
+def canonicalize(instrs):
+    """Return the canonical form of a list of dual instructions as a
+    tuple of REIL instructions, each one a tuple of the mnemonic and its
+    canonical operands.
+    """
+    # Native address of each instruction, plus the address that follows
+    # the gadget, so jumps inside the gadget become relative.
+    positions = {}
+
+    for index, dinstr in enumerate(instrs):
+        positions[dinstr.address] = index
+
+    last = instrs[-1].asm_instr
+
+    positions.setdefault(last.address + last.size, len(instrs))
+
+    temps = {}
+    canonical = []
+
+    for dinstr in instrs:
+        for instr in dinstr.ir_instrs:
+            oprnds = []
+
+            for index, oprnd in enumerate(instr.operands):
+                is_target = instr.mnemonic == ReilMnemonic.JCC and index == 2
+
+                oprnds += [_canonicalize_operand(oprnd, temps, positions, is_target)]
+
+            canonical += [(instr.mnemonic,) + tuple(oprnds)]
+
+    return tuple(canonical)
+
+
+def _canonicalize_operand(oprnd, temps, positions, is_target):
+    if isinstance(oprnd, ReilRegisterOperand):
+        if is_temporal_register(oprnd.name):
+            index = temps.setdefault(oprnd.name, len(temps))
+
+            return ("t%d" % index, oprnd.size)
+
+        return (oprnd.name, oprnd.size)
+
+    if isinstance(oprnd, ReilImmediateOperand):
+        value = oprnd.immediate
+
+        # REIL addresses inside the gadget are replaced by the position
+        # of the native instruction and the REIL instruction offset.
+        if is_target and value >> 8 in positions:
+            return ("@%d:%d" % (positions[value >> 8], value & 0xff), oprnd.size)
+
+        return (value, oprnd.size)
+
+    return ("",)
+
+
 # Gadget dump functions
 # ============================================================================ #
 def dump_no_operation(gadget):
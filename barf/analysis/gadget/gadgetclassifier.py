@@ -41,9 +41,20 @@ from barf.analysis.gadget import GadgetType
 from barf.analysis.gadget import TypedGadget
 from barf.core.reil import ReilEmptyOperand
 from barf.core.reil import ReilImmediateOperand
+from barf.core.reil import ReilMnemonic
 from barf.core.reil import ReilRegisterOperand
 
 
+# REIL instructions that can compute the operation of an arithmetic
+# gadget (i.e., "+", "-", "&", "^" and "|", also "x + x" as a shift or
+# multiplication).
+_ARITHMETIC_MNEMONICS = frozenset([
+    ReilMnemonic.ADD, ReilMnemonic.SUB, ReilMnemonic.MUL, ReilMnemonic.DIV, ReilMnemonic.MOD,
+    ReilMnemonic.BSH, ReilMnemonic.AND, ReilMnemonic.OR, ReilMnemonic.XOR, ReilMnemonic.SDIV,
+    ReilMnemonic.SMOD,
+])
+
+
 class GadgetClassifier(object):
 
     """Gadget Classifier.
@@ -98,21 +109,50 @@ class GadgetClassifier(object):
         # Number of simulation iterations.
         self._emu_iters = 10
 
+        # Number of gadgets for which each gadget type was ruled out
+        # before emulation.
+        self._pruned = dict((g_type, 0) for g_type in self._classifiers)
+
+    @property
+    def prune_stats(self):
+        """Get the number of gadgets for which each gadget type was ruled
+        out by the static pre-pass (i.e., without emulation).
+        """
+        return dict(self._pruned)
+
     def classify(self, gadget):
         """Classify gadget.
         """
         typed_gadgets = []
 
-        for g_type, g_classifier in self._classifiers.items():
+        # Rule out gadget types statically.
+        classifiers = self._prune_classifiers(gadget)
+
+        if not classifiers:
+            return typed_gadgets
+
+        # Emulate the gadget once per iteration and match all gadget
+        # types against the same execution results.
+        try:
+            results = self._classify(gadget, classifiers, self._emu_iters)
+        except:
+            self._print_error(gadget)
+
+            return typed_gadgets
+
+        for g_type in self._classifiers:
+            # Skip gadget types whose classifier failed.
+            if g_type not in results:
+                continue
+
             try:
-                typed_gadgets += self._classify(gadget, g_classifier, g_type, self._emu_iters)
-            except:
-                import traceback
+                # Analyze results and compute candidate gadgets.
+                candidates, mod_regs = self._analyze_execution_results(results[g_type])
 
-                print("[-] Error classifying gadgets :")
-                print(gadget)
-                print("")
-                print(traceback.format_exc())
+                # Create classified gadgets.
+                typed_gadgets += self._create_typed_gadgets(gadget, candidates, mod_regs, g_type)
+            except:
+                self._print_error(gadget)
 
         return typed_gadgets
 
@@ -533,18 +573,102 @@ class GadgetClassifier(object):
 
     # Auxiliary functions
     # ======================================================================== #
-    def _classify(self, gadget, classifier, gadget_type, iters):
+    def _prune_classifiers(self, gadget):
+        """Return the classifiers of the gadget types that are possible
+        according to the instructions present in the gadget and the
+        registers they read and write.
+        """
+        instrs = gadget.get_ir_instrs()
+
+        mnemonics, regs_read, regs_written = self._compute_static_info(instrs)
+
+        mem_read = ReilMnemonic.LDM in mnemonics
+        mem_write = ReilMnemonic.STM in mnemonics
+        arithmetic = not mnemonics.isdisjoint(_ARITHMETIC_MNEMONICS)
+
+        # Memory is always written if there is a store before any jump.
+        sequence = [instr.mnemonic for instr in instrs] + [ReilMnemonic.JCC]
+
+        mem_write_always = mem_write and sequence.index(ReilMnemonic.STM) < sequence.index(ReilMnemonic.JCC)
+
+        possible = {
+            GadgetType.NoOperation:     not mem_write_always,
+            GadgetType.Jump:            True,
+            GadgetType.MoveRegister:    regs_read and regs_written,
+            GadgetType.LoadConstant:    regs_written,
+            GadgetType.Arithmetic:      regs_read and regs_written and arithmetic,
+            # Values stored by the gadget can be loaded back.
+            GadgetType.LoadMemory:      regs_written and (mem_read or mem_write),
+            GadgetType.StoreMemory:     regs_read and mem_write,
+            GadgetType.ArithmeticLoad:  regs_read and regs_written and arithmetic and (mem_read or mem_write),
+            GadgetType.ArithmeticStore: regs_read and mem_write and arithmetic,
+        }
+
+        classifiers = {}
+
+        for g_type, classifier in self._classifiers.items():
+            if possible[g_type]:
+                classifiers[g_type] = classifier
+            else:
+                self._pruned[g_type] += 1
+
+        return classifiers
+
+    def _compute_static_info(self, instrs):
+        """Return the mnemonics of a list of REIL instructions together
+        with the general purpose registers they read and write.
+        """
+        mnemonics = set()
+        regs_read = set()
+        regs_written = set()
+
+        for instr in instrs:
+            mnemonics.add(instr.mnemonic)
+
+            # The third operand of STM and JCC is read, not written.
+            if instr.mnemonic in (ReilMnemonic.STM, ReilMnemonic.JCC):
+                srcs, dsts = instr.operands, []
+            else:
+                srcs, dsts = instr.operands[:2], instr.operands[2:]
+
+            regs_read.update(oprnd.name for oprnd in srcs if self._is_gp_register(oprnd))
+            regs_written.update(oprnd.name for oprnd in dsts if self._is_gp_register(oprnd))
+
+        return mnemonics, regs_read, regs_written
+
+    def _is_gp_register(self, operand):
+        """Return whether an operand is a general purpose register (or
+        an alias of one).
+        """
+        if not isinstance(operand, ReilRegisterOperand):
+            return False
+
+        base_reg, _ = self._arch_info.alias_mapper.get(operand.name, (operand.name, 0))
+
+        return operand.name in self._arch_regs or base_reg in self._arch_regs_parent
+
+    def _classify(self, gadget, classifiers, iters):
         """Classify gadgets.
+
+        Return a dictionary that maps each gadget type to its list of
+        execution results (one per iteration). Gadget types whose
+        classifier raised an exception are left out.
+
         """
         # Collect REIL instructions of the gadget.
         instrs = [ir_instr for g_instrs in gadget.instrs for ir_instr in g_instrs.ir_instrs]
 
+        # Reset emulator and keep a snapshot of its clean state.
+        self._ir_emulator.reset()
+
+        snapshot = self._ir_emulator.snapshot()
+
         # Repeat classification.
-        results = []
+        results = dict((g_type, []) for g_type in classifiers)
 
         for _ in xrange(iters):
-            # Reset emulator.
-            self._ir_emulator.reset()
+            # Restore emulator.
+            self._ir_emulator.restore(snapshot)
 
             # Generate random values for registers.
             regs_initial = self._init_regs_random()
@@ -557,7 +681,8 @@ class GadgetClassifier(object):
                 )
             except:
                 # Catch emulator exceptions like ZeroDivisionError, etc.
-                results += [([], [])]
+                for g_type in results:
+                    results[g_type] += [([], [])]
 
                 continue
 
@@ -577,29 +702,26 @@ class GadgetClassifier(object):
             )
 
             # Classified gadgets based on initial and final context.
-            matches = classifier(
-                regs_initial_full,
-                regs_final_full,
-                mem_final,
-                regs_written,
-                regs_read
-            )
+            for g_type in results.keys():
+                try:
+                    matches = classifiers[g_type](
+                        regs_initial_full,
+                        regs_final_full,
+                        mem_final,
+                        regs_written,
+                        regs_read
+                    )
+                except:
+                    self._print_error(gadget)
+
+                    del results[g_type]
 
-            # Save results.
-            results += [(matches, mod_regs)]
-
-        # Analyze results and compute candidate gadgets.
-        candidates, mod_regs = self._analyze_execution_results(results)
+                    continue
 
-        # Create classified gadgets.
-        classified = self._create_typed_gadgets(
-            gadget,
-            candidates,
-            mod_regs,
-            gadget_type
-        )
+                # Save results.
+                results[g_type] += [(matches, mod_regs)]
 
-        return classified
+        return results
 
     def _analyze_execution_results(self, results):
         matching_candidates, _ = results[0]
@@ -701,6 +823,16 @@ class GadgetClassifier(object):
 
         return inv_dict
 
+    def _print_error(self, gadget):
+        """Print classification error.
+        """
+        import traceback
+
+        print("[-] Error classifying gadgets :")
+        print(gadget)
+        print("")
+        print(traceback.format_exc())
+
     def _print_memory(self, memory):
         """Print memory.
         """
@@ -0,0 +1,312 @@
+# Copyright (c) 2014, Fundacion Dr. Manuel Sadosky
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+This module implements a persistent gadget store on top of a SQLite
+database. Gadgets are stored by binary (identified by the hash of its
+contents and the options used to process it) together with the results
+of each stage: the raw gadgets found, their classification and their
+verification status. Typed gadgets are indexed by type, destination
+register and operation so they can be looked up without processing the
+binary again.
+"""
+
+import cPickle
+import hashlib
+import sqlite3
+
+from barf.analysis.gadget.gadget import RawGadget
+from barf.analysis.gadget.gadget import TypedGadget
+from barf.core.reil import ReilRegisterOperand
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS binaries (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL,
+    options TEXT NOT NULL,
+    found INTEGER NOT NULL DEFAULT 0,
+    classified INTEGER NOT NULL DEFAULT 0,
+    verified INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (hash, options)
+);
+
+CREATE TABLE IF NOT EXISTS gadgets (
+    id INTEGER PRIMARY KEY,
+    binary_id INTEGER NOT NULL REFERENCES binaries (id),
+    address INTEGER NOT NULL,
+    asm TEXT NOT NULL,
+    canonical_hash TEXT NOT NULL,
+    instrs BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS typed_gadgets (
+    id INTEGER PRIMARY KEY,
+    gadget_id INTEGER NOT NULL REFERENCES gadgets (id),
+    type INTEGER NOT NULL,
+    dst TEXT,
+    operation TEXT,
+    sources BLOB NOT NULL,
+    destination BLOB NOT NULL,
+    modified_registers BLOB NOT NULL,
+    verified INTEGER NOT NULL DEFAULT 0,
+    valid INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS gadgets_binary ON gadgets (binary_id);
+CREATE INDEX IF NOT EXISTS typed_gadgets_gadget ON typed_gadgets (gadget_id);
+CREATE INDEX IF NOT EXISTS typed_gadgets_type ON typed_gadgets (type);
+CREATE INDEX IF NOT EXISTS typed_gadgets_dst ON typed_gadgets (dst);
+CREATE INDEX IF NOT EXISTS typed_gadgets_operation ON typed_gadgets (operation);
+"""
+
+
+def hash_file(filename):
+    """Return the hash of the contents of a file.
+    """
+    with open(filename, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class GadgetDatabase(object):
+
+    """Persistent gadget store.
+    """
+
+    def __init__(self, filename):
+
+        # Connection to the SQLite database.
+        self._conn = sqlite3.connect(filename)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        """Close database.
+        """
+        self._conn.close()
+
+    # Binaries
+    # ======================================================================== #
+    def add_binary(self, binary_hash, options=""):
+        """Return the id of a binary entry (identified by the binary
+        hash and the options used to process it). The entry is created
+        if it does not exist.
+        """
+        with self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO binaries (hash, options) VALUES (?, ?)",
+                               (binary_hash, options))
+
+        row = self._conn.execute("SELECT id FROM binaries WHERE hash = ? AND options = ?",
+                                 (binary_hash, options)).fetchone()
+
+        return row[0]
+
+    def is_stored(self, binary_id, stage):
+        """Return whether the results of a stage ('found', 'classified'
+        or 'verified') are stored for a binary.
+        """
+        assert stage in ("found", "classified", "verified")
+
+        row = self._conn.execute("SELECT {} FROM binaries WHERE id = ?".format(stage),
+                                 (binary_id,)).fetchone()
+
+        return bool(row and row[0])
+
+    # Gadgets
+    # ======================================================================== #
+    def add_gadgets(self, binary_id, gadgets):
+        """Store the raw gadgets of a binary, replacing previous
+        results. The id of each gadget is set to its database id.
+        """
+        with self._conn:
+            self._delete_gadgets(binary_id)
+
+            for gadget in gadgets:
+                cursor = self._conn.execute(
+                    "INSERT INTO gadgets (binary_id, address, asm, canonical_hash, instrs) VALUES (?, ?, ?, ?, ?)",
+                    (binary_id, gadget.address, _asm_string(gadget), gadget.canonical_hash,
+                     _dumps(gadget.instrs)))
+
+                gadget.id = cursor.lastrowid
+
+            self._set_stored(binary_id, found=1, classified=0, verified=0)
+
+    def get_gadgets(self, binary_id):
+        """Return the raw gadgets of a binary (or None if they are not
+        stored).
+        """
+        if not self.is_stored(binary_id, "found"):
+            return None
+
+        rows = self._conn.execute("SELECT id, instrs FROM gadgets WHERE binary_id = ? ORDER BY id",
+                                  (binary_id,))
+
+        return [_load_gadget(gadget_id, instrs) for gadget_id, instrs in rows]
+
+    def add_typed_gadgets(self, binary_id, typed_gadgets):
+        """Store the classification of the raw gadgets of a binary
+        (previously stored with *add_gadgets*). The id of each typed
+        gadget is set to its database id.
+        """
+        with self._conn:
+            for typed_gadget in typed_gadgets:
+                cursor = self._conn.execute(
+                    "INSERT INTO typed_gadgets (gadget_id, type, dst, operation, sources, destination, "
+                    "modified_registers, verified, valid) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (typed_gadget.gadget.id, typed_gadget.type, _dst_name(typed_gadget), typed_gadget.operation,
+                     _dumps(typed_gadget.sources), _dumps(typed_gadget.destination),
+                     _dumps(typed_gadget.modified_registers), typed_gadget.verified,
+                     typed_gadget.is_valid if typed_gadget.verified else None))
+
+                typed_gadget.id = cursor.lastrowid
+
+            self._set_stored(binary_id, classified=1)
+
+    def get_typed_gadgets(self, binary_id, gadgets):
+        """Return the typed gadgets of a binary (or None if they are not
+        stored). *gadgets* are the raw gadgets returned by *get_gadgets*
+        (or stored with *add_gadgets*); typed gadgets of raw gadgets not
+        in the list are skipped.
+        """
+        if not self.is_stored(binary_id, "classified"):
+            return None
+
+        gadgets_by_id = dict((gadget.id, gadget) for gadget in gadgets)
+
+        rows = self._conn.execute(
+            "SELECT t.id, t.gadget_id, t.type, t.sources, t.destination, t.modified_registers, t.operation, "
+            "t.verified, t.valid FROM typed_gadgets t JOIN gadgets g ON t.gadget_id = g.id "
+            "WHERE g.binary_id = ? ORDER BY t.id", (binary_id,))
+
+        return [_load_typed_gadget(gadgets_by_id[row[1]], row) for row in rows if row[1] in gadgets_by_id]
+
+    def set_verified(self, binary_id, typed_gadgets):
+        """Store the verification status of the typed gadgets of a
+        binary (previously stored with *add_typed_gadgets*).
+        """
+        with self._conn:
+            self._conn.executemany("UPDATE typed_gadgets SET verified = 1, valid = ? WHERE id = ?",
+                                   [(g.is_valid, g.id) for g in typed_gadgets if g.verified])
+
+            self._set_stored(binary_id, verified=1)
+
+    # Queries
+    # ======================================================================== #
+    def find(self, type=None, dst=None, operation=None, valid=None, binary_hash=None):
+        """Return the typed gadgets that match all the given conditions:
+        gadget type, destination register name, operation, verification
+        result and hash of the binary.
+        """
+        conditions = {
+            "t.type": type,
+            "t.dst": dst,
+            "t.operation": operation,
+            "t.valid": valid,
+            "b.hash": binary_hash,
+        }
+
+        where = ["{} = ?".format(column) for column, value in sorted(conditions.items()) if value is not None]
+        params = [value for _, value in sorted(conditions.items()) if value is not None]
+
+        query = "SELECT t.id, t.gadget_id, t.type, t.sources, t.destination, t.modified_registers, " \
+                "t.operation, t.verified, t.valid, g.instrs FROM typed_gadgets t " \
+                "JOIN gadgets g ON t.gadget_id = g.id JOIN binaries b ON g.binary_id = b.id"
+
+        if where:
+            query += " WHERE " + " AND ".join(where)
+
+        gadgets = {}
+        typed_gadgets = []
+
+        for row in self._conn.execute(query + " ORDER BY t.id", params):
+            gadget_id, instrs = row[1], row[9]
+
+            if gadget_id not in gadgets:
+                gadgets[gadget_id] = _load_gadget(gadget_id, instrs)
+
+            typed_gadgets += [_load_typed_gadget(gadgets[gadget_id], row)]
+
+        return typed_gadgets
+
+    # Auxiliary methods
+    # ======================================================================== #
+    def _delete_gadgets(self, binary_id):
+        self._conn.execute("DELETE FROM typed_gadgets WHERE gadget_id IN "
+                           "(SELECT id FROM gadgets WHERE binary_id = ?)", (binary_id,))
+        self._conn.execute("DELETE FROM gadgets WHERE binary_id = ?", (binary_id,))
+
+    def _set_stored(self, binary_id, **stages):
+        for stage, value in stages.items():
+            assert stage in ("found", "classified", "verified")
+
+            self._conn.execute("UPDATE binaries SET {} = ? WHERE id = ?".format(stage), (value, binary_id))
+
+
+# Auxiliary functions
+# ============================================================================ #
+def _dumps(value):
+    return sqlite3.Binary(cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL))
+
+
+def _loads(value):
+    return cPickle.loads(str(value))
+
+
+def _asm_string(gadget):
+    return " ; ".join([str(dinstr.asm_instr) for dinstr in gadget.instrs])
+
+
+def _dst_name(typed_gadget):
+    # Name of the destination register (the base register for memory
+    # destinations), if any.
+    destination = typed_gadget.destination
+
+    if destination and isinstance(destination[0], ReilRegisterOperand):
+        return destination[0].name
+
+    return None
+
+
+def _load_gadget(gadget_id, instrs):
+    gadget = RawGadget(_loads(instrs))
+    gadget.id = gadget_id
+
+    return gadget
+
+
+def _load_typed_gadget(gadget, row):
+    typed_id, _, gadget_type, sources, destination, modified_regs, operation, verified, valid = row[:9]
+
+    typed_gadget = TypedGadget(gadget, gadget_type, gadget.instrs)
+
+    typed_gadget.id = typed_id
+    typed_gadget.sources = _loads(sources)
+    typed_gadget.destination = _loads(destination)
+    typed_gadget.modified_registers = _loads(modified_regs)
+    typed_gadget.operation = str(operation) if operation is not None else None
+
+    if verified:
+        typed_gadget.is_valid = bool(valid)
+
+    return typed_gadget
@@ -31,17 +31,49 @@ Some more work is needed to make this algorithm truly architecture
 agnostic.
 
 """
+import multiprocessing
 import re
 
 from barf.analysis.gadget import RawGadget
 from barf.arch import ARCH_ARM
 from barf.arch import ARCH_X86
+from barf.arch.arm.armdisassembler import ArmDisassembler
+from barf.arch.arm.armtranslator import ArmTranslator
+from barf.arch.x86.x86disassembler import X86Disassembler
+from barf.arch.x86.x86translator import X86Translator
+from barf.core.bi import Memory
 from barf.core.disassembler import InvalidDisassemblerData
 from barf.core.reil import DualInstruction
 from barf.core.reil import ReilMnemonic
 from barf.core.reil import ReilRegisterOperand
 
 
+# x86 gadget tail opcodes.
+# TODO: Make this 'speed improvement' architecture-agnostic
+_X86_TAIL_RE = re.compile(
+    "["
+    "\xc3"     # RET
+    "\xc2"     # RET imm16
+    "\xeb"     # JMP rel8
+    "\xe8"     # CALL rel{16,32}
+    "\xe9"     # JMP rel{16,32}
+    "\xff"     # JMP/CALL r/m{16,32,64}
+    "]"
+)
+
+# ARM gadget tails (from ROPgadget). Matches are searched with a
+# lookahead so overlapping tails are found too.
+# TODO: Add thumb
+# TODO: Little-Endian
+_ARM_TAIL_RE = re.compile(
+    "(?="
+    "[\x10-\x19\x1e]\xff\x2f\xe1"    # bx   reg
+    "|[\x30-\x39\x3e]\xff\x2f\xe1"   # blx  reg
+    "|[\x00-\xff]\x80\xbd\xe8"        # pop {,pc}
+    ")"
+)
+
+
 class GadgetFinder(object):
 
     """Gadget Finder.
@@ -68,46 +100,173 @@ class GadgetFinder(object):
         self._architecture = architecture
         self._architecture_mode = architecture_mode
 
-    def find(self, start_address, end_address, byte_depth=20, instrs_depth=2):
+        # Raw content of the region being searched and its start
+        # address.
+        self._buffer = None
+        self._buffer_start = None
+
+        # Decode cache. It maps (address, architecture mode) to a list
+        # [asm instruction, REIL instructions] with the instruction at
+        # that address (None if there is no valid instruction) and its
+        # translation (None until it is needed, False if it failed).
+        # It lasts for one find run.
+        self._decode_cache = {}
+        self._decode_cache_hits = 0
+        self._decode_cache_misses = 0
+
+    def find(self, start_address, end_address, byte_depth=20, instrs_depth=2, jobs=1):
         """Find gadgets.
+
+        If jobs is greater than one, the search is split in shards
+        that are processed by a pool of worker processes. Candidates
+        are returned in the same order as in a serial search.
+
         """
         self._max_bytes = byte_depth
         self._instrs_depth = instrs_depth
 
-        if self._architecture == ARCH_X86:
-            candidates = self._find_x86_candidates(start_address, end_address)
-        elif self._architecture == ARCH_ARM:
-            candidates = self._find_arm_candidates(start_address, end_address)
-        else:
+        if self._architecture not in [ARCH_X86, ARCH_ARM]:
             raise Exception("Architecture not supported.")
 
-        return candidates
+        # Read the whole region at once, all lookups are done on the
+        # raw buffer.
+        buffer = self._mem[start_address:end_address + 1]
+
+        tails = self._find_tails(buffer, start_address)
+
+        if jobs > 1 and len(tails) > 1:
+            return self._find_parallel(start_address, end_address, buffer, tails, jobs)
+
+        self._decode_cache_hits = 0
+        self._decode_cache_misses = 0
+
+        return list(self._iter_candidates(start_address, start_address, buffer, tails))
+
+    def find_iter(self, start_address, end_address, byte_depth=20, instrs_depth=2):
+        """Find gadgets. Candidates are generated as soon as each
+        gadget tail is processed (in the same order as find).
+        """
+        self._max_bytes = byte_depth
+        self._instrs_depth = instrs_depth
+
+        if self._architecture not in [ARCH_X86, ARCH_ARM]:
+            raise Exception("Architecture not supported.")
+
+        buffer = self._mem[start_address:end_address + 1]
+
+        tails = self._find_tails(buffer, start_address)
+
+        self._decode_cache_hits = 0
+        self._decode_cache_misses = 0
+
+        for candidate in self._iter_candidates(start_address, start_address, buffer, tails):
+            yield candidate
+
+    def find_tails(self, start_address, end_address):
+        """Find gadget tail addresses (without disassembling them).
+        """
+        buffer = self._mem[start_address:end_address + 1]
+
+        return self._find_tails(buffer, start_address)
+
+    @property
+    def decode_cache_stats(self):
+        """Get decode cache statistics of the last find run.
+        """
+        lookups = self._decode_cache_hits + self._decode_cache_misses
+
+        return {
+            "hits": self._decode_cache_hits,
+            "misses": self._decode_cache_misses,
+            "hit_rate": float(self._decode_cache_hits) / lookups if lookups else 0.0,
+        }
 
     # Auxiliary functions
     # ======================================================================== #
-    def _find_x86_candidates(self, start_address, end_address):
-        """Finds possible 'RET-ended' gadgets.
+    def _find_parallel(self, start_address, end_address, buffer, tails, jobs):
+        """Find gadgets using a pool of worker processes.
         """
-        roots = []
-
-        # find gadget tail
-        for addr in xrange(start_address, end_address + 1):
-            # TODO: Make this 'speed improvement' architecture-agnostic
-            op_codes = [
-                "\xc3",     # RET
-                "\xc2",     # RET imm16
-                "\xeb",     # JMP rel8
-                "\xe8",     # CALL rel{16,32}
-                "\xe9",     # JMP rel{16,32}
-                "\xff",     # JMP/CALL r/m{16,32,64}
-            ]
-
-            if self._mem[addr] not in op_codes:
-                continue
+        # Split tails in contiguous shards (a few per worker to even
+        # out the load). Each shard carries the bytes its gadgets can
+        # span, i.e., up to byte_depth bytes per instruction before
+        # its first tail and a whole instruction after its last one.
+        overlap = self._max_bytes * self._instrs_depth + 1
+
+        shard_count = min(len(tails), jobs * 4)
+        shard_size = (len(tails) + shard_count - 1) / shard_count
+
+        shards = []
+
+        for i in xrange(0, len(tails), shard_size):
+            shard_tails = tails[i:i + shard_size]
 
+            shard_start = max(start_address, shard_tails[0] - overlap)
+            shard_end = min(end_address + 1, shard_tails[-1] + 16)
+
+            shard_buffer = buffer[shard_start - start_address:shard_end - start_address]
+
+            shards.append((self._architecture, self._architecture_mode, self._max_bytes, self._instrs_depth,
+                           start_address, shard_start, shard_buffer, shard_tails))
+
+        pool = multiprocessing.Pool(jobs)
+
+        try:
+            results = pool.map(_find_shard, shards)
+        finally:
+            pool.close()
+            pool.join()
+
+        # Merge results in shard order. Shards do not share tails, so
+        # no gadget is found twice.
+        candidates = []
+
+        self._decode_cache_hits = 0
+        self._decode_cache_misses = 0
+
+        for shard_candidates, hits, misses in results:
+            candidates += shard_candidates
+
+            self._decode_cache_hits += hits
+            self._decode_cache_misses += misses
+
+        return candidates
+
+    def _iter_candidates(self, start_address, buffer_address, buffer, tails):
+        """Find gadgets ending at the specified tails. Gadgets do not
+        go beyond the start address.
+        """
+        self._buffer = buffer
+        self._buffer_start = buffer_address
+
+        self._decode_cache = {}
+
+        try:
+            if self._architecture == ARCH_X86:
+                roots = self._iter_x86_roots(start_address, tails)
+            else:
+                roots = self._iter_arm_roots(start_address, tails)
+
+            for root in roots:
+                # filter roots with no children
+                if len(root.get_children()) == 0:
+                    continue
+
+                # build gadgets
+                for candidate in self._build_gadgets(root):
+                    yield candidate
+        finally:
+            self._buffer = None
+            self._buffer_start = None
+            self._decode_cache = {}
+
+    def _iter_x86_roots(self, start_address, tails):
+        """Finds possible 'RET-ended' gadgets. Generate a gadget tree
+        for each tail.
+        """
+        for addr in tails:
             try:
                 asm_instr = self._disasm.disassemble(
-                    self._mem[addr:min(addr+16, end_address + 1)],
+                    self._read(addr, addr + 16),
                     addr
                 )
             except:
@@ -132,7 +291,7 @@ class GadgetFinder(object):
                     # try addr - 1
                     try:
                         asm_instr_1 = self._disasm.disassemble(
-                            self._mem[addr-1:min(addr+15, end_address + 1)],
+                            self._read(addr - 1, addr + 15),
                             addr
                         )
 
@@ -149,57 +308,18 @@ class GadgetFinder(object):
 
                 root = GadgetTreeNode(DualInstruction(addr, asm_instr, ins_ir))
 
-                roots.append(root)
-
                 self._build_from(addr, root, start_address, self._instrs_depth)
 
-        # filter roots with no children
-        roots = [r for r in roots if len(r.get_children()) > 0]
-
-        # build gadgets
-        root_gadgets = [self._build_gadgets(r) for r in roots]
+                yield root
 
-        # flatten root gadget list
-        candidates = [item for l in root_gadgets for item in l]
-
-        return candidates
-
-    # Auxiliary functions
-    # ======================================================================== #
-    def _find_arm_candidates(self, start_address, end_address):
-        """Finds possible 'RET-ended' gadgets.
+    def _iter_arm_roots(self, start_address, tails):
+        """Finds possible 'RET-ended' gadgets. Generate a gadget tree
+        for each tail.
         """
-        roots = []
-        gadget_tail_addr = []
-
-        # From ROPgadget:
-        free_jump_gadgets = [
-            "[\x10-\x19\x1e]{1}\xff\x2f\xe1",  # bx   reg
-            "[\x30-\x39\x3e]{1}\xff\x2f\xe1",  # blx  reg
-            "[\x00-\xff]{1}\x80\xbd\xe8",       # pop {,pc}
-        ]
-
-        # find gadget tail
-        for addr in xrange(start_address, end_address + 1):
-            # TODO: Make this 'speed improvement' architecture-agnostic
-            # TODO: Add thumb
-            # TODO: Little-Endian
-
-            # TODO: Evaluate performance
-            gad_found = False
-            for gad in free_jump_gadgets:
-                if len(re.findall(gad, "".join(self._mem[addr:min(addr+4, end_address + 1)]))) > 0:     # TODO: Add thumb (+2)
-                    gad_found = True
-                    break
-            if not gad_found:
-                continue
-
-            gadget_tail_addr.append(addr)
-
-        for addr in gadget_tail_addr:
+        for addr in tails:
             try:
                 asm_instr = self._disasm.disassemble(
-                    self._mem[addr:min(addr+4, end_address + 1)],   # TODO: Add thumb (+16)
+                    self._read(addr, addr + 4),   # TODO: Add thumb (+16)
                     addr,
                     architecture_mode=self._architecture_mode
                 )
@@ -219,20 +339,9 @@ class GadgetFinder(object):
 
             root = GadgetTreeNode(DualInstruction(addr, asm_instr, ins_ir))
 
-            roots.append(root)
-
             self._build_from(addr, root, start_address, self._instrs_depth)
 
-        # filter roots with no children
-        roots = [r for r in roots if len(r.get_children()) > 0]
-
-        # build gadgets
-        root_gadgets = [self._build_gadgets(r) for r in roots]
-
-        # flatten root gadget list
-        candidates = [item for l in root_gadgets for item in l]
-
-        return candidates
+            yield root
 
     def _build_from(self, address, root, base_address, depth=2):
         """Build gadget recursively.
@@ -248,27 +357,12 @@ class GadgetFinder(object):
             if start_addr < 0 or start_addr < base_address:
                 break
 
-            raw_bytes = self._mem[start_addr:end_addr]
-
-            # TODO: Improve this code.
-            if self._architecture == ARCH_ARM:
-                try:
-                    asm_instr = self._disasm.disassemble(raw_bytes, start_addr, architecture_mode=self._architecture_mode)
-                except InvalidDisassemblerData:
-                    continue
-            else:
-                try:
-                    asm_instr = self._disasm.disassemble(raw_bytes, start_addr)
-                except:
-                    asm_instr = None
+            decoded = self._decode(start_addr, end_addr)
 
-            if not asm_instr or asm_instr.size != step:
+            if not decoded:
                 continue
 
-            try:
-                ir_instrs = self._ir_trans.translate(asm_instr)
-            except:
-                continue
+            asm_instr, ir_instrs = decoded
 
             if self._is_valid_ins(ir_instrs):
                 child = GadgetTreeNode(DualInstruction(start_addr, asm_instr, ir_instrs))
@@ -277,6 +371,97 @@ class GadgetFinder(object):
 
                 self._build_from(address - step, child, base_address, depth - 1)
 
+    def _decode(self, start_address, end_address):
+        """Decode and translate the instruction that spans exactly
+        from start address to end address (not included).
+
+        Return a tuple (asm instruction, REIL instructions) or None.
+
+        """
+        key = (start_address, self._architecture_mode)
+
+        # The instruction at a given address does not depend on the
+        # end of the window, so it is decoded (and translated) once
+        # per address. Results, including failures, are cached.
+        if key in self._decode_cache:
+            self._decode_cache_hits += 1
+
+            entry = self._decode_cache[key]
+        else:
+            self._decode_cache_misses += 1
+
+            lookahead = 4 if self._architecture == ARCH_ARM else 16
+
+            try:
+                entry = self._decode_cache[key] = [self._disassemble(start_address, start_address + lookahead), None]
+            except:
+                # The instruction could not be decoded using bytes
+                # beyond the window, decode the window alone (the
+                # result is not cached).
+                entry = [self._disassemble(start_address, end_address), None]
+
+        asm_instr, ir_instrs = entry
+
+        if not asm_instr or asm_instr.size != end_address - start_address:
+            return None
+
+        if ir_instrs is None:
+            try:
+                ir_instrs = self._ir_trans.translate(asm_instr)
+            except:
+                ir_instrs = False
+
+            entry[1] = ir_instrs
+
+        if ir_instrs is False:
+            return None
+
+        return asm_instr, ir_instrs
+
+    def _disassemble(self, start_address, end_address):
+        """Disassemble the first instruction within a range. Return
+        None if there is no valid instruction.
+        """
+        raw_bytes = self._read(start_address, end_address)
+
+        # TODO: Improve this code.
+        if self._architecture == ARCH_ARM:
+            try:
+                asm_instr = self._disasm.disassemble(raw_bytes, start_address, architecture_mode=self._architecture_mode)
+            except InvalidDisassemblerData:
+                asm_instr = None
+        else:
+            try:
+                asm_instr = self._disasm.disassemble(raw_bytes, start_address)
+            except:
+                asm_instr = None
+
+        return asm_instr
+
+    def _find_tails(self, buffer, base_address):
+        """Return the addresses of all gadget tails within a buffer
+        (in ascending order).
+        """
+        if self._architecture == ARCH_X86:
+            tail_re = _X86_TAIL_RE
+        else:
+            tail_re = _ARM_TAIL_RE
+
+        return [base_address + match.start() for match in tail_re.finditer(buffer)]
+
+    def _read(self, start_address, end_address):
+        """Read raw bytes from the searched region (end address not
+        included).
+        """
+        start = start_address - self._buffer_start
+        end = end_address - self._buffer_start
+
+        # Out of the region, read directly from memory.
+        if start < 0:
+            return self._mem[start_address:self._buffer_start + min(end, len(self._buffer))]
+
+        return self._buffer[start:end]
+
     def _build_gadgets(self, gadget_tree_root):
         """Return a gadget list.
         """
@@ -326,6 +511,32 @@ class GadgetFinder(object):
         return not any([i.mnemonic in invalid_instrs for i in ins_ir])
 
 
+def _find_shard(shard):
+    """Find gadgets within a shard (run by worker processes).
+    """
+    architecture, architecture_mode, byte_depth, instrs_depth, start_address, shard_address, shard_buffer, tails = shard
+
+    # Each worker builds its own disassembler and translator.
+    if architecture == ARCH_X86:
+        disasm = X86Disassembler(architecture_mode=architecture_mode)
+        ir_trans = X86Translator(architecture_mode=architecture_mode)
+    else:
+        disasm = ArmDisassembler(architecture_mode=architecture_mode)
+        ir_trans = ArmTranslator(architecture_mode=architecture_mode)
+
+    memory = Memory()
+    memory.add_vma(shard_address, bytearray(shard_buffer))
+
+    finder = GadgetFinder(disasm, memory, ir_trans, architecture, architecture_mode)
+
+    finder._max_bytes = byte_depth
+    finder._instrs_depth = instrs_depth
+
+    candidates = list(finder._iter_candidates(start_address, shard_address, shard_buffer, tails))
+
+    return candidates, finder._decode_cache_hits, finder._decode_cache_misses
+
+
 class GadgetTreeNode(object):
 
     """Tree Data Structure.
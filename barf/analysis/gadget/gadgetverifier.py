@@ -34,7 +34,10 @@ This algorithm is architecture agnostic since it operates on the IR
 representation of the underlying assembly code.
 """
 
+import Queue
 import logging
+import sys
+import threading
 
 import barf.core.smt.smtfunction as smtfunction
 
@@ -57,6 +60,10 @@ class GadgetVerifier(object):
         # Architecture information.
         self._arch_info = architecture_info
 
+        # Verifiers (each one with its own solver process) used by
+        # *verify_many*, kept alive between calls.
+        self._workers = []
+
         # Constraints generators ordered by gadget type.
         self._constraints_generators = {
             GadgetType.NoOperation:     self._get_constrs_no_operation,
@@ -112,6 +119,65 @@ class GadgetVerifier(object):
 
         return self.analyzer.check() == 'unsat'
 
+    def verify_many(self, gadgets, workers=1):
+        """Verify a list of gadgets. Return the results in the same
+        order and set the *is_valid* flag of each gadget. With more than
+        one worker, gadgets are verified concurrently by threads, each
+        one querying its own solver.
+        """
+        if workers > 1:
+            results = self._verify_parallel(gadgets, workers)
+        else:
+            results = [self.verify(gadget) for gadget in gadgets]
+
+        for gadget, valid in zip(gadgets, results):
+            gadget.is_valid = valid
+
+        return results
+
+    # Auxiliary methods
+    # ======================================================================== #
+    def _verify_parallel(self, gadgets, workers):
+        while len(self._workers) < workers - 1:
+            self._workers += [GadgetVerifier(self.analyzer.clone(), self._arch_info)]
+
+        verifiers = [self] + self._workers[:workers - 1]
+
+        pending = Queue.Queue()
+
+        for item in enumerate(gadgets):
+            pending.put(item)
+
+        results = [None] * len(gadgets)
+        errors = []
+
+        def run(verifier):
+            try:
+                while True:
+                    try:
+                        index, gadget = pending.get_nowait()
+                    except Queue.Empty:
+                        break
+
+                    results[index] = verifier.verify(gadget)
+            except Exception:
+                errors.append(sys.exc_info())
+
+        threads = [threading.Thread(target=run, args=(verifier,)) for verifier in verifiers]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            exc_type, exc_value, exc_traceback = errors[0]
+
+            raise exc_type, exc_value, exc_traceback
+
+        return results
+
     # Verifiers
     # ======================================================================== #
     def _get_constrs_no_operation(self, gadget):
@@ -45,17 +45,14 @@ from arch.x86.x86base import X86ArchitectureInformation
 from arch.x86.x86disassembler import X86Disassembler
 from arch.x86.x86translator import X86Translator
 from core.bi import BinaryFile
-from core.reil import ReilContainer
-from core.reil import ReilContainerInvalidAddressError
 from core.reil import ReilEmulator
-from core.reil import ReilSequence
+from core.reil import ReilMnemonic
 from core.smt.smtsolver import CVC4Solver, SmtSolverNotFound
+from core.smt.smtsolver import Z3PySolver
 from core.smt.smtsolver import Z3Solver
 from core.smt.smttranslator import SmtTranslator
-from utils.utils import ExecutionCache
-from utils.utils import InvalidAddressError
+from utils.utils import TranslationBlock
 from utils.utils import to_asm_address
-from utils.utils import to_reil_address
 
 from elftools.elf.elffile import ELFFile
 
@@ -70,7 +67,7 @@ SMT_SOLVER = "Z3"
 class BARF(object):
     """Binary Analysis Framework."""
 
-    def __init__(self, filename, load_bin=True):
+    def __init__(self, filename, load_bin=True, smt_cache=None):
         logger.info("Initializing BARF")
 
         self.name = None
@@ -92,6 +89,9 @@ class BARF(object):
         self.ws = None
         self._load_bin = load_bin
 
+        # SMT query cache (see SmtQueryCache) shared by the solvers.
+        self._smt_cache = smt_cache
+
         self._arch_mode = None
 
         self.open(filename)
@@ -187,9 +187,9 @@ class BARF(object):
 
             try:
                 if SMT_SOLVER == "Z3":
-                    self.smt_solver = Z3Solver()
+                    self.smt_solver = self._make_z3_solver()
                 elif SMT_SOLVER == "CVC4":
-                    self.smt_solver = CVC4Solver()
+                    self.smt_solver = CVC4Solver(cache=self._smt_cache)
             except SmtSolverNotFound:
                 logger.warn("{} Solver is not installed. Run 'barf-install-solvers.sh' to install it.".format(SMT_SOLVER))
 
@@ -202,6 +202,18 @@ class BARF(object):
                 self.smt_translator.set_arch_alias_mapper(self.arch_info.alias_mapper)
                 self.smt_translator.set_arch_registers_size(self.arch_info.registers_size)
 
+    def _make_z3_solver(self):
+        """Return a Z3 solver. Use the in-process one (through the z3
+        Python bindings) when available, and fall back to the z3 binary
+        otherwise.
+        """
+        try:
+            return Z3PySolver(cache=self._smt_cache)
+        except SmtSolverNotFound:
+            logger.info("z3 Python bindings are not installed, using the z3 binary.")
+
+        return Z3Solver(cache=self._smt_cache)
+
     def _setup_analysis_modules(self):
         """Set up analysis modules.
         """
@@ -456,17 +468,24 @@ class BARF(object):
         if self.binary.architecture == arch.ARCH_X86:
             self._arch_mode = self.binary.architecture_mode
 
-        execution_cache = ExecutionCache()
+        # Translated blocks by native address.
+        blocks = {}
 
+        block = None
         next_addr = start_addr
+        target_addr = None
         instr_count = 0
         asm_instr = None
         while next_addr != end_addr:
             if max_instrs and instr_count > max_instrs:
                 break
 
+            # Retrieve next block, following the links from the previous
+            # one if possible.
+            block = self.__get_block(blocks, block, next_addr, end_addr, hooks)
+
             # Process hooks.
-            if next_addr in hooks:
+            if block.hooked:
                 logger.debug("Hooking @ {:#x}".format(next_addr))
 
                 fn, param, skip, offset = hooks[next_addr]
@@ -481,40 +500,34 @@ class BARF(object):
                     if self.binary.architecture == arch.ARCH_ARM:
                         next_addr = asm_instr.address + asm_instr.size + offset
 
-                logger.debug("Continuing @ {:#x}".format(next_addr))
+                    block = self.__get_block(blocks, block, next_addr, end_addr, hooks)
 
-            try:
-                # Retrieve next instruction from the execution cache.
-                asm_instr, reil_container = execution_cache.retrieve(next_addr)
-            except InvalidAddressError:
-                # Fetch the instruction.
-                encoding = self.__fetch_instr(next_addr)
+                logger.debug("Continuing @ {:#x}".format(next_addr))
 
-                # Decode it.
-                asm_instr = self.disassembler.disassemble(encoding, next_addr,
-                                                          architecture_mode=self._arch_mode)
+            # Execute block.
+            for asm_instr, reil_instrs in block.instrs:
+                if max_instrs and instr_count > max_instrs:
+                    break
 
-                # Translate it.
-                reil_container = self.__build_reil_container(asm_instr)
+                # Update the instruction pointer.
+                self.__update_ip(asm_instr)
 
-                # Add it to the execution cache.
-                execution_cache.add(next_addr, asm_instr, reil_container)
+                # Execute instruction.
+                if print_asm:
+                    print("{:#x} {}".format(asm_instr.address, asm_instr))
 
-            # Update the instruction pointer.
-            self.__update_ip(asm_instr)
+                target_addr = self.ir_emulator.execute_sequence(reil_instrs)
 
-            # Execute instruction.
-            if print_asm:
-                print("{:#x} {}".format(asm_instr.address, asm_instr))
+                # Count instruction.
+                instr_count += 1
 
-            target_addr = self.__process_reil_container(reil_container, to_reil_address(next_addr))
+                # Leave the block on a taken branch.
+                if target_addr:
+                    break
 
             # Get next address to execute.
             next_addr = to_asm_address(target_addr) if target_addr else asm_instr.address + asm_instr.size
 
-            # Count instruction.
-            instr_count += 1
-
         context_out = {
             'registers': {},
             'memory': {}
@@ -526,52 +539,53 @@ class BARF(object):
 
         return context_out
 
-    def __process_reil_container(self, container, ip):
-        next_addr = None
+    def __get_block(self, blocks, block_prev, address, end_addr, hooks):
+        # Follow link from the previous block.
+        if block_prev and address in block_prev.successors:
+            return block_prev.successors[address]
 
-        while ip:
-            # Fetch instruction.
-            try:
-                reil_instr = container.fetch(ip)
-            except ReilContainerInvalidAddressError:
-                next_addr = ip
-                break
+        if address not in blocks:
+            blocks[address] = self.__translate_block(address, end_addr, hooks)
 
-            next_ip = self.ir_emulator.single_step(reil_instr)
+        block = blocks[address]
 
-            # Update instruction pointer.
-            ip = next_ip if next_ip else container.get_next_address(ip)
+        # Link blocks.
+        if block_prev:
+            block_prev.successors[address] = block
 
-        # Delete temporal registers.
-        regs = self.ir_emulator.registers.keys()
+        return block
 
-        for r in regs:
-            if r.startswith("t"):
-                del self.ir_emulator.registers[r]
+    def __translate_block(self, address, end_addr, hooks):
+        instrs = []
 
-        return next_addr
+        next_addr = address
 
-    def __build_reil_container(self, asm_instr):
-        reil_translator = self.ir_translator
+        while True:
+            # Fetch the instruction.
+            encoding = self.__fetch_instr(next_addr)
 
-        container = ReilContainer()
-        instr_seq = ReilSequence()
+            # Decode it.
+            asm_instr = self.disassembler.disassemble(encoding, next_addr, architecture_mode=self._arch_mode)
 
-        for reil_instr in reil_translator.translate(asm_instr):
-            instr_seq.append(reil_instr)
+            # Translate it.
+            reil_instrs = self.ir_translator.translate(asm_instr)
 
-        container.add(instr_seq)
+            instrs.append((asm_instr, reil_instrs))
 
-        return container
+            next_addr = asm_instr.address + asm_instr.size
+
+            # A block ends on a (possible) branch, at the end address or
+            # before a hooked address.
+            if any(instr.mnemonic == ReilMnemonic.JCC for instr in reil_instrs) or \
+                next_addr == end_addr or next_addr in hooks:
+                break
+
+        return TranslationBlock(address, instrs, hooked=address in hooks)
 
     def __fetch_instr(self, next_addr):
         start, end = next_addr, next_addr + self.arch_info.max_instruction_size
 
-        encoding = ""
-        for i in xrange(end - start):
-            encoding += chr(self.ir_emulator.read_memory(start + i, 1))
-
-        return encoding
+        return str(self.ir_emulator.read_memory_region(start, end - start))
 
     def __update_ip(self, asm_instr):
         if self.binary.architecture == arch.ARCH_X86:
@@ -594,8 +608,7 @@ class BARF(object):
             logger.info("Loading segment #{} ({:#x}-{:#x})".format(index, segment.header.p_vaddr,
                                                                    segment.header.p_vaddr + segment.header.p_filesz))
 
-            for i, b in enumerate(bytearray(segment.data())):
-                self.ir_emulator.write_memory(segment.header.p_vaddr + i, 1, b)
+            self.ir_emulator.write_memory_region(segment.header.p_vaddr, segment.data())
 
         f.close()
 
@@ -610,8 +623,8 @@ class BARF(object):
             logger.info("Loading section #{} ({:#x}-{:#x})".format(index, pe.OPTIONAL_HEADER.ImageBase + section.VirtualAddress,
                                                                    pe.OPTIONAL_HEADER.ImageBase + section.VirtualAddress + len(section.get_data())))
 
-            for i, b in enumerate(bytearray(section.get_data())):
-                self.ir_emulator.write_memory(pe.OPTIONAL_HEADER.ImageBase + section.VirtualAddress + i, 1, b)
+            self.ir_emulator.write_memory_region(pe.OPTIONAL_HEADER.ImageBase + section.VirtualAddress,
+                                                 section.get_data())
 
     def load_binary(self):
         try:
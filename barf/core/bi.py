@@ -90,6 +90,12 @@ class Memory(object):
 
             step = 1 if key.step is None else key.step
 
+            # Fast path, the whole range lies within a single VMA.
+            if step == 1:
+                for address, data in self.__vma:
+                    if address <= key.start and key.stop <= address + len(data):
+                        return str(data[key.start - address:key.stop - address])
+
             try:
                 # Read memory one byte at a time.
                 for addr in range(key.start, key.stop, step):
@@ -24,4 +24,5 @@
 
 from reil import *
 from reilemulator import *
+from reilbatch import *
 from reilparser import *
@@ -59,6 +59,13 @@ def split_address(address):
     return address >> 0x08, address & 0xff
 
 
+def is_temporal_register(name):
+    """Check whether a register is a REIL temporal register. Translators
+    name them "t" followed by a number (see VariableNamer).
+    """
+    return name[0] == "t" and name[1:].isdigit()
+
+
 class ReilMnemonic(object):
 
     """Enumeration of IR mnemonics.
@@ -752,41 +759,64 @@ class ReilContainerInvalidAddressError(Exception):
 class ReilContainer(object):
 
     """Reil instruction container.
+
+    Instructions are indexed by REIL address and the address of the
+    next instruction within a sequence is precomputed, so fetching an
+    instruction and computing its successor take constant time.
+    Sequences are expected to be complete when they are added.
+
     """
 
     def __init__(self):
+        # Sequences by (native) base address.
         self.__container = {}
 
+        # Instructions by REIL address.
+        self.__instrs = {}
+
+        # Next REIL address by REIL address (within a sequence).
+        self.__next = {}
+
+        # Sequences by the REIL address of their last instruction.
+        self.__last = {}
+
     def add(self, sequence):
         base_addr, _ = split_address(sequence.address)
 
-        if base_addr in self.__container.keys():
+        if base_addr in self.__container:
             raise Exception("Invalid sequence")
 
         self.__container[base_addr] = sequence
 
-    def fetch(self, address):
-        base_addr, index = split_address(address)
+        instr_prev = None
 
-        if base_addr not in self.__container.keys():
-            raise ReilContainerInvalidAddressError()
+        for instr in sequence:
+            self.__instrs[instr.address] = instr
 
-        return self.__container[base_addr].get(index)
+            if instr_prev:
+                self.__next[instr_prev.address] = instr.address
 
-    def get_next_address(self, address):
-        base_addr, index = split_address(address)
+            instr_prev = instr
+
+        if instr_prev:
+            # The next sequence address is resolved when it is requested
+            # since it can be set after the sequence is added.
+            self.__last[instr_prev.address] = sequence
+
+    def fetch(self, address):
+        if address not in self.__instrs:
+            raise ReilContainerInvalidAddressError()
 
-        if base_addr not in self.__container.keys():
-            raise Exception("Invalid address.")
+        return self.__instrs[address]
 
-        addr = address
+    def get_next_address(self, address):
+        if address in self.__next:
+            return self.__next[address]
 
-        if index < len(self.__container[base_addr]) - 1:
-            addr += 1
-        else:
-            addr = self.__container[base_addr].next_sequence_address
+        if address in self.__last:
+            return self.__last[address].next_sequence_address
 
-        return addr
+        raise Exception("Invalid address.")
 
     def dump(self):
         for base_addr in sorted(self.__container.keys()):
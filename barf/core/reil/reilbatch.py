@@ -0,0 +1,461 @@
+# Copyright (c) 2014, Fundacion Dr. Manuel Sadosky
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Batched REIL emulation.
+
+ReilBatchEmulator
+-----------------
+
+Executes a list of REIL instructions (as **ReilEmulator.execute_lite**
+does) over many register contexts at once. Each register holds one
+value per context (lane) in a NumPy vector, so every instruction is
+executed once for all lanes. Vectors are `uint64` for values that fit
+in 64 bits and Python ints (`object` vectors) for wider ones. Memory is
+kept per lane.
+
+NumPy is optional. Without it, lanes are emulated one after the other.
+
+"""
+
+import random
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from barf.core.reil.reil import ReilImmediateOperand
+from barf.core.reil.reil import ReilMnemonic
+from barf.core.reil.reil import is_temporal_register
+from barf.core.reil.reilemulator import ReilCpuInvalidInstruction
+from barf.core.reil.reilemulator import ReilCpuZeroDivisionError
+from barf.core.reil.reilemulator import ReilEmulator
+from barf.core.reil.reilemulator import ReilMemoryEx
+from barf.core.reil.reilemulator import _register_plan
+from barf.core.reil.reilemulator import _signed_div
+from barf.core.reil.reilemulator import _signed_mod
+
+
+class ReilBatchEmulator(object):
+
+    """Batched (multi-context) REIL emulator."""
+
+    def __init__(self, arch):
+        # Architecture information.
+        self.__arch = arch
+
+        # Registers (one vector per register) and lane status.
+        self.__regs = {}
+        self.__regs_written = set()
+        self.__regs_read = set()
+        self.__lanes = 0
+        self.__failed = None
+
+        # Memory (one per lane).
+        self.__mems = []
+
+        # Register access plans cache.
+        self.__regs_plans = {}
+
+        # Instruction implementation.
+        self.__executors = {
+            # Arithmetic Instructions
+            ReilMnemonic.ADD: self.__execute_binary_op,
+            ReilMnemonic.SUB: self.__execute_binary_op,
+            ReilMnemonic.MUL: self.__execute_binary_op,
+            ReilMnemonic.DIV: self.__execute_div,
+            ReilMnemonic.MOD: self.__execute_div,
+            ReilMnemonic.BSH: self.__execute_bsh,
+
+            # Bitwise Instructions
+            ReilMnemonic.AND: self.__execute_binary_op,
+            ReilMnemonic.OR:  self.__execute_binary_op,
+            ReilMnemonic.XOR: self.__execute_binary_op,
+
+            # Data Transfer Instructions
+            ReilMnemonic.LDM: self.__execute_ldm,
+            ReilMnemonic.STM: self.__execute_stm,
+            ReilMnemonic.STR: self.__execute_str,
+
+            # Conditional Instructions
+            ReilMnemonic.BISZ: self.__execute_bisz,
+            ReilMnemonic.JCC:  self.__execute_jcc,
+
+            # Other Instructions
+            ReilMnemonic.UNDEF: self.__execute_undef,
+            ReilMnemonic.UNKN:  self.__execute_unkn,
+            ReilMnemonic.NOP:   self.__execute_skip,
+
+            # Extensions
+            ReilMnemonic.SEXT: self.__execute_sext,
+            ReilMnemonic.SDIV: self.__execute_signed_op,
+            ReilMnemonic.SMOD: self.__execute_signed_op,
+        }
+
+        # Binary operations implementation.
+        self.__binary_ops = {
+            ReilMnemonic.ADD: lambda a, b: a + b,
+            ReilMnemonic.SUB: lambda a, b: a - b,
+            ReilMnemonic.MUL: lambda a, b: a * b,
+            ReilMnemonic.DIV: lambda a, b: a // b,
+            ReilMnemonic.MOD: lambda a, b: a % b,
+
+            ReilMnemonic.AND: lambda a, b: a & b,
+            ReilMnemonic.OR:  lambda a, b: a | b,
+            ReilMnemonic.XOR: lambda a, b: a ^ b,
+        }
+
+    def execute_lite(self, instructions, contexts):
+        """Execute a list of instructions once for each register context
+        (it does not support loops, as ReilEmulator.execute_lite). It
+        returns a list with a tuple (registers, memory) per context, or
+        None for the contexts whose execution raised an exception.
+        """
+        if numpy is None:
+            return self.__execute_lanes(instructions, contexts)
+
+        self.__regs = {}
+        self.__regs_written = set()
+        self.__regs_read = set()
+        self.__lanes = len(contexts)
+        self.__failed = numpy.zeros(self.__lanes, dtype=bool)
+        self.__mems = [ReilMemoryEx(self.__arch.address_size) for _ in xrange(self.__lanes)]
+
+        for name in set(name for context in contexts for name in context):
+            values = [context[name] if name in context else None for context in contexts]
+
+            self.__regs[name] = self.__init_vector(values, self.__arch.registers_size.get(name, 64))
+
+        for instr in instructions:
+            self.__executors[instr.mnemonic](instr)
+
+        results = []
+
+        for lane in xrange(self.__lanes):
+            if self.__failed[lane]:
+                results += [None]
+
+                continue
+
+            regs = dict((name, int(values[lane])) for name, values in self.__regs.items()
+                        if not is_temporal_register(name))
+
+            results += [(regs, self.__mems[lane])]
+
+        return results
+
+    # Properties
+    # ======================================================================== #
+    @property
+    def read_registers(self):
+        """Return read (native) registers in the last execution.
+        """
+        return self.__regs_read
+
+    @property
+    def written_registers(self):
+        """Return written (native) registers in the last execution.
+        """
+        return self.__regs_written
+
+    # Vector auxiliary methods
+    # ======================================================================== #
+    def __init_vector(self, values, size):
+        """Build a register vector. Missing values (None) are initialized
+        with random values.
+        """
+        values = [random.getrandbits(size) if value is None else value for value in values]
+
+        if all(value < 2**64 for value in values):
+            return numpy.array(values, dtype=numpy.uint64)
+
+        return numpy.array(values, dtype=object)
+
+    def __convert(self, values, wide):
+        """Convert a vector to the representation used to compute an
+        instruction: Python ints (wide) or uint64.
+        """
+        if wide:
+            return values if values.dtype == object else values.astype(object)
+
+        return values if values.dtype != object else values.astype(numpy.uint64)
+
+    def __const(self, value, wide):
+        return value if wide else numpy.uint64(value)
+
+    def __is_wide(self, *sizes):
+        return max(sizes) > 64
+
+    # Read/Write auxiliary methods
+    # ======================================================================== #
+    def __get_register_plan(self, name, size):
+        key = name, size
+
+        if key not in self.__regs_plans:
+            self.__regs_plans[key] = _register_plan(self.__arch, _RegisterRef(name, size))
+
+        return self.__regs_plans[key]
+
+    def __read(self, oprnd, wide):
+        if isinstance(oprnd, ReilImmediateOperand):
+            return self.__const(oprnd.immediate, wide)
+
+        _, base_register, base_size, offset, mask, _, is_native = self.__get_register_plan(oprnd.name, oprnd.size)
+
+        if base_register not in self.__regs:
+            self.__regs[base_register] = self.__init_vector([None] * self.__lanes, base_size)
+
+        base_value = self.__regs[base_register]
+        base_wide = base_value.dtype == object
+
+        value = (base_value >> self.__const(offset, base_wide)) & self.__const(mask, base_wide)
+
+        # Keep track of native register reads.
+        if is_native:
+            self.__regs_read.add(oprnd.name)
+
+        return self.__convert(value, wide)
+
+    def __write(self, oprnd, value):
+        _, base_register, base_size, offset, mask, mask_clear, is_native = self.__get_register_plan(oprnd.name, oprnd.size)
+
+        value = value & self.__const(mask, value.dtype == object)
+
+        if offset == 0 and base_size == oprnd.size:
+            # The whole base register is overwritten.
+            self.__regs[base_register] = self.__convert(value, self.__is_wide(base_size))
+        else:
+            if base_register not in self.__regs:
+                self.__regs[base_register] = self.__init_vector([None] * self.__lanes, base_size)
+
+            base_value = self.__regs[base_register]
+            base_wide = base_value.dtype == object
+
+            if not base_wide:
+                mask_clear &= 2**64 - 1
+
+            self.__regs[base_register] = (base_value & self.__const(mask_clear, base_wide)) | \
+                (self.__convert(value, base_wide) << self.__const(offset, base_wide))
+
+        # Keep track of native register writes.
+        if is_native:
+            self.__regs_written.add(oprnd.name)
+
+    def __vector(self, value, wide):
+        """Broadcast a scalar to a vector.
+        """
+        if isinstance(value, numpy.ndarray):
+            return value
+
+        return numpy.array([value] * self.__lanes, dtype=object if wide else numpy.uint64)
+
+    # Instruction implementation
+    # ======================================================================== #
+    def __execute_binary_op(self, instr):
+        oprnd0, oprnd1, oprnd2 = instr.operands
+
+        wide = self.__is_wide(oprnd0.size, oprnd1.size, oprnd2.size)
+
+        op0_val = self.__vector(self.__read(oprnd0, wide), wide)
+        op1_val = self.__read(oprnd1, wide)
+
+        self.__write(oprnd2, self.__binary_ops[instr.mnemonic](op0_val, op1_val))
+
+    def __execute_div(self, instr):
+        oprnd0, oprnd1, oprnd2 = instr.operands
+
+        wide = self.__is_wide(oprnd0.size, oprnd1.size, oprnd2.size)
+
+        op0_val = self.__vector(self.__read(oprnd0, wide), wide)
+        op1_val = self.__vector(self.__read(oprnd1, wide), wide)
+
+        # Lanes that divide by zero fail.
+        zero = op1_val == 0
+
+        self.__failed |= zero
+
+        op1_val = numpy.where(zero, self.__const(1, wide), op1_val)
+
+        self.__write(oprnd2, self.__binary_ops[instr.mnemonic](op0_val, self.__convert(op1_val, wide)))
+
+    def __execute_signed_op(self, instr):
+        oprnd0, oprnd1, oprnd2 = instr.operands
+
+        wide = self.__is_wide(oprnd2.size)
+
+        op0_val = self.__vector(self.__read(oprnd0, True), True)
+        op1_val = self.__vector(self.__read(oprnd1, True), True)
+
+        fn = _signed_div if instr.mnemonic == ReilMnemonic.SDIV else _signed_mod
+
+        values = []
+
+        for lane in xrange(self.__lanes):
+            try:
+                values += [fn(op0_val[lane], oprnd0.size, op1_val[lane], oprnd1.size, oprnd2.size)]
+            except ZeroDivisionError:
+                self.__failed[lane] = True
+
+                values += [0]
+
+        self.__write(oprnd2, self.__convert(numpy.array(values, dtype=object), wide))
+
+    def __execute_bsh(self, instr):
+        oprnd0, oprnd1, oprnd2 = instr.operands
+
+        wide = self.__is_wide(oprnd0.size, oprnd1.size, oprnd2.size)
+
+        op0_val = self.__vector(self.__read(oprnd0, wide), wide)
+        op1_val = self.__vector(self.__read(oprnd1, wide), wide)
+
+        if wide:
+            values = [a << b if b >> (oprnd1.size - 1) == 0 else a >> (2**oprnd1.size - b)
+                      for a, b in zip(op0_val, op1_val)]
+
+            self.__write(oprnd2, numpy.array(values, dtype=object))
+
+            return
+
+        # Shift amounts of 64 bits or more clear the value (NumPy shifts
+        # are taken modulo 64).
+        limit = numpy.uint64(63)
+        zero = numpy.uint64(0)
+
+        left = op1_val >> numpy.uint64(oprnd1.size - 1) == 0
+        right_amount = numpy.uint64(2**oprnd1.size & (2**64 - 1)) - op1_val
+
+        left_val = numpy.where(op1_val > limit, zero, op0_val << numpy.minimum(op1_val, limit))
+        right_val = numpy.where(right_amount > limit, zero, op0_val >> numpy.minimum(right_amount, limit))
+
+        self.__write(oprnd2, numpy.where(left, left_val, right_val))
+
+    def __execute_ldm(self, instr):
+        oprnd0, _, oprnd2 = instr.operands
+
+        addresses = self.__vector(self.__read(oprnd0, False), False)
+
+        values = []
+
+        for lane in xrange(self.__lanes):
+            if self.__failed[lane]:
+                values += [0]
+            else:
+                values += [self.__mems[lane].read(int(addresses[lane]), oprnd2.size / 8)]
+
+        self.__write(oprnd2, numpy.array(values, dtype=object))
+
+    def __execute_stm(self, instr):
+        oprnd0, _, oprnd2 = instr.operands
+
+        values = self.__vector(self.__read(oprnd0, True), True)
+        addresses = self.__vector(self.__read(oprnd2, False), False)
+
+        for lane in xrange(self.__lanes):
+            if not self.__failed[lane]:
+                self.__mems[lane].write(int(addresses[lane]), oprnd0.size / 8, values[lane])
+
+    def __execute_str(self, instr):
+        oprnd0, _, oprnd2 = instr.operands
+
+        wide = self.__is_wide(oprnd0.size, oprnd2.size)
+
+        self.__write(oprnd2, self.__vector(self.__read(oprnd0, wide), wide))
+
+    def __execute_bisz(self, instr):
+        oprnd0, _, oprnd2 = instr.operands
+
+        wide = self.__is_wide(oprnd0.size)
+
+        op0_val = self.__vector(self.__read(oprnd0, wide), wide)
+
+        self.__write(oprnd2, (op0_val == 0).astype(numpy.uint64))
+
+    def __execute_jcc(self, instr):
+        # Branches are not followed (as in ReilEmulator.execute_lite),
+        # only register reads are tracked.
+        self.__read(instr.operands[0], True)
+        self.__read(instr.operands[2], True)
+
+    def __execute_undef(self, instr):
+        oprnd2 = instr.operands[2]
+
+        values = [random.randint(0, oprnd2.size) for _ in xrange(self.__lanes)]
+
+        self.__write(oprnd2, numpy.array(values, dtype=numpy.uint64))
+
+    def __execute_unkn(self, instr):
+        self.__failed[:] = True
+
+    def __execute_skip(self, instr):
+        pass
+
+    def __execute_sext(self, instr):
+        oprnd0, _, oprnd2 = instr.operands
+
+        wide = self.__is_wide(oprnd0.size, oprnd2.size)
+
+        op0_val = self.__vector(self.__read(oprnd0, wide), wide)
+        op2_mask = self.__const((2**oprnd2.size-1) & ~(2**oprnd0.size-1), wide)
+
+        msb = (op0_val >> self.__const(oprnd0.size - 1, wide)) == 1
+
+        self.__write(oprnd2, numpy.where(msb, op0_val | op2_mask, op0_val))
+
+    # Fallback methods
+    # ======================================================================== #
+    def __execute_lanes(self, instructions, contexts):
+        """Execute lanes one by one (NumPy is not available).
+        """
+        self.__regs_written = set()
+        self.__regs_read = set()
+
+        results = []
+
+        for context in contexts:
+            # Each lane has its own memory.
+            emulator = ReilEmulator(self.__arch)
+
+            try:
+                regs, mem = emulator.execute_lite(instructions, context=dict(context))
+                results += [(regs, mem)]
+            except (ZeroDivisionError, ReilCpuZeroDivisionError, ReilCpuInvalidInstruction):
+                results += [None]
+
+            self.__regs_read |= emulator.read_registers
+            self.__regs_written |= emulator.written_registers
+
+        return results
+
+
+class _RegisterRef(object):
+
+    """A register name and size (as needed by _register_plan)."""
+
+    __slots__ = ['name', 'size']
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
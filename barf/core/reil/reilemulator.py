@@ -41,20 +41,28 @@ beginning to end not considering branches.
 ReilMemory
 ----------
 
-Byte addressable memory based on a dictionary.
+Byte addressable memory based on a page table of bytearrays.
+
+ReilCompiler
+------------
+
+Compiles the REIL translation of a native instruction into a Python
+function, which is used instead of the interpreter by
+**execute_sequence** (when JIT is enabled).
 
 """
 
+import binascii
 import logging
 import random
+import struct
 
 from barf.core.reil.reil import ReilImmediateOperand
 from barf.core.reil.reil import ReilMnemonic
 from barf.core.reil.reil import ReilRegisterOperand
 from barf.core.reil.reil import ReilContainerInvalidAddressError
+from barf.core.reil.reil import is_temporal_register
 from barf.utils.utils import extract_sign_bit
-from barf.utils.utils import extract_value
-from barf.utils.utils import insert_value
 from barf.utils.utils import twos_complement
 
 logger = logging.getLogger("reilemulator")
@@ -65,10 +73,65 @@ DEBUG = False
 REIL_MEMORY_ENDIANNESS_LE = 0x0     # Little Endian
 REIL_MEMORY_ENDIANNESS_BE = 0x1     # Big Endian
 
+REIL_MEMORY_PAGE_SHIFT = 12
+REIL_MEMORY_PAGE_SIZE = 1 << REIL_MEMORY_PAGE_SHIFT
+REIL_MEMORY_PAGE_MASK = REIL_MEMORY_PAGE_SIZE - 1
+
+# Word-sized accesses are resolved through the struct module.
+_REIL_MEMORY_WORD_FORMATS = {
+    1: struct.Struct("<B"),
+    2: struct.Struct("<H"),
+    4: struct.Struct("<I"),
+    8: struct.Struct("<Q"),
+}
+
+_REIL_MEMORY_WORD_MASKS = {
+    1: 2**8 - 1,
+    2: 2**16 - 1,
+    4: 2**32 - 1,
+    8: 2**64 - 1,
+}
+
+
+def _bytes_to_int(buffer):
+    """Convert a little endian buffer into an integer.
+    """
+    return int(binascii.hexlify(bytes(buffer[::-1])), 16)
+
+
+def _int_to_bytes(value, size):
+    """Convert an integer into a little endian buffer of the given size.
+    """
+    return bytearray(binascii.unhexlify("%0*x" % (size * 2, value & (2**(size * 8) - 1))))[::-1]
+
+
+def _split_region(address, size):
+    """Split a memory region into page chunks. It returns a list of
+    tuples of the form (page number, offset, size).
+    """
+    chunks = []
+
+    while size > 0:
+        offset = address & REIL_MEMORY_PAGE_MASK
+        chunk_size = min(REIL_MEMORY_PAGE_SIZE - offset, size)
+
+        chunks.append((address >> REIL_MEMORY_PAGE_SHIFT, offset, chunk_size))
+
+        address += chunk_size
+        size -= chunk_size
+
+    return chunks
+
 
 class ReilMemory(object):
 
     """A REIL memory model (byte addressable).
+
+    Memory is organized in pages of REIL_MEMORY_PAGE_SIZE bytes, each
+    one backed by a bytearray. Accesses that fall within a single page
+    are resolved with one slice (or struct) operation, accesses that
+    cross a page boundary are resolved byte by byte.
+
     """
 
     def __init__(self, address_size):
@@ -83,56 +146,249 @@ class ReilMemory(object):
         # Memory's endianness.
         self.__endianness = REIL_MEMORY_ENDIANNESS_LE
 
-        # Dictionary that implements the memory itself.
-        self._memory = {}
+        # Page table. It maps page numbers to page content.
+        self._pages = {}
+
+        # It maps page numbers to a bytearray that marks which bytes of
+        # the page were accessed (initialized) so far.
+        self._pages_valid = {}
+
+        # Pages that are not shared with a snapshot, i.e., pages that
+        # can be modified in place.
+        self._pages_owned = set()
 
     # Read methods
     # ======================================================================== #
     def read(self, address, size):
         """Read arbitrary size content from memory.
         """
-        value = 0x0
+        offset = address & REIL_MEMORY_PAGE_MASK
 
-        for i in xrange(0, size):
-            value |= self._read_byte(address + i) << (i * 8)
+        # Cross-page access, read it byte by byte.
+        if offset + size > REIL_MEMORY_PAGE_SIZE:
+            value = 0x0
 
-        return value
+            for i in xrange(0, size):
+                value |= self._read_byte(address + i) << (i * 8)
+
+            return value
+
+        page_number = address >> REIL_MEMORY_PAGE_SHIFT
+
+        if page_number not in self._pages_owned:
+            self._own_page(page_number)
+
+        page = self._pages[page_number]
+
+        # Mark memory locations as initialized.
+        self._pages_valid[page_number][offset:offset + size] = b"\x01" * size
+
+        if size in _REIL_MEMORY_WORD_FORMATS:
+            return _REIL_MEMORY_WORD_FORMATS[size].unpack_from(page, offset)[0]
+
+        return _bytes_to_int(page[offset:offset + size])
+
+    def read_region(self, address, size):
+        """Read a memory region. It returns a bytearray.
+        """
+        buffer = bytearray()
+
+        for page_number, offset, chunk_size in _split_region(address, size):
+            if page_number not in self._pages_owned:
+                self._own_page(page_number)
+
+            buffer += self._pages[page_number][offset:offset + chunk_size]
+
+            # Mark memory locations as initialized.
+            self._pages_valid[page_number][offset:offset + chunk_size] = b"\x01" * chunk_size
+
+        return buffer
+
+    def read_string(self, address, max_length):
+        """Read a NUL-terminated string (of at most max_length bytes).
+        It returns a bytearray, without the terminator. Only the bytes
+        up to the terminator are accessed.
+        """
+        buffer = bytearray()
+
+        for page_number, offset, chunk_size in _split_region(address, max_length):
+            if page_number not in self._pages_owned:
+                self._own_page(page_number)
+
+            chunk = self._pages[page_number][offset:offset + chunk_size]
+            end = chunk.find(b"\x00")
+
+            if end != -1:
+                chunk_size = end + 1
+
+            buffer += chunk[:end] if end != -1 else chunk
+
+            # Mark memory locations as initialized.
+            self._pages_valid[page_number][offset:offset + chunk_size] = b"\x01" * chunk_size
+
+            if end != -1:
+                break
+
+        return buffer
 
     def _read_byte(self, address):
         """Read a byte from memory.
         """
-        # Initialize memory location with a random value.
-        if address not in self._memory:
-            self._memory[address] = random.randint(0x00, 0xff)
+        page_number, offset = address >> REIL_MEMORY_PAGE_SHIFT, address & REIL_MEMORY_PAGE_MASK
+
+        # Uninitialized memory locations hold random values.
+        if page_number not in self._pages_owned:
+            self._own_page(page_number)
 
-        return self._memory[address]
+        self._pages_valid[page_number][offset] = 0x1
+
+        return self._pages[page_number][offset]
 
     # Write methods
     # ======================================================================== #
     def write(self, address, size, value):
         """Write arbitrary size content to memory.
         """
-        for i in xrange(0, size):
-            self.__write_byte(address + i, (value >> (i * 8)) & 0xff)
+        offset = address & REIL_MEMORY_PAGE_MASK
+
+        # Cross-page access, write it byte by byte.
+        if offset + size > REIL_MEMORY_PAGE_SIZE:
+            for i in xrange(0, size):
+                addr = address + i
+
+                self._write_page(addr >> REIL_MEMORY_PAGE_SHIFT, addr & REIL_MEMORY_PAGE_MASK, 1,
+                                 (value >> (i * 8)) & 0xff)
+
+            return
+
+        self._write_page(address >> REIL_MEMORY_PAGE_SHIFT, offset, size, value)
 
-    def __write_byte(self, address, value):
-        """Write byte in memory.
+    def write_region(self, address, buffer):
+        """Write a buffer (str or bytearray) into memory. The buffer is
+        copied one page at a time.
         """
-        self._memory[address] = value & 0xff
+        buffer_offset = 0
+
+        for page_number, offset, chunk_size in _split_region(address, len(buffer)):
+            self._write_page_buffer(page_number, offset, buffer[buffer_offset:buffer_offset + chunk_size])
+
+            buffer_offset += chunk_size
+
+    def _write_page(self, page_number, offset, size, value):
+        """Write content within the boundaries of a page.
+        """
+        if page_number not in self._pages_owned:
+            self._own_page(page_number)
+
+        page = self._pages[page_number]
+
+        if size in _REIL_MEMORY_WORD_FORMATS:
+            _REIL_MEMORY_WORD_FORMATS[size].pack_into(page, offset, value & _REIL_MEMORY_WORD_MASKS[size])
+        else:
+            page[offset:offset + size] = _int_to_bytes(value, size)
+
+        # Mark memory locations as initialized.
+        self._pages_valid[page_number][offset:offset + size] = b"\x01" * size
+
+    def _write_page_buffer(self, page_number, offset, buffer):
+        """Write a buffer within the boundaries of a page.
+        """
+        if page_number not in self._pages_owned:
+            self._own_page(page_number)
+
+        size = len(buffer)
+
+        self._pages[page_number][offset:offset + size] = buffer
+
+        # Mark memory locations as initialized.
+        self._pages_valid[page_number][offset:offset + size] = b"\x01" * size
 
     # Misc methods
     # ======================================================================== #
     def reset(self):
-        # Dictionary that implements the memory itself.
-        self._memory = {}
+        # Page table.
+        self._pages = {}
+        self._pages_valid = {}
+        self._pages_owned = set()
+
+    def snapshot(self):
+        """Take a snapshot of the memory. Pages are shared between the
+        memory and the snapshot, they are copied on write.
+        """
+        self._pages_owned = set()
+
+        return {
+            "pages": dict(self._pages),
+            "pages_valid": dict(self._pages_valid),
+        }
+
+    def restore(self, snapshot):
+        """Restore memory from a snapshot.
+        """
+        self._pages = dict(snapshot["pages"])
+        self._pages_valid = dict(snapshot["pages_valid"])
+        self._pages_owned = set()
+
+    def is_valid(self, address, size=1):
+        """Check whether a memory range was accessed before.
+        """
+        for i in xrange(0, size):
+            page_number = (address + i) >> REIL_MEMORY_PAGE_SHIFT
+
+            if page_number not in self._pages_valid or \
+                self._pages_valid[page_number][(address + i) & REIL_MEMORY_PAGE_MASK] == 0x0:
+                return False
+
+        return True
+
+    def _allocate_page(self, page_number):
+        """Allocate a new page. Its content is initialized with random
+        values (taken from the random module, so they can be reproduced
+        by seeding it).
+        """
+        self._pages[page_number] = _int_to_bytes(random.getrandbits(8 * REIL_MEMORY_PAGE_SIZE),
+                                                 REIL_MEMORY_PAGE_SIZE)
+        self._pages_valid[page_number] = bytearray(REIL_MEMORY_PAGE_SIZE)
+        self._pages_owned.add(page_number)
+
+    def _own_page(self, page_number):
+        """Make a page writable. A page shared with a snapshot is copied,
+        a non-existent one is allocated.
+        """
+        if page_number not in self._pages:
+            self._allocate_page(page_number)
+
+            return
+
+        self._pages[page_number] = bytearray(self._pages[page_number])
+        self._pages_valid[page_number] = bytearray(self._pages_valid[page_number])
+        self._pages_owned.add(page_number)
+
+    def _iter_addresses(self):
+        """Iterate over all accessed memory locations (in ascending
+        order).
+        """
+        for page_number in sorted(self._pages_valid.keys()):
+            base_addr = page_number << REIL_MEMORY_PAGE_SHIFT
+            valid = self._pages_valid[page_number]
+
+            offset = valid.find(b"\x01")
+
+            while offset != -1:
+                yield base_addr + offset
+
+                offset = valid.find(b"\x01", offset + 1)
 
     # Magic methods
     # ======================================================================== #
+    def __contains__(self, address):
+        return self.is_valid(address)
+
     def __str__(self):
         lines = []
 
-        for addr in sorted(self._memory.keys()):
-            lines += ["0x%08x : 0x%08x" % (addr, self._memory[addr])]
+        for addr in self._iter_addresses():
+            lines += ["0x%08x : 0x%08x" % (addr, self.read(addr, 1))]
 
         return "\n".join(lines)
 
@@ -144,8 +400,10 @@ class ReilMemoryEx(ReilMemory):
     def __init__(self, address_size):
         super(ReilMemoryEx, self).__init__(address_size)
 
-        # Previous state of memory.
-        self.__memory_prev = {}
+        # Previous state of memory (paged, as the memory itself).
+        self.__pages_prev = {}
+        self.__pages_prev_valid = {}
+        self.__pages_prev_owned = set()
 
         # Write operations counter.
         self.__write_count = 0
@@ -157,24 +415,23 @@ class ReilMemoryEx(ReilMemory):
         value.
 
         """
-        addr_candidates = [addr for addr, val in self._memory.items() if val == (value & 0xff)]
+        value &= 2**(size * 8) - 1
+        pattern = bytearray([value & 0xff])
         addr_matches = []
 
-        for addr in addr_candidates:
-            match = True
+        for page_number in sorted(self._pages.keys()):
+            base_addr = page_number << REIL_MEMORY_PAGE_SHIFT
+            page = self._pages[page_number]
 
-            for i in xrange(0, size):
-                byte_curr = (value >> (i * 8)) & 0xff
-                try:
-                    match = self._memory[addr + i] == byte_curr
-                except KeyError:
-                    match = False
+            offset = page.find(pattern)
+
+            while offset != -1:
+                success, val = self.try_read(base_addr + offset, size)
 
-                if not match:
-                    break
+                if success and val == value:
+                    addr_matches += [base_addr + offset]
 
-            if match:
-                addr_matches += [addr]
+                offset = page.find(pattern, offset + 1)
 
         return addr_matches
 
@@ -185,17 +442,10 @@ class ReilMemoryEx(ReilMemory):
         (False, None). Otherwise, it returns (True, memory content).
 
         """
-        value = 0x0
-
-        for i in xrange(0, size):
-            addr = address + i
-
-            if addr in self._memory:
-                value |= self._read_byte(addr) << (i * 8)
-            else:
-                return False, None
+        if not self.is_valid(address, size):
+            return False, None
 
-        return True, value
+        return True, self.read(address, size)
 
     def try_read_prev(self, address, size):
         """Try to read previous memory content at specified address.
@@ -207,14 +457,13 @@ class ReilMemoryEx(ReilMemory):
         value = 0x0
 
         for i in xrange(0, size):
-            addr = address + i
+            success, val_byte = self.__try_read_byte_prev(address + i)
 
-            if addr in self.__memory_prev:
-                _, val_byte = self.__try_read_byte_prev(addr)
-                value |= val_byte << (i * 8)
-            else:
+            if not success:
                 return False, None
 
+            value |= val_byte << (i * 8)
+
         return True, value
 
     def __try_read_byte_prev(self, address):
@@ -224,30 +473,67 @@ class ReilMemoryEx(ReilMemory):
         (False, None) otherwise.
 
         """
-        # Initialize memory location with a random value
-        if address not in self.__memory_prev:
+        page_number, offset = address >> REIL_MEMORY_PAGE_SHIFT, address & REIL_MEMORY_PAGE_MASK
+
+        if page_number not in self.__pages_prev or \
+            self.__pages_prev_valid[page_number][offset] == 0x0:
             return False, None
 
-        return True, self.__memory_prev[address]
+        return True, self.__pages_prev[page_number][offset]
 
     # Write methods
     # ======================================================================== #
     def write(self, address, size, value):
         """Write arbitrary size content to memory.
         """
-        for i in xrange(0, size):
-            self.__write_byte(address + i, (value >> (i * 8)) & 0xff)
+        super(ReilMemoryEx, self).write(address, size, value)
 
         self.__write_count += 1
 
-    def __write_byte(self, address, value):
-        """Write byte in memory.
+    def write_region(self, address, buffer):
+        """Write a buffer (str or bytearray) into memory. The buffer is
+        copied one page at a time.
+        """
+        super(ReilMemoryEx, self).write_region(address, buffer)
+
+        self.__write_count += 1
+
+    def _write_page(self, page_number, offset, size, value):
+        """Write content within the boundaries of a page.
+        """
+        self.__save_prev(page_number, offset, size)
+
+        super(ReilMemoryEx, self)._write_page(page_number, offset, size, value)
+
+    def _write_page_buffer(self, page_number, offset, buffer):
+        """Write a buffer within the boundaries of a page.
         """
-        # Save previous address content.
-        if address in self._memory:
-            self.__memory_prev[address] = self._memory[address]
+        self.__save_prev(page_number, offset, len(buffer))
 
-        self._memory[address] = value & 0xff
+        super(ReilMemoryEx, self)._write_page_buffer(page_number, offset, buffer)
+
+    def __save_prev(self, page_number, offset, size):
+        """Save previous content of a page range. Note that only
+        initialized locations are saved (locations that were not
+        initialized are not valid in the previous state either).
+        """
+        if page_number not in self._pages:
+            return
+
+        if page_number not in self.__pages_prev_owned:
+            if page_number in self.__pages_prev:
+                self.__pages_prev[page_number] = bytearray(self.__pages_prev[page_number])
+                self.__pages_prev_valid[page_number] = bytearray(self.__pages_prev_valid[page_number])
+            else:
+                self.__pages_prev[page_number] = bytearray(REIL_MEMORY_PAGE_SIZE)
+                self.__pages_prev_valid[page_number] = bytearray(REIL_MEMORY_PAGE_SIZE)
+
+            self.__pages_prev_owned.add(page_number)
+
+        end = offset + size
+
+        self.__pages_prev[page_number][offset:end] = self._pages[page_number][offset:end]
+        self.__pages_prev_valid[page_number][offset:end] = self._pages_valid[page_number][offset:end]
 
     # Misc methods
     # ======================================================================== #
@@ -255,15 +541,44 @@ class ReilMemoryEx(ReilMemory):
         super(ReilMemoryEx, self).reset()
 
         # Previous state of memory.
-        self.__memory_prev = {}
+        self.__pages_prev = {}
+        self.__pages_prev_valid = {}
+        self.__pages_prev_owned = set()
 
         # Write operations counter.
         self.__write_count = 0
 
+    def snapshot(self):
+        """Take a snapshot of the memory. Pages are shared between the
+        memory and the snapshot, they are copied on write.
+        """
+        snapshot = super(ReilMemoryEx, self).snapshot()
+
+        self.__pages_prev_owned = set()
+
+        snapshot.update({
+            "pages_prev": dict(self.__pages_prev),
+            "pages_prev_valid": dict(self.__pages_prev_valid),
+            "write_count": self.__write_count,
+        })
+
+        return snapshot
+
+    def restore(self, snapshot):
+        """Restore memory from a snapshot.
+        """
+        super(ReilMemoryEx, self).restore(snapshot)
+
+        self.__pages_prev = dict(snapshot["pages_prev"])
+        self.__pages_prev_valid = dict(snapshot["pages_prev_valid"])
+        self.__pages_prev_owned = set()
+
+        self.__write_count = snapshot["write_count"]
+
     def get_addresses(self):
         """Get accessed addresses.
         """
-        return self._memory.keys()
+        return list(self._iter_addresses())
 
     def get_write_count(self):
         """Get number of write operations performed on the memory.
@@ -271,6 +586,72 @@ class ReilMemoryEx(ReilMemory):
         return self.__write_count
 
 
+def _register_plan(arch, register):
+    """Compute the access plan of a register operand. A plan is a tuple
+    (is temporal, base register, base size, offset, mask, clear mask,
+    is native).
+    """
+    if register.name in arch.alias_mapper:
+        base_register, offset = arch.alias_mapper[register.name]
+        base_size = arch.registers_size[base_register]
+    else:
+        base_register, offset = register.name, 0
+        base_size = register.size
+
+    mask = 2**register.size - 1
+
+    return (
+        is_temporal_register(register.name),
+        base_register,
+        base_size,
+        offset,
+        mask,
+        ~(mask << offset),
+        register.name in arch.registers_gp_all
+    )
+
+
+def _init_register(regs, name, size):
+    """Initialize a register with a random value.
+    """
+    value = regs[name] = random.getrandbits(size)
+
+    return value
+
+
+def _signed_div(op0_val, op0_size, op1_val, op1_size, result_size):
+    op0_sign = op0_val >> op0_size-1
+    op1_sign = op1_val >> op1_size-1
+    result_sign = op0_sign ^ op1_sign
+
+    if op0_sign == 0x1:
+        op0_tmp = twos_complement(op0_val, op0_size)
+    else:
+        op0_tmp = op0_val
+
+    if op1_sign == 0x1:
+        op1_tmp = twos_complement(op1_val, op1_size)
+    else:
+        op1_tmp = op1_val
+
+    result_tmp = op0_tmp / op1_tmp
+
+    if result_sign == 0x1:
+        result = twos_complement(result_tmp, result_size)
+    else:
+        result = result_tmp
+
+    return result & (2**result_size-1)
+
+
+def _signed_mod(op0_val, op0_size, op1_val, op1_size, result_size):
+    quotient = _signed_div(op0_val, op0_size, op1_val, op1_size, result_size)
+
+    remainder = op0_val - (op1_val * quotient)
+
+    return remainder & (2**result_size-1)
+
+
 class ReilCpuZeroDivisionError(Exception):
     pass
 
@@ -303,9 +684,24 @@ class ReilCpu(object):
         self.__regs_written = set()
         self.__regs_read = set()
 
+        # Temporal registers (they only live within the translation of
+        # a native instruction).
+        self.__regs_temp = dict()
+
+        # Register access plans cache. It maps (register name, register
+        # size) to a precomputed access plan (see __get_register_plan).
+        self.__regs_plans = dict()
+
         # Instructions pre and post handlers.
         self.__instr_handler_pre = None, None
         self.__instr_handler_post = None, None
+        self.__instr_handlers_set = False
+
+        # REIL compiler and compiled code cache. The cache maps the
+        # address of a sequence to a tuple (sequence, taint enabled,
+        # compiled code).
+        self.__compiler = ReilCompiler(self.__arch, self.__mem, self.__tainter)
+        self.__code_cache = dict()
 
         # Instruction implementation.
         self.__executors = {
@@ -342,6 +738,19 @@ class ReilCpu(object):
             ReilMnemonic.SMOD: self.__execute_binary_op,
         }
 
+        # Binary operations implementation.
+        self.__binary_ops = {
+            ReilMnemonic.ADD: lambda a, b: a + b,
+            ReilMnemonic.SUB: lambda a, b: a - b,
+            ReilMnemonic.MUL: lambda a, b: a * b,  # unsigned multiplication
+            ReilMnemonic.DIV: lambda a, b: a / b,  # unsigned division
+            ReilMnemonic.MOD: lambda a, b: a % b,  # unsigned modulo
+
+            ReilMnemonic.AND: lambda a, b: a & b,
+            ReilMnemonic.OR:  lambda a, b: a | b,
+            ReilMnemonic.XOR: lambda a, b: a ^ b,
+        }
+
         self.__set_default_handlers()
 
     def execute(self, instr):
@@ -358,7 +767,8 @@ class ReilCpu(object):
         next_addr = self.__executors[instr.mnemonic](instr)
 
         # Taint instruction
-        self.__tainter.taint(instr)
+        if self.__tainter.enabled:
+            self.__tainter.taint(instr)
 
         # Execute post instruction handlers
         handler_fn_post, handler_param_post = self.__instr_handler_post
@@ -366,18 +776,65 @@ class ReilCpu(object):
 
         return next_addr
 
+    def execute_sequence(self, instrs, compiled=True):
+        """Execute the REIL translation of a native instruction, either
+        compiled or interpreted. Temporal registers are discarded
+        afterwards. Return the address (REIL) control is transferred to
+        in case it leaves the sequence, None otherwise.
+        """
+        code = self.__get_code(instrs) if compiled else None
+
+        if code:
+            next_addr = code(self.__regs, self.__regs_temp, self.__regs_read, self.__regs_written)
+        else:
+            next_addr = self.__interpret_sequence(instrs)
+
+        self.__regs_temp = dict()
+
+        return next_addr
+
+    def invalidate_code(self, address=None):
+        """Discard compiled code of the sequence at the specified
+        address (REIL), or all of it if no address is given.
+        """
+        if address is None:
+            self.__code_cache = dict()
+        elif address in self.__code_cache:
+            del self.__code_cache[address]
+
     def reset(self):
         # Registers.
         self.__regs = dict()
         self.__regs_written = set()
         self.__regs_read = set()
 
+        # Temporal registers.
+        self.__regs_temp = dict()
+
         # Instructions pre and post handlers.
         self.__instr_handler_pre = None, None
         self.__instr_handler_post = None, None
 
         self.__set_default_handlers()
 
+    def snapshot(self):
+        """Take a snapshot of the cpu state (handlers are not included).
+        """
+        return {
+            "registers": dict(self.__regs),
+            "registers_temp": dict(self.__regs_temp),
+            "registers_written": set(self.__regs_written),
+            "registers_read": set(self.__regs_read),
+        }
+
+    def restore(self, snapshot):
+        """Restore cpu state from a snapshot.
+        """
+        self.__regs = dict(snapshot["registers"])
+        self.__regs_temp = dict(snapshot["registers_temp"])
+        self.__regs_written = set(snapshot["registers_written"])
+        self.__regs_read = set(snapshot["registers_read"])
+
     # Properties
     # ======================================================================== #
     @property
@@ -387,6 +844,11 @@ class ReilCpu(object):
     @registers.setter
     def registers(self, value):
         self.__regs = value
+        self.__regs_temp = dict()
+
+    @property
+    def temporal_registers(self):
+        return self.__regs_temp
 
     @property
     def memory(self):
@@ -396,6 +858,10 @@ class ReilCpu(object):
     def memory(self, value):
         self.__mem = value
 
+        # Compiled code accesses memory directly, compile it again.
+        self.__compiler.memory = value
+        self.__code_cache = dict()
+
     @property
     def read_registers(self):
         return self.__regs_read
@@ -404,13 +870,23 @@ class ReilCpu(object):
     def written_registers(self):
         return self.__regs_written
 
+    # Temporal registers methods
+    # ======================================================================== #
+    def clear_temporal_registers(self):
+        """Discard all temporal registers. Meant to be called between
+        native instructions.
+        """
+        self.__regs_temp = dict()
+
     # Instruction's handler methods
     # ======================================================================== #
     def set_instruction_pre_handler(self, func, parameter):
         self.__instr_handler_pre = (func, parameter)
+        self.__instr_handlers_set = True
 
     def set_instruction_post_handler(self, func, parameter):
         self.__instr_handler_post = (func, parameter)
+        self.__instr_handlers_set = True
 
     # Instruction's handler auxiliary methods
     # ======================================================================== #
@@ -419,6 +895,45 @@ class ReilCpu(object):
 
         self.__instr_handler_pre = (empty_fn, empty_param)
         self.__instr_handler_post = (empty_fn, empty_param)
+        self.__instr_handlers_set = False
+
+    # Sequence execution auxiliary methods
+    # ======================================================================== #
+    def __get_code(self, instrs):
+        # Compiled code does not call instruction handlers nor print
+        # debug information.
+        if DEBUG or self.__instr_handlers_set:
+            return None
+
+        address = instrs[0].address
+        taint = self.__tainter.enabled
+
+        # Compile the sequence if it was not compiled before, if it was
+        # retranslated (new list of instructions) or if taint
+        # propagation was enabled/disabled since then.
+        if address not in self.__code_cache or self.__code_cache[address][0] is not instrs or \
+            self.__code_cache[address][1] != taint:
+            self.__code_cache[address] = instrs, taint, self.__compiler.compile(instrs, taint=taint)
+
+        return self.__code_cache[address][2]
+
+    def __interpret_sequence(self, instrs):
+        base_addr = instrs[0].address >> 8
+        index = 0
+
+        while True:
+            next_addr = self.execute(instrs[index])
+
+            if not next_addr:
+                index += 1
+
+                if index == len(instrs):
+                    return None
+            elif next_addr >> 8 == base_addr and (next_addr & 0xff) < len(instrs):
+                # Jump within the sequence.
+                index = next_addr & 0xff
+            else:
+                return next_addr
 
     # Read/Write methods
     # ======================================================================== #
@@ -454,56 +969,65 @@ class ReilCpu(object):
 
     # Read/Write auxiliary methods
     # ======================================================================== #
-    def __get_register_info(self, register):
-        if register.name in self.__arch.alias_mapper:
-            base_register, offset = self.__arch.alias_mapper[register.name]
-            base_size = self.__arch.registers_size[base_register]
-        else:
-            base_register, offset = register.name, 0
-            base_size = register.size
+    def __get_register_plan(self, register):
+        """Return the access plan of a register operand (see
+        _register_plan). Plans are computed once per register name and
+        size.
+        """
+        key = register.name, register.size
 
-        return base_register, base_size, offset
+        if key not in self.__regs_plans:
+            self.__regs_plans[key] = _register_plan(self.__arch, register)
 
-    def __get_register_value(self, register):
-        base_register, base_size, offset = self.__get_register_info(register)
+        return self.__regs_plans[key]
 
-        if base_register not in self.__regs:
-            self.__regs[base_register] = random.randint(0, 2**base_size - 1)
+    def __read_register(self, register):
+        is_temp, base_register, base_size, offset, mask, _, is_native = self.__get_register_plan(register)
 
-        base_value = self.__regs[base_register]
+        regs = self.__regs_temp if is_temp else self.__regs
 
-        return base_register, base_value, offset
+        if base_register not in regs:
+            regs[base_register] = random.getrandbits(base_size)
 
-    def __read_register(self, register):
-        base_register, base_value, offset = self.__get_register_value(register)
-        value = extract_value(base_value, offset, register.size)
+        base_value = regs[base_register]
+
+        value = (base_value >> offset) & mask
 
         # Keep track of native register reads.
-        if register.name in self.__arch.registers_gp_all:
+        if is_native:
             self.__regs_read.add(register.name)
 
         if DEBUG:
-            self.__debug_read_operand(base_register, register.name, value)
+            self.__debug_read_operand(base_register, base_value, register.name, value)
 
         return value
 
     def __write_register(self, register, value):
-        base_register, base_value, offset = self.__get_register_value(register)
-        base_value_new = insert_value(base_value, value, offset, register.size)
+        is_temp, base_register, base_size, offset, mask, mask_clear, is_native = self.__get_register_plan(register)
+
+        regs = self.__regs_temp if is_temp else self.__regs
+
+        if offset == 0 and base_size == register.size:
+            # The whole base register is overwritten.
+            base_value_new = value & mask
+        else:
+            if base_register not in regs:
+                regs[base_register] = random.getrandbits(base_size)
+
+            base_value_new = (regs[base_register] & mask_clear) | ((value & mask) << offset)
 
-        self.__regs[base_register] = base_value_new
+        regs[base_register] = base_value_new
 
         # Keep track of native register writes.
-        if register.name in self.__arch.registers_gp_all:
+        if is_native:
             self.__regs_written.add(register.name)
 
         if DEBUG:
-            self.__debug_write_operand(base_register, register.name, value)
+            self.__debug_write_operand(base_register, base_value_new, register.name, value)
 
     # Debug methods
     # ======================================================================== #
-    def __debug_read_operand(self, base_register, register, value):
-        base_value = self.__regs[base_register]
+    def __debug_read_operand(self, base_register, base_value, register, value):
         taint = "T" if self.__tainter.get_register_taint(register) else "-"
 
         params = {
@@ -520,8 +1044,7 @@ class ReilCpu(object):
 
         print(fmt.format(**params))
 
-    def __debug_write_operand(self, base_register, register, value):
-        base_value = self.__regs[base_register]
+    def __debug_write_operand(self, base_register, base_value, register, value):
         taint = "T" if self.__tainter.get_register_taint(register) else "-"
 
         params = {
@@ -596,51 +1119,15 @@ class ReilCpu(object):
         op0_val = self.read_operand(oprnd0)
         op1_val = self.read_operand(oprnd1)
 
-        op0_sign = op0_val >> oprnd0.size-1
-        op1_sign = op1_val >> oprnd1.size-1
-        result_sign = op0_sign ^ op1_sign
-
-        if op0_sign == 0x1:
-            op0_tmp = twos_complement(op0_val, oprnd0.size)
-        else:
-            op0_tmp = op0_val
-
-        if op1_sign == 0x1:
-            op1_tmp = twos_complement(op1_val, oprnd1.size)
-        else:
-            op1_tmp = op1_val
-
-        result_tmp = op0_tmp / op1_tmp
-
-        if result_sign == 0x1:
-            result = twos_complement(result_tmp, result_size)
-        else:
-            result = result_tmp
-
-        return result & (2**result_size-1)
+        return _signed_div(op0_val, oprnd0.size, op1_val, oprnd1.size, result_size)
 
     def __signed_mod(self, oprnd0, oprnd1, result_size):
         op0_val = self.read_operand(oprnd0)
         op1_val = self.read_operand(oprnd1)
-        quotient = self.__signed_div(oprnd0, oprnd1, result_size)
-
-        remainder = op0_val - (op1_val * quotient)
 
-        return remainder & (2**result_size-1)
+        return _signed_mod(op0_val, oprnd0.size, op1_val, oprnd1.size, result_size)
 
     def __execute_binary_op(self, instr):
-        op_map = {
-            ReilMnemonic.ADD: lambda a, b: a + b,
-            ReilMnemonic.SUB: lambda a, b: a - b,
-            ReilMnemonic.MUL: lambda a, b: a * b,  # unsigned multiplication
-            ReilMnemonic.DIV: lambda a, b: a / b,  # unsigned division
-            ReilMnemonic.MOD: lambda a, b: a % b,  # unsigned modulo
-
-            ReilMnemonic.AND: lambda a, b: a & b,
-            ReilMnemonic.OR:  lambda a, b: a | b,
-            ReilMnemonic.XOR: lambda a, b: a ^ b,
-        }
-
         op0_val = self.read_operand(instr.operands[0])
         op1_val = self.read_operand(instr.operands[1])
 
@@ -652,7 +1139,7 @@ class ReilCpu(object):
         elif instr.mnemonic in [ReilMnemonic.SMOD]:
             op2_val = self.__signed_mod(instr.operands[0], instr.operands[1], instr.operands[2].size)
         else:
-            op2_val = op_map[instr.mnemonic](op0_val, op1_val)
+            op2_val = self.__binary_ops[instr.mnemonic](op0_val, op1_val)
 
         self.write_operand(instr.operands[2], op2_val)
 
@@ -761,6 +1248,485 @@ class ReilCpu(object):
         return None
 
 
+class ReilCompiler(object):
+
+    """Compile the REIL translation of a native instruction into a
+    Python function.
+
+    Operands are bound at compile time: temporal registers become local
+    variables, masks and immediates become constants and there is no
+    dispatch on the instruction mnemonic. Instruction handlers are not
+    called by compiled code.
+
+    """
+
+    def __init__(self, arch, memory, tainter):
+        # Architecture information.
+        self.__arch = arch
+
+        # Reil memory instance.
+        self.__mem = memory
+
+        # Reil tainter instance.
+        self.__tainter = tainter
+
+        # Instruction code generators.
+        self.__generators = {
+            # Arithmetic Instructions
+            ReilMnemonic.ADD: self.__generate_binary_op,
+            ReilMnemonic.SUB: self.__generate_binary_op,
+            ReilMnemonic.MUL: self.__generate_binary_op,
+            ReilMnemonic.DIV: self.__generate_div,
+            ReilMnemonic.MOD: self.__generate_div,
+            ReilMnemonic.BSH: self.__generate_bsh,
+
+            # Bitwise Instructions
+            ReilMnemonic.AND: self.__generate_binary_op,
+            ReilMnemonic.OR:  self.__generate_binary_op,
+            ReilMnemonic.XOR: self.__generate_binary_op,
+
+            # Data Transfer Instructions
+            ReilMnemonic.LDM: self.__generate_ldm,
+            ReilMnemonic.STM: self.__generate_stm,
+            ReilMnemonic.STR: self.__generate_str,
+
+            # Conditional Instructions
+            ReilMnemonic.BISZ: self.__generate_bisz,
+            ReilMnemonic.JCC:  self.__generate_jcc,
+
+            # Other Instructions
+            ReilMnemonic.UNDEF: self.__generate_undef,
+            ReilMnemonic.UNKN:  self.__generate_unkn,
+            ReilMnemonic.NOP:   self.__generate_skip,
+
+            # Extensions
+            ReilMnemonic.SEXT: self.__generate_sext,
+            ReilMnemonic.SDIV: self.__generate_signed_op,
+            ReilMnemonic.SMOD: self.__generate_signed_op,
+        }
+
+        # Binary operations implementation.
+        self.__binary_ops = {
+            ReilMnemonic.ADD: "+",
+            ReilMnemonic.SUB: "-",
+            ReilMnemonic.MUL: "*",
+            ReilMnemonic.DIV: "//",
+            ReilMnemonic.MOD: "%",
+
+            ReilMnemonic.AND: "&",
+            ReilMnemonic.OR:  "|",
+            ReilMnemonic.XOR: "^",
+        }
+
+        # Compilation state (only valid while compiling a sequence).
+        self.__instrs = None
+        self.__taint = False
+        self.__labels = None
+        self.__loop = False
+        self.__lines = None
+        self.__temps_init = None
+        self.__temps_written = None
+        self.__temps_sizes = None
+        self.__regs_read = None
+        self.__regs_written = None
+
+    def compile(self, instrs, taint=True):
+        """Compile the REIL translation of a native instruction. Return
+        a function f(registers, temporal registers, read registers,
+        written registers) which returns the next address (REIL) if
+        control leaves the sequence and None otherwise. Return None if
+        the sequence can not be compiled. Taint propagation code is only
+        generated if `taint` is set.
+        """
+        if not instrs or not all(instr.mnemonic in self.__generators for instr in instrs):
+            return None
+
+        if not self.__analyze(instrs):
+            return None
+
+        self.__instrs = instrs
+        self.__taint = taint
+        self.__lines = []
+        self.__temps_init = {}
+
+        segments = []
+
+        # Split the sequence into segments, one for each jump target.
+        labels = sorted(self.__labels)
+
+        for start, end in zip(labels, labels[1:] + [len(instrs)]):
+            segments += [(start, self.__generate_segment(start, end))]
+
+        # Function header.
+        lines = ["def _reil_code(regs, temps, regs_read, regs_written):"]
+
+        # Load temporal registers that might be read before they are
+        # written.
+        for name in sorted(self.__temps_init):
+            lines += ["    {0} = temps[{1!r}] if {1!r} in temps else _getrandbits({2})".format(
+                self.__temp_local(name), name, self.__temps_init[name])]
+
+        if self.__loop:
+            lines += ["    label = 0", "    while True:"]
+
+            for start, body in segments:
+                lines += ["        if label == {}:".format(start)]
+                lines += ["            " + line for line in body]
+
+            lines += ["            return None"]
+        else:
+            _, body = segments[0]
+
+            lines += ["    " + line for line in body]
+            lines += ["    return None"]
+
+        namespace = self.__build_namespace(instrs)
+
+        exec("\n".join(lines), namespace)
+
+        self.__instrs = None
+        self.__lines = None
+
+        return namespace["_reil_code"]
+
+    # Properties
+    # ======================================================================== #
+    @property
+    def memory(self):
+        return self.__mem
+
+    @memory.setter
+    def memory(self, value):
+        # Code compiled so far is bound to the previous memory.
+        self.__mem = value
+
+    # Analysis methods
+    # ======================================================================== #
+    def __analyze(self, instrs):
+        """Collect jump targets within the sequence and check that all
+        operands are supported.
+        """
+        base_addr = instrs[0].address >> 8
+
+        self.__labels = set([0])
+        self.__loop = False
+        self.__temps_sizes = {}
+
+        for instr in instrs:
+            oprnd0, oprnd1, oprnd2 = instr.operands
+
+            if instr.mnemonic == ReilMnemonic.JCC:
+                if isinstance(oprnd2, ReilImmediateOperand):
+                    target = oprnd2.immediate
+
+                    if target >> 8 == base_addr and (target & 0xff) < len(instrs):
+                        self.__labels.add(target & 0xff)
+                        self.__loop = True
+                else:
+                    # Dynamic targets are checked at run time.
+                    self.__loop = True
+
+            if instr.mnemonic == ReilMnemonic.LDM and \
+                (oprnd0.size != self.__arch.address_size or
+                 oprnd2.size not in [8, 16, 32, 64, 128, 256]):
+                return False
+
+            if instr.mnemonic == ReilMnemonic.STM and \
+                (oprnd2.size != self.__arch.address_size or
+                 oprnd0.size not in [8, 16, 32, 64, 128, 256]):
+                return False
+
+            for oprnd in self.__get_read_operands(instr):
+                if not isinstance(oprnd, (ReilImmediateOperand, ReilRegisterOperand)):
+                    return False
+
+            if instr.mnemonic in self.__get_writing_mnemonics():
+                if not isinstance(oprnd2, ReilRegisterOperand):
+                    return False
+
+                if is_temporal_register(oprnd2.name):
+                    self.__temps_sizes.setdefault(oprnd2.name, set()).add(oprnd2.size)
+
+        return True
+
+    def __get_read_operands(self, instr):
+        if instr.mnemonic in [ReilMnemonic.UNDEF, ReilMnemonic.UNKN, ReilMnemonic.NOP]:
+            return []
+
+        if instr.mnemonic in [ReilMnemonic.LDM, ReilMnemonic.STR, ReilMnemonic.BISZ, ReilMnemonic.SEXT]:
+            return [instr.operands[0]]
+
+        if instr.mnemonic in [ReilMnemonic.STM, ReilMnemonic.JCC]:
+            return [instr.operands[0], instr.operands[2]]
+
+        return [instr.operands[0], instr.operands[1]]
+
+    def __get_writing_mnemonics(self):
+        return [
+            ReilMnemonic.ADD, ReilMnemonic.SUB, ReilMnemonic.MUL, ReilMnemonic.DIV,
+            ReilMnemonic.MOD, ReilMnemonic.BSH, ReilMnemonic.AND, ReilMnemonic.OR,
+            ReilMnemonic.XOR, ReilMnemonic.LDM, ReilMnemonic.STR, ReilMnemonic.BISZ,
+            ReilMnemonic.UNDEF, ReilMnemonic.SEXT, ReilMnemonic.SDIV, ReilMnemonic.SMOD,
+        ]
+
+    # Code generation methods
+    # ======================================================================== #
+    def __generate_segment(self, start, end):
+        self.__lines = []
+        self.__temps_written = set()
+        self.__regs_read = set()
+        self.__regs_written = set()
+
+        for index in xrange(start, end):
+            instr = self.__instrs[index]
+
+            self.__generators[instr.mnemonic](index, instr)
+
+            # Taint instruction.
+            if not self.__taint:
+                continue
+
+            if instr.mnemonic == ReilMnemonic.LDM:
+                self.__emit("_taint_load(_i{}, _a)".format(index))
+            elif instr.mnemonic == ReilMnemonic.STM:
+                self.__emit("_taint_store(_i{}, _a)".format(index))
+            elif instr.mnemonic not in [ReilMnemonic.JCC, ReilMnemonic.UNKN, ReilMnemonic.NOP]:
+                self.__emit("_taint(_i{})".format(index))
+
+        self.__emit_registers_tracking()
+
+        # Fall through to the next segment.
+        if self.__loop and end < len(self.__instrs):
+            self.__emit("label = {}".format(end))
+
+        return self.__lines if self.__lines else ["pass"]
+
+    def __emit(self, line):
+        self.__lines += [line]
+
+    def __emit_registers_tracking(self, indent=""):
+        """Emit code that keeps track of the native registers accessed
+        so far within the current segment. It is emitted on each exit
+        of the segment rather than on each access.
+        """
+        if self.__regs_read:
+            self.__emit(indent + "regs_read.update({!r})".format(tuple(sorted(self.__regs_read))))
+
+        if self.__regs_written:
+            self.__emit(indent + "regs_written.update({!r})".format(tuple(sorted(self.__regs_written))))
+
+    def __temp_local(self, name):
+        return "r_" + name
+
+    def __read(self, oprnd):
+        """Return an expression that evaluates to the value of an
+        operand.
+        """
+        if isinstance(oprnd, ReilImmediateOperand):
+            return "{:#x}".format(oprnd.immediate)
+
+        is_temp, base_register, base_size, offset, mask, _, is_native = _register_plan(self.__arch, oprnd)
+
+        if is_temp:
+            if oprnd.name not in self.__temps_written and oprnd.name not in self.__temps_init:
+                self.__temps_init[oprnd.name] = oprnd.size
+
+            local = self.__temp_local(oprnd.name)
+
+            # Mask only if it might have been written with a bigger
+            # size.
+            if all(size <= oprnd.size for size in self.__temps_sizes.get(oprnd.name, [])):
+                return local
+
+            return "({} & {:#x})".format(local, mask)
+
+        if is_native:
+            self.__regs_read.add(oprnd.name)
+
+        base_value = "(regs[{0!r}] if {0!r} in regs else _init(regs, {0!r}, {1}))".format(base_register, base_size)
+
+        if offset:
+            base_value = "({} >> {})".format(base_value, offset)
+
+        return "({} & {:#x})".format(base_value, mask)
+
+    def __write(self, oprnd, value):
+        """Emit code that writes a value (an expression) to an operand.
+        """
+        is_temp, base_register, base_size, offset, mask, mask_clear, is_native = _register_plan(self.__arch, oprnd)
+
+        if is_temp:
+            self.__temps_written.add(oprnd.name)
+
+            self.__emit("{} = {} & {:#x}".format(self.__temp_local(oprnd.name), value, mask))
+
+            return
+
+        if is_native:
+            self.__regs_written.add(oprnd.name)
+
+        if offset == 0 and base_size == oprnd.size:
+            # The whole base register is overwritten.
+            self.__emit("regs[{!r}] = {} & {:#x}".format(base_register, value, mask))
+        else:
+            base_value = "(regs[{0!r}] if {0!r} in regs else _init(regs, {0!r}, {1}))".format(base_register, base_size)
+
+            self.__emit("regs[{!r}] = ({} & {}) | (({} & {:#x}) << {})".format(
+                base_register, base_value, mask_clear, value, mask, offset))
+
+    def __generate_binary_op(self, index, instr):
+        op0_val = self.__read(instr.operands[0])
+        op1_val = self.__read(instr.operands[1])
+
+        self.__emit("_v = {} {} {}".format(op0_val, self.__binary_ops[instr.mnemonic], op1_val))
+
+        self.__write(instr.operands[2], "_v")
+
+    def __generate_div(self, index, instr):
+        op0_val = self.__read(instr.operands[0])
+        op1_val = self.__read(instr.operands[1])
+
+        self.__emit("_b = {}".format(op1_val))
+        self.__emit("if _b == 0: raise _ZeroDivisionError()")
+        self.__emit("_v = {} {} _b".format(op0_val, self.__binary_ops[instr.mnemonic]))
+
+        self.__write(instr.operands[2], "_v")
+
+    def __generate_signed_op(self, index, instr):
+        oprnd0, oprnd1, oprnd2 = instr.operands
+
+        fn = "_signed_div" if instr.mnemonic == ReilMnemonic.SDIV else "_signed_mod"
+
+        self.__emit("_v = {}({}, {}, {}, {}, {})".format(
+            fn, self.__read(oprnd0), oprnd0.size, self.__read(oprnd1), oprnd1.size, oprnd2.size))
+
+        self.__write(oprnd2, "_v")
+
+    def __generate_bsh(self, index, instr):
+        oprnd0, oprnd1, oprnd2 = instr.operands
+
+        self.__emit("_a = {}".format(self.__read(oprnd0)))
+
+        if isinstance(oprnd1, ReilImmediateOperand):
+            shift = oprnd1.immediate
+
+            if extract_sign_bit(shift, oprnd1.size) == 0:
+                self.__emit("_v = _a << {}".format(shift))
+            else:
+                self.__emit("_v = _a >> {}".format(twos_complement(shift, oprnd1.size)))
+        else:
+            self.__emit("_b = {}".format(self.__read(oprnd1)))
+            self.__emit("_v = _a << _b if _b >> {} == 0 else _a >> ({:#x} - _b)".format(
+                oprnd1.size - 1, 2**oprnd1.size))
+
+        self.__write(oprnd2, "_v")
+
+    def __generate_ldm(self, index, instr):
+        self.__emit("_a = {}".format(self.__read(instr.operands[0])))
+        self.__emit("_v = _mem_read(_a, {})".format(instr.operands[2].size / 8))
+
+        self.__write(instr.operands[2], "_v")
+
+    def __generate_stm(self, index, instr):
+        op0_val = self.__read(instr.operands[0])
+
+        self.__emit("_a = {}".format(self.__read(instr.operands[2])))
+        self.__emit("_mem_write(_a, {}, {})".format(instr.operands[0].size / 8, op0_val))
+
+    def __generate_str(self, index, instr):
+        self.__write(instr.operands[2], self.__read(instr.operands[0]))
+
+    def __generate_bisz(self, index, instr):
+        self.__emit("_v = 1 if {} == 0 else 0".format(self.__read(instr.operands[0])))
+
+        self.__write(instr.operands[2], "_v")
+
+    def __generate_jcc(self, index, instr):
+        oprnd0, _, oprnd2 = instr.operands
+
+        base_addr = self.__instrs[0].address >> 8
+
+        if isinstance(oprnd0, ReilImmediateOperand):
+            if oprnd0.immediate == 0:
+                return
+
+            cond = "True"
+        else:
+            cond = "{} != 0".format(self.__read(oprnd0))
+
+        if isinstance(oprnd2, ReilImmediateOperand):
+            target = oprnd2.immediate
+
+            if not target:
+                return
+
+            self.__emit("if {}:".format(cond))
+
+            self.__emit_registers_tracking("    ")
+
+            if target >> 8 == base_addr and (target & 0xff) < len(self.__instrs):
+                self.__emit("    label = {}".format(target & 0xff))
+                self.__emit("    continue")
+            else:
+                self.__emit("    return {:#x}".format(target))
+        else:
+            target = self.__read(oprnd2)
+
+            self.__emit("if {}:".format(cond))
+
+            self.__emit_registers_tracking("    ")
+
+            self.__emit("    _t = {}".format(target))
+            self.__emit("    if _t:")
+            self.__emit("        if _t >> 8 == {:#x} and (_t & 0xff) < {}:".format(base_addr, len(self.__instrs)))
+            self.__emit("            if (_t & 0xff) not in {!r}: raise _InvalidAddressError()".format(
+                tuple(sorted(self.__labels))))
+            self.__emit("            label = _t & 0xff")
+            self.__emit("            continue")
+            self.__emit("        return _t")
+
+    def __generate_undef(self, index, instr):
+        self.__write(instr.operands[2], "_randint(0, {})".format(instr.operands[2].size))
+
+    def __generate_unkn(self, index, instr):
+        self.__emit("raise _InvalidInstruction()")
+
+    def __generate_skip(self, index, instr):
+        pass
+
+    def __generate_sext(self, index, instr):
+        oprnd0, _, oprnd2 = instr.operands
+
+        op2_mask = (2**oprnd2.size-1) & ~(2**oprnd0.size-1)
+
+        self.__emit("_v = {}".format(self.__read(oprnd0)))
+        self.__emit("if _v >> {} == 1: _v |= {:#x}".format(oprnd0.size - 1, op2_mask))
+
+        self.__write(oprnd2, "_v")
+
+    def __build_namespace(self, instrs):
+        namespace = {
+            "_init": _init_register,
+            "_getrandbits": random.getrandbits,
+            "_randint": random.randint,
+            "_signed_div": _signed_div,
+            "_signed_mod": _signed_mod,
+            "_mem_read": self.__mem.read,
+            "_mem_write": self.__mem.write,
+            "_taint": self.__tainter.taint,
+            "_taint_load": self.__tainter.taint_load,
+            "_taint_store": self.__tainter.taint_store,
+            "_ZeroDivisionError": ReilCpuZeroDivisionError,
+            "_InvalidAddressError": ReilCpuInvalidAddressError,
+            "_InvalidInstruction": ReilCpuInvalidInstruction,
+        }
+
+        for index, instr in enumerate(instrs):
+            namespace["_i{}".format(index)] = instr
+
+        return namespace
+
+
 class ReilEmulatorTainter(object):
 
     def __init__(self, arch, emulator):
@@ -770,9 +1736,20 @@ class ReilEmulatorTainter(object):
         # Reil emulator instance.
         self.__emu = emulator
 
+        # Whether taint propagation is enabled. It is enabled as soon as
+        # a location is tainted (or explicitly, through enable).
+        self.__enabled = False
+        self.__enabled_explicitly = False
+
         # Taint information.
-        self.__taint_reg = {}   # Register-level tainting
-        self.__taint_mem = {}   # Byte-level tainting
+        self.__taint_reg = 0        # Register-level tainting (a bit per register)
+        self.__taint_temp = set()   # Tainted temporal registers
+        self.__taint_mem = {}       # Byte-level tainting (a bitmap per page)
+
+        # Register bit masks by register name (None for temporal
+        # registers) and by base register name.
+        self.__reg_masks = {}
+        self.__reg_masks_base = {}
 
         # Taint function lookup table.
         self.__tainter = {
@@ -812,11 +1789,54 @@ class ReilEmulatorTainter(object):
     def taint(self, instruction):
         self.__tainter[instruction.mnemonic](instruction)
 
+    def enable(self):
+        """Enable taint propagation.
+        """
+        self.__enabled = True
+        self.__enabled_explicitly = True
+
+    def disable(self):
+        """Disable taint propagation. Taint information is kept.
+        """
+        self.__enabled = False
+        self.__enabled_explicitly = False
+
+    @property
+    def enabled(self):
+        """Return whether taint propagation is enabled.
+        """
+        return self.__enabled
+
     def reset(self):
+        # Nothing is tainted anymore, so taint propagation is only kept
+        # if it was enabled explicitly.
+        self.__enabled = self.__enabled_explicitly
+
         # Taint information.
-        self.__taint_reg = {}
+        self.__taint_reg = 0
+        self.__taint_temp = set()
         self.__taint_mem = {}
 
+    def snapshot(self):
+        """Take a snapshot of the taint information.
+        """
+        return {
+            "enabled": self.__enabled,
+            "enabled_explicitly": self.__enabled_explicitly,
+            "registers": self.__taint_reg,
+            "registers_temp": set(self.__taint_temp),
+            "memory": dict(self.__taint_mem),
+        }
+
+    def restore(self, snapshot):
+        """Restore taint information from a snapshot.
+        """
+        self.__enabled = snapshot["enabled"]
+        self.__enabled_explicitly = snapshot["enabled_explicitly"]
+        self.__taint_reg = snapshot["registers"]
+        self.__taint_temp = set(snapshot["registers_temp"])
+        self.__taint_mem = dict(snapshot["memory"])
+
     # Operand taint methods
     # ======================================================================== #
     def get_operand_taint(self, operand):
@@ -837,41 +1857,89 @@ class ReilEmulatorTainter(object):
 
     def clear_operand_taint(self, operand):
         if isinstance(operand, ReilRegisterOperand):
-            self.clear_register_taint(operand)
+            self.clear_register_taint(operand.name)
         else:
             raise Exception("Invalid operand: %s" % str(operand))
 
     # Memory taint methods
     # ======================================================================== #
     def get_memory_taint(self, address, size):
-        tainted = False
+        for page_number, offset, chunk_size in _split_region(address, size):
+            bitmap = self.__taint_mem.get(page_number, 0)
 
-        for i in xrange(0, size):
-            tainted = tainted or self.__taint_mem.get(address + i, False)
+            if (bitmap >> offset) & ((1 << chunk_size) - 1):
+                return True
 
-        return tainted
+        return False
 
     def set_memory_taint(self, address, size, taint):
-        for i in xrange(0, size):
-            self.__taint_mem[address + i] = taint
+        if taint:
+            self.__enabled = True
+
+        for page_number, offset, chunk_size in _split_region(address, size):
+            bitmap = self.__taint_mem.get(page_number, 0)
+            mask = ((1 << chunk_size) - 1) << offset
+
+            bitmap = bitmap | mask if taint else bitmap & ~mask
+
+            if bitmap:
+                self.__taint_mem[page_number] = bitmap
+            elif page_number in self.__taint_mem:
+                del self.__taint_mem[page_number]
 
     def clear_memory_taint(self, address, size):
-        for i in xrange(0, size):
-            self.__taint_mem[address + i] = False
+        self.set_memory_taint(address, size, False)
 
     # Register taint methods
     # ======================================================================== #
     def get_register_taint(self, register):
-        return self.__taint_reg.get(self.__get_base_register(register), False)
+        mask = self.__get_register_mask(register)
+
+        if mask is None:
+            return register in self.__taint_temp
+
+        return self.__taint_reg & mask != 0
 
     def set_register_taint(self, register, taint):
-        self.__taint_reg[self.__get_base_register(register)] = taint
+        mask = self.__get_register_mask(register)
+
+        if taint:
+            self.__enabled = True
+
+            if mask is None:
+                self.__taint_temp.add(register)
+            else:
+                self.__taint_reg |= mask
+        else:
+            if mask is None:
+                self.__taint_temp.discard(register)
+            else:
+                self.__taint_reg &= ~mask
 
     def clear_register_taint(self, register):
-        self.__taint_reg[self.__get_base_register(register)] = False
+        self.set_register_taint(register, False)
 
     # Taint auxiliary methods
     # ======================================================================== #
+    def __get_register_mask(self, register):
+        """Return the bit that holds the taint of a register, None for
+        temporal registers (which are kept in a set).
+        """
+        if register not in self.__reg_masks:
+            if is_temporal_register(register):
+                mask = None
+            else:
+                base_name = self.__get_base_register(register)
+
+                if base_name not in self.__reg_masks_base:
+                    self.__reg_masks_base[base_name] = 1 << len(self.__reg_masks_base)
+
+                mask = self.__reg_masks_base[base_name]
+
+            self.__reg_masks[register] = mask
+
+        return self.__reg_masks[register]
+
     def __get_base_register(self, register):
         if register in self.__arch.alias_mapper and \
             register not in self.__arch.registers_flags:
@@ -898,11 +1966,7 @@ class ReilEmulatorTainter(object):
         # Get memory address.
         op0_val = self.__emu.read_operand(instr.operands[0])
 
-        # Get taint information.
-        op0_taint = self.get_memory_taint(op0_val, instr.operands[2].size / 8)
-
-        # Propagate taint.
-        self.set_operand_taint(instr.operands[2], op0_taint)
+        self.taint_load(instr, op0_val)
 
     def __taint_store(self, instr):
         """Taint STM instruction.
@@ -910,12 +1974,26 @@ class ReilEmulatorTainter(object):
         # Get memory address.
         op2_val = self.__emu.read_operand(instr.operands[2])
 
+        self.taint_store(instr, op2_val)
+
+    def taint_load(self, instr, address):
+        """Taint LDM instruction given its memory address.
+        """
+        # Get taint information.
+        op0_taint = self.get_memory_taint(address, instr.operands[2].size / 8)
+
+        # Propagate taint.
+        self.set_operand_taint(instr.operands[2], op0_taint)
+
+    def taint_store(self, instr, address):
+        """Taint STM instruction given its memory address.
+        """
         # Get taint information.
         op0_size = instr.operands[0].size
         op0_taint = self.get_operand_taint(instr.operands[0])
 
         # Propagate taint.
-        self.set_memory_taint(op2_val, op0_size / 8, op0_taint)
+        self.set_memory_taint(address, op0_size / 8, op0_taint)
 
     def __taint_move(self, instr):
         """Taint registers move instruction.
@@ -955,6 +2033,9 @@ class ReilEmulator(object):
         # An instance of a ReilCpu.
         self.__cpu = cpu if cpu else ReilCpu(self.__arch, self.__mem, self.__tainter, self)
 
+        # Whether to compile sequences before executing them.
+        self.__jit = True
+
     # Execution methods
     # ======================================================================== #
     def execute(self, container, start=None, end=None, registers=None):
@@ -993,6 +2074,22 @@ class ReilEmulator(object):
     def single_step(self, instruction):
         return self.__cpu.execute(instruction)
 
+    def execute_sequence(self, instructions):
+        """Execute the REIL translation of a native instruction. If JIT
+        is enabled, the sequence is compiled into a Python function the
+        first time it is executed. Temporal registers are discarded
+        afterwards. Return the next address (REIL) if control leaves the
+        sequence, None otherwise.
+        """
+        return self.__cpu.execute_sequence(instructions, compiled=self.__jit)
+
+    def invalidate_code(self, address=None):
+        """Discard compiled code of the sequence at the specified
+        address (REIL), or all of it if no address is given (for
+        instance, after code is modified).
+        """
+        self.__cpu.invalidate_code(address)
+
     # Reset methods
     # ======================================================================== #
     def reset(self):
@@ -1011,6 +2108,33 @@ class ReilEmulator(object):
     def reset_tainter(self):
         self.__tainter.reset()
 
+    def clear_temporal_registers(self):
+        """Discard all temporal registers.
+        """
+        self.__cpu.clear_temporal_registers()
+
+    # Snapshot methods
+    # ======================================================================== #
+    def snapshot(self):
+        """Take a snapshot of the emulator state (registers, memory and
+        taint information). Memory pages are copied on write, so taking
+        a snapshot is proportional to the number of pages in use, not
+        to the size of the memory.
+        """
+        return {
+            "cpu": self.__cpu.snapshot(),
+            "memory": self.__mem.snapshot(),
+            "tainter": self.__tainter.snapshot(),
+        }
+
+    def restore(self, snapshot):
+        """Restore emulator state from a snapshot. A snapshot can be
+        restored any number of times.
+        """
+        self.__cpu.restore(snapshot["cpu"])
+        self.__mem.restore(snapshot["memory"])
+        self.__tainter.restore(snapshot["tainter"])
+
     # Handler methods
     # ======================================================================== #
     def set_instruction_pre_handler(self, func, parameter):
@@ -1033,8 +2157,29 @@ class ReilEmulator(object):
     def write_memory(self, address, size, value):
         self.__mem.write(address, size, value)
 
+    def read_memory_region(self, address, size):
+        return self.__mem.read_region(address, size)
+
+    def write_memory_region(self, address, buffer):
+        self.__mem.write_region(address, buffer)
+
+    def read_memory_string(self, address, max_length):
+        return self.__mem.read_string(address, max_length)
+
     # Taint methods
     # ======================================================================== #
+    def enable_taint(self):
+        """Enable taint propagation. Note that it is enabled
+        automatically as soon as a register or memory location is
+        tainted.
+        """
+        self.__tainter.enable()
+
+    def disable_taint(self):
+        """Disable taint propagation (taint information is kept).
+        """
+        self.__tainter.disable()
+
     def get_operand_taint(self, register):
         return self.__tainter.get_operand_taint(register)
 
@@ -1076,6 +2221,30 @@ class ReilEmulator(object):
         """
         self.__cpu.registers = value
 
+    @property
+    def temporal_registers(self):
+        """Return temporal registers.
+        """
+        return self.__cpu.temporal_registers
+
+    @property
+    def taint_enabled(self):
+        """Return whether taint propagation is enabled.
+        """
+        return self.__tainter.enabled
+
+    @property
+    def jit(self):
+        """Return whether sequences are compiled before execution.
+        """
+        return self.__jit
+
+    @jit.setter
+    def jit(self, value):
+        """Enable/disable compilation of sequences.
+        """
+        self.__jit = value
+
     @property
     def memory(self):
         """Return memory.
@@ -0,0 +1,198 @@
+# Copyright (c) 2014, Fundacion Dr. Manuel Sadosky
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+This module implements a cache of solver queries. Queries are
+identified by the set of asserted constraints, written in a canonical
+form in which variables are renamed in order of first occurrence (so
+formulas that only differ in variable names share an entry). Each entry
+holds the answer of the solver (sat or unsat) and the values obtained
+from the model, if any.
+
+The cache has an in-memory LRU tier and an optional on-disk (SQLite)
+tier that persists across runs. Entries are keyed by solver name and
+version.
+
+"""
+
+import cPickle
+import hashlib
+import sqlite3
+import threading
+
+from collections import OrderedDict
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    solver TEXT NOT NULL,
+    version TEXT NOT NULL,
+    query TEXT NOT NULL,
+    status TEXT NOT NULL,
+    model BLOB NOT NULL,
+    PRIMARY KEY (solver, version, query)
+);
+"""
+
+
+def _is_variable(node):
+    return not node.children and not node.op.startswith("#") and node.op not in ("true", "false")
+
+
+def canonical_form(node, names):
+    """Return the canonical form of an expression node, a post-order
+    listing of its (distinct) subterms. Variables are written by their
+    entry in *names*, a map from variable name to canonical name that
+    is extended with the variables seen for the first time.
+    """
+    index = {}
+    out = []
+    stack = [(node, iter(node.children))]
+
+    while stack:
+        parent, children = stack[-1]
+
+        for child in children:
+            if id(child) not in index:
+                stack.append((child, iter(child.children)))
+
+                break
+        else:
+            stack.pop()
+
+            if _is_variable(parent):
+                if parent.op not in names:
+                    names[parent.op] = "v{}".format(len(names))
+
+                op = names[parent.op]
+            else:
+                op = parent.op
+
+            children = " ".join([str(index[id(c)]) for c in parent.children])
+
+            out.append("{} {} {}\n".format(op, parent.sort, children))
+
+            index[id(parent)] = len(index)
+
+    return "".join(out)
+
+
+def canonical_hash(node, names):
+    """Return the hash of the canonical form of an expression node (see
+    *canonical_form*).
+    """
+    return hashlib.sha1(canonical_form(node, names)).hexdigest()
+
+
+class SmtQueryCache(object):
+
+    """Cache of solver queries. Keys are (solver, version, query hash)
+    tuples and values are (status, model) pairs, where the model maps
+    expression hashes to values.
+    """
+
+    def __init__(self, size=4096, filename=None):
+        # Maximum number of in-memory entries.
+        self._size = size
+
+        self._entries = OrderedDict()
+
+        # Connection to the SQLite database (on-disk tier).
+        self._conn = None
+
+        if filename:
+            self._conn = sqlite3.connect(filename, check_same_thread=False)
+            self._conn.execute("PRAGMA synchronous = OFF")
+            self._conn.executescript(_SCHEMA)
+
+        # The cache may be shared by solvers running on different
+        # threads (see GadgetVerifier.verify_many).
+        self._lock = threading.Lock()
+
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "disk_hits": 0,
+        }
+
+    def close(self):
+        """Close the on-disk tier.
+        """
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+
+                self._conn = None
+
+    def get(self, key):
+        """Return the (status, model) pair of a query or None if it is
+        not cached.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+
+            if entry is None and self._conn:
+                row = self._conn.execute("SELECT status, model FROM queries WHERE solver = ? AND version = ? "
+                                         "AND query = ?", key).fetchone()
+
+                if row:
+                    entry = (str(row[0]), cPickle.loads(str(row[1])))
+
+                    self._stats["disk_hits"] += 1
+
+            if entry is None:
+                self._stats["misses"] += 1
+
+                return None
+
+            self._stats["hits"] += 1
+
+            self._insert(key, entry)
+
+            return entry
+
+    def put(self, key, status, model):
+        """Store the status and model of a query.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+            self._insert(key, (status, model))
+
+            if self._conn:
+                with self._conn:
+                    self._conn.execute("INSERT OR REPLACE INTO queries (solver, version, query, status, model) "
+                                       "VALUES (?, ?, ?, ?, ?)",
+                                       key + (status, sqlite3.Binary(cPickle.dumps(model, 2))))
+
+    @property
+    def stats(self):
+        return dict(self._stats)
+
+    def _insert(self, key, entry):
+        self._entries[key] = entry
+
+        if len(self._entries) > self._size:
+            self._entries.popitem(last=False)
@@ -0,0 +1,667 @@
+# Copyright (c) 2014, Fundacion Dr. Manuel Sadosky
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+This module implements a simplifier for SMT expressions. It rewrites
+the expression DAG (see smtsymbol.Node) before it is sent to the
+solver:
+
+    * Constant folding.
+    * Extract/concat fusion (and extract of zero/sign extensions).
+    * Identity and absorption rules (x + 0, x & 0, ite true a b, ...).
+
+It also keeps track of definitions of the form (= var expr) whose
+variable is not used anywhere else. These are held back, and only sent
+to the solver once the variable is referenced by a later constraint or
+a value is requested (dead-definition elimination).
+
+"""
+
+import re
+
+from barf.core.smt.smtsymbol import make_node
+
+_OP_RE = re.compile(r"^\(_ (\w+) ([\d ]+)\)$")
+
+_BOOL_TRUE = make_node("true", "Bool")
+_BOOL_FALSE = make_node("false", "Bool")
+
+_COMPARISONS = ["bvult", "bvule", "bvugt", "bvuge", "bvslt", "bvsle", "bvsgt", "bvsge"]
+
+
+# Auxiliary functions
+# ============================================================================ #
+def _parse_op(op):
+    # Return name and parameters of an indexed operator, for instance,
+    # '(_ extract 7 0)' -> ('extract', [7, 0]).
+    match = _OP_RE.match(op)
+
+    if not match:
+        return op, []
+
+    return match.group(1), [int(p) for p in match.group(2).split()]
+
+
+def _make_constant(value, size):
+    value = value & ((1 << size) - 1)
+
+    if size < 8 or size % 4 != 0:
+        op = "#b{0:0{fill}b}".format(value, fill=size)
+    else:
+        op = "#x{0:0{fill}x}".format(value, fill=size / 4)
+
+    return make_node(op, size)
+
+
+def _make_bool(value):
+    return _BOOL_TRUE if value else _BOOL_FALSE
+
+
+def _constant_value(node):
+    # Return the value of a constant node (bit vector or boolean), or
+    # None if it is not a constant.
+    if node.children:
+        return None
+
+    if node.op.startswith("#x"):
+        return int(node.op[2:], 16)
+
+    if node.op.startswith("#b"):
+        return int(node.op[2:], 2)
+
+    if node.op == "true":
+        return True
+
+    if node.op == "false":
+        return False
+
+    return None
+
+
+def _to_signed(value, size):
+    return value - (1 << size) if value >> (size - 1) else value
+
+
+def _fold_comparison(op, a, b, size):
+    if op.startswith("bvs"):
+        a, b = _to_signed(a, size), _to_signed(b, size)
+
+    return {
+        "bvult": a < b, "bvslt": a < b,
+        "bvule": a <= b, "bvsle": a <= b,
+        "bvugt": a > b, "bvsgt": a > b,
+        "bvuge": a >= b, "bvsge": a >= b,
+    }[op]
+
+
+class SmtSimplifier(object):
+
+    """SMT expression simplifier.
+    """
+
+    def __init__(self):
+        # Simplified version of each node seen so far (by node id). It
+        # also keeps the original nodes alive, so ids are not reused.
+        self._cache = {}
+
+        # Held back definitions, variable name -> (node, variables).
+        self._pending = {}
+
+        # Variables referenced by the constraints sent to the solver (or
+        # by held back definitions).
+        self._used = set()
+
+        # Saved (pending, used) pairs, one for each open scope.
+        self._scopes = []
+
+        self._stats = {
+            "constraints": 0,       # Constraints simplified.
+            "nodes_in": 0,          # Nodes before simplification.
+            "nodes_out": 0,         # Nodes after simplification.
+            "rewrites": 0,          # Rewrite rules applied.
+            "held_back": 0,         # Definitions held back.
+            "restored": 0,          # Held back definitions sent later.
+        }
+
+    @property
+    def stats(self):
+        """Return simplification counters. The number of nodes removed
+        is nodes_in - nodes_out; the number of (dead) definitions never
+        sent to the solver is held_back - restored.
+
+        """
+        return dict(self._stats)
+
+    def simplify(self, node):
+        """Return a simplified version of an expression node.
+        """
+        if id(node) in self._cache:
+            return self._cache[id(node)][1]
+
+        # Simplify children before parents (iterative post-order, so
+        # deep expressions are not a problem).
+        stack = [(node, False)]
+
+        while stack:
+            item, ready = stack.pop()
+
+            if id(item) in self._cache:
+                continue
+
+            if ready or not item.children:
+                children = tuple([self._cache[id(c)][1] for c in item.children])
+
+                self._cache[id(item)] = (item, self._rewrite(item.op, item.sort, children))
+            else:
+                stack.append((item, True))
+                stack.extend([(c, False) for c in item.children if id(c) not in self._cache])
+
+        return self._cache[id(node)][1]
+
+    def add(self, node, declarations):
+        """Simplify a constraint and return the list of constraints that
+        have to be sent to the solver because of it (it may be empty, if
+        the constraint is held back, or it may include definitions held
+        back earlier).
+
+        """
+        simple = self.simplify(node)
+
+        variables, count = self._scan(simple, declarations)
+
+        self._stats["constraints"] += 1
+        self._stats["nodes_in"] += count if simple is node else self._scan(node, {})[1]
+        self._stats["nodes_out"] += count
+
+        if _constant_value(simple) is True:
+            return []
+
+        name = self._definition(simple, declarations)
+
+        if name:
+            self._pending[name] = (simple, variables)
+
+            # Variables used by a held back definition are not held back
+            # themselves, so held back definitions never form a cycle.
+            self._used.update(variables)
+
+            self._stats["held_back"] += 1
+
+            return []
+
+        return self._send(simple, variables)
+
+    def restore(self):
+        """Return all the held back definitions (they have to be sent
+        to the solver before querying the model, so every value comes
+        from the same model).
+
+        """
+        constraints = []
+
+        self._restore(list(self._pending), constraints)
+
+        return constraints
+
+    def push(self):
+        self._scopes.append((dict(self._pending), set(self._used)))
+
+    def pop(self):
+        self._pending, self._used = self._scopes.pop()
+
+    def reset(self):
+        # Counters are not reset, they add up over the whole session.
+        self._cache = {}
+        self._pending = {}
+        self._used = set()
+        self._scopes = []
+
+    # Auxiliary methods
+    # ======================================================================== #
+    def _send(self, node, variables):
+        constraints = []
+
+        self._restore(variables, constraints)
+
+        self._used.update(variables)
+
+        constraints.append(node)
+
+        return constraints
+
+    def _restore(self, variables, constraints):
+        # Move held back definitions of *variables* (and of the variables
+        # they use) to *constraints*.
+        for name in variables:
+            if name in self._pending:
+                node, node_variables = self._pending.pop(name)
+
+                self._stats["restored"] += 1
+
+                constraints.extend(self._send(node, node_variables))
+
+    def _definition(self, node, declarations):
+        # Return the name of the variable defined by a (= var expr)
+        # constraint, if the variable is not used anywhere else.
+        if node.op != "=":
+            return None
+
+        for var, expr in [node.children, reversed(node.children)]:
+            name = var.op
+
+            if var.children or name not in declarations:
+                continue
+
+            if name in self._used or name in self._pending:
+                continue
+
+            if name in self._scan(expr, declarations)[0]:
+                continue
+
+            return name
+
+        return None
+
+    def _scan(self, node, declarations):
+        # Return the names of the variables (declared symbols) used by
+        # an expression and its number of (distinct) nodes.
+        variables = set()
+        visited = set()
+        stack = [node]
+
+        while stack:
+            item = stack.pop()
+
+            if id(item) in visited:
+                continue
+
+            visited.add(id(item))
+
+            if item.children:
+                stack.extend(item.children)
+            elif item.op in declarations:
+                variables.add(item.op)
+
+        return variables, len(visited)
+
+    # Rewrite rules
+    # ======================================================================== #
+    def _rewrite(self, op, sort, children):
+        # Return the simplest node equivalent to (op children), whose
+        # children are already simplified.
+        if not children:
+            return make_node(op, sort, children)
+
+        name, params = _parse_op(op)
+
+        rewriter = {
+            "bvadd": self._rewrite_add,
+            "bvsub": self._rewrite_sub,
+            "bvmul": self._rewrite_mul,
+            "bvand": self._rewrite_and,
+            "bvor": self._rewrite_or,
+            "bvxor": self._rewrite_xor,
+            "bvnot": self._rewrite_bvnot,
+            "bvneg": self._rewrite_neg,
+            "bvshl": self._rewrite_shift,
+            "bvlshr": self._rewrite_shift,
+            "extract": self._rewrite_extract,
+            "zero_extend": self._rewrite_extend,
+            "sign_extend": self._rewrite_extend,
+            "concat": self._rewrite_concat,
+            "ite": self._rewrite_ite,
+            "=": self._rewrite_equal,
+            "not": self._rewrite_not,
+            "and": self._rewrite_bool,
+            "or": self._rewrite_bool,
+        }.get(name)
+
+        if name in _COMPARISONS:
+            rewriter = self._rewrite_comparison
+
+        node = rewriter(op, sort, params, children) if rewriter else None
+
+        if node is None:
+            return make_node(op, sort, children)
+
+        self._stats["rewrites"] += 1
+
+        return node
+
+    def _rewrite_add(self, op, sort, params, children):
+        values = [_constant_value(c) for c in children]
+
+        if None not in values:
+            return _make_constant(sum(values), sort)
+
+        operands = [c for c, v in zip(children, values) if v != 0]
+
+        if len(operands) == 1:
+            return operands[0]
+
+        return None
+
+    def _rewrite_sub(self, op, sort, params, children):
+        a, b = children
+        a_val, b_val = _constant_value(a), _constant_value(b)
+
+        if a_val is not None and b_val is not None:
+            return _make_constant(a_val - b_val, sort)
+
+        if b_val == 0:
+            return a
+
+        if a is b:
+            return _make_constant(0, sort)
+
+        return None
+
+    def _rewrite_mul(self, op, sort, params, children):
+        values = [_constant_value(c) for c in children]
+
+        if None not in values:
+            return _make_constant(reduce(lambda x, y: x * y, values), sort)
+
+        if 0 in values:
+            return _make_constant(0, sort)
+
+        operands = [c for c, v in zip(children, values) if v != 1]
+
+        if len(operands) == 1:
+            return operands[0]
+
+        return None
+
+    def _rewrite_and(self, op, sort, params, children):
+        values = [_constant_value(c) for c in children]
+        ones = (1 << sort) - 1
+
+        if None not in values:
+            return _make_constant(reduce(lambda x, y: x & y, values), sort)
+
+        if 0 in values:
+            return _make_constant(0, sort)
+
+        operands = [c for c, v in zip(children, values) if v != ones]
+
+        if len(operands) == 1 or (len(operands) == 2 and operands[0] is operands[1]):
+            return operands[0]
+
+        return None
+
+    def _rewrite_or(self, op, sort, params, children):
+        values = [_constant_value(c) for c in children]
+        ones = (1 << sort) - 1
+
+        if None not in values:
+            return _make_constant(reduce(lambda x, y: x | y, values), sort)
+
+        if ones in values:
+            return _make_constant(ones, sort)
+
+        operands = [c for c, v in zip(children, values) if v != 0]
+
+        if len(operands) == 1 or (len(operands) == 2 and operands[0] is operands[1]):
+            return operands[0]
+
+        return None
+
+    def _rewrite_xor(self, op, sort, params, children):
+        values = [_constant_value(c) for c in children]
+
+        if None not in values:
+            return _make_constant(reduce(lambda x, y: x ^ y, values), sort)
+
+        operands = [c for c, v in zip(children, values) if v != 0]
+
+        if len(operands) == 1:
+            return operands[0]
+
+        if len(operands) == 2 and operands[0] is operands[1]:
+            return _make_constant(0, sort)
+
+        return None
+
+    def _rewrite_bvnot(self, op, sort, params, children):
+        value = _constant_value(children[0])
+
+        if value is not None:
+            return _make_constant(~value, sort)
+
+        if children[0].op == "bvnot":
+            return children[0].children[0]
+
+        return None
+
+    def _rewrite_neg(self, op, sort, params, children):
+        value = _constant_value(children[0])
+
+        if value is not None:
+            return _make_constant(-value, sort)
+
+        if children[0].op == "bvneg":
+            return children[0].children[0]
+
+        return None
+
+    def _rewrite_shift(self, op, sort, params, children):
+        value, amount = [_constant_value(c) for c in children]
+
+        if amount is not None and amount >= sort:
+            return _make_constant(0, sort)
+
+        if value is not None and amount is not None:
+            return _make_constant(value << amount if op == "bvshl" else value >> amount, sort)
+
+        if amount == 0:
+            return children[0]
+
+        if value == 0:
+            return children[0]
+
+        return None
+
+    def _rewrite_extract(self, op, sort, params, children):
+        high, low = params
+        child = children[0]
+        value = _constant_value(child)
+
+        if value is not None:
+            return _make_constant(value >> low, sort)
+
+        if low == 0 and high == child.sort - 1:
+            return child
+
+        child_name, child_params = _parse_op(child.op)
+
+        # Extract of extract.
+        if child_name == "extract":
+            return self._extract(child.children[0], high + child_params[1], low + child_params[1])
+
+        # Extract of zero/sign extension.
+        if child_name in ("zero_extend", "sign_extend"):
+            inner = child.children[0]
+
+            if high < inner.sort:
+                return self._extract(inner, high, low)
+
+            if low >= inner.sort and child_name == "zero_extend":
+                return _make_constant(0, sort)
+
+        # Extract of concat, from a single operand.
+        if child_name == "concat":
+            offset = child.sort
+
+            for operand in child.children:
+                offset -= operand.sort
+
+                if offset <= low and high < offset + operand.sort:
+                    return self._extract(operand, high - offset, low - offset)
+
+        return None
+
+    def _rewrite_extend(self, op, sort, params, children):
+        name, _ = _parse_op(op)
+        child = children[0]
+        value = _constant_value(child)
+
+        if params[0] == 0:
+            return child
+
+        if value is not None:
+            if name == "sign_extend":
+                value = _to_signed(value, child.sort)
+
+            return _make_constant(value, sort)
+
+        child_name, child_params = _parse_op(child.op)
+
+        if child_name == name or (child_name == "zero_extend" and name == "sign_extend"):
+            return self._rewrite(
+                "(_ {} {})".format(child_name, child_params[0] + params[0]), sort, child.children)
+
+        return None
+
+    def _rewrite_concat(self, op, sort, params, children):
+        operands = []
+
+        # Fuse adjacent constants and adjacent extracts of the same
+        # expression.
+        for child in children:
+            if operands:
+                prev = operands[-1]
+                fused = self._fuse(prev, child)
+
+                if fused is not None:
+                    operands[-1] = fused
+
+                    continue
+
+            operands.append(child)
+
+        # Leading zeros.
+        if len(operands) > 1 and _constant_value(operands[0]) == 0:
+            rest = operands[1:]
+            rest_sort = sort - operands[0].sort
+            rest = rest[0] if len(rest) == 1 else make_node("concat", rest_sort, tuple(rest))
+
+            return self._rewrite("(_ zero_extend {})".format(operands[0].sort), sort, (rest,))
+
+        if len(operands) == 1:
+            return operands[0]
+
+        if len(operands) < len(children):
+            return make_node("concat", sort, tuple(operands))
+
+        return None
+
+    def _rewrite_ite(self, op, sort, params, children):
+        cond, true, false = children
+        value = _constant_value(cond)
+
+        if value is True:
+            return true
+
+        if value is False:
+            return false
+
+        if true is false:
+            return true
+
+        return None
+
+    def _rewrite_equal(self, op, sort, params, children):
+        a, b = children
+
+        if a is b:
+            return _BOOL_TRUE
+
+        a_val, b_val = _constant_value(a), _constant_value(b)
+
+        if a_val is not None and b_val is not None:
+            return _make_bool(a_val == b_val)
+
+        return None
+
+    def _rewrite_not(self, op, sort, params, children):
+        child = children[0]
+        value = _constant_value(child)
+
+        if value is not None:
+            return _make_bool(not value)
+
+        if child.op == "not":
+            return child.children[0]
+
+        return None
+
+    def _rewrite_bool(self, op, sort, params, children):
+        values = [_constant_value(c) for c in children]
+
+        # Absorbing and neutral elements.
+        absorbing = op == "or"
+
+        if absorbing in values:
+            return _make_bool(absorbing)
+
+        operands = [c for c, v in zip(children, values) if v is None]
+
+        if not operands:
+            return _make_bool(not absorbing)
+
+        if len(operands) == 1:
+            return operands[0]
+
+        if len(operands) < len(children):
+            return make_node(op, sort, tuple(operands))
+
+        return None
+
+    def _rewrite_comparison(self, op, sort, params, children):
+        a, b = children
+        a_val, b_val = _constant_value(a), _constant_value(b)
+
+        if a_val is not None and b_val is not None:
+            return _make_bool(_fold_comparison(op, a_val, b_val, a.sort))
+
+        return None
+
+    def _extract(self, node, high, low):
+        return self._rewrite("(_ extract {} {})".format(high, low), high - low + 1, (node,))
+
+    def _fuse(self, high, low):
+        # Return a single node for (concat high low), or None.
+        high_val, low_val = _constant_value(high), _constant_value(low)
+
+        if high_val is not None and low_val is not None:
+            return _make_constant((high_val << low.sort) | low_val, high.sort + low.sort)
+
+        high_name, high_params = _parse_op(high.op)
+        low_name, low_params = _parse_op(low.op)
+
+        if high_name == "extract" and low_name == "extract" and \
+           high.children[0] is low.children[0] and high_params[1] == low_params[0] + 1:
+            return self._extract(high.children[0], high_params[0], low_params[1])
+
+        return None
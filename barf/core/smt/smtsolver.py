@@ -22,14 +22,66 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import hashlib
 import logging
 import re
 import subprocess
 
+try:
+    import z3
+except ImportError:
+    z3 = None
+
+from barf.core.smt.smtcache import canonical_form
+from barf.core.smt.smtcache import canonical_hash
+from barf.core.smt.smtsimplifier import SmtSimplifier
 from barf.core.smt.smtsymbol import Bool
+from barf.core.smt.smtsymbol import serialize
 
 logger = logging.getLogger(__name__)
 
+# z3 C API functions (see Z3PySolver) of each SMT-LIB operator.
+_Z3_FUNCTIONS = {
+    "=": "Z3_mk_eq",
+    "not": "Z3_mk_not",
+    "xor": "Z3_mk_xor",
+    "ite": "Z3_mk_ite",
+    "bvadd": "Z3_mk_bvadd",
+    "bvsub": "Z3_mk_bvsub",
+    "bvmul": "Z3_mk_bvmul",
+    "bvudiv": "Z3_mk_bvudiv",
+    "bvurem": "Z3_mk_bvurem",
+    "bvsdiv": "Z3_mk_bvsdiv",
+    "bvsrem": "Z3_mk_bvsrem",
+    "bvsmod": "Z3_mk_bvsmod",
+    "bvneg": "Z3_mk_bvneg",
+    "bvnot": "Z3_mk_bvnot",
+    "bvand": "Z3_mk_bvand",
+    "bvor": "Z3_mk_bvor",
+    "bvxor": "Z3_mk_bvxor",
+    "bvshl": "Z3_mk_bvshl",
+    "bvlshr": "Z3_mk_bvlshr",
+    "bvashr": "Z3_mk_bvashr",
+    "bvult": "Z3_mk_bvult",
+    "bvule": "Z3_mk_bvule",
+    "bvugt": "Z3_mk_bvugt",
+    "bvuge": "Z3_mk_bvuge",
+    "bvslt": "Z3_mk_bvslt",
+    "bvsle": "Z3_mk_bvsle",
+    "bvsgt": "Z3_mk_bvsgt",
+    "bvsge": "Z3_mk_bvsge",
+    "select": "Z3_mk_select",
+    "store": "Z3_mk_store",
+}
+
+_Z3_INDEXED_FUNCTIONS = {
+    "extract": "Z3_mk_extract",
+    "zero_extend": "Z3_mk_zero_ext",
+    "sign_extend": "Z3_mk_sign_ext",
+}
+
+_INDEXED_OP_RE = re.compile(r"\(_ (\w+) ([\d ]+)\)")
+
 
 def _check_solver_installation(solver):
     found = True
@@ -47,14 +99,45 @@ class SmtSolverNotFound(Exception):
 
 class Z3Solver(object):
 
-    def __init__(self):
-        self._name = "z3"
+    _name = "z3"
 
+    def __init__(self, simplify=True, cache=None):
         self._status = "unknown"
 
         self._declarations = {}
         self._constraints = []
 
+        # Stack of saved (declarations, constraints count, query hash,
+        # variable names) tuples, one for each open scope.
+        self._scopes = []
+
+        # Expression simplifier, used when *simplify* is set.
+        self._simplifier = SmtSimplifier() if simplify else None
+
+        # Query cache (see smtcache.SmtQueryCache), if any.
+        self._cache = cache
+        self._version = None
+
+        # Hash of the canonical form of the asserted constraints and
+        # the variable names used to build it.
+        self._query = hashlib.sha1()
+        self._names = {}
+
+        # Model of the last check, a map from expression hashes to
+        # values, and whether it was computed by the solver (instead of
+        # taken from the cache).
+        self._model = {}
+        self._solved = False
+
+        # (expression hash, expression, value) tuples of the values
+        # returned since the last check, and whether they are asserted
+        # (in a scope of their own) to solve again.
+        self._served = []
+        self._pinned = False
+
+        # Commands not sent to the solver yet.
+        self._buffer = []
+
         self._process = None
 
         self._check_solver()
@@ -68,10 +151,29 @@ class Z3Solver(object):
     def _start_solver(self):
         self._process = subprocess.Popen("z3 -smt2 -in", shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
 
+        self._init_solver()
+
+    def _init_solver(self):
         # Set z3 declaration scopes.
         self._write("(set-option :global-decls false)")
         self._write("(set-logic QF_AUFBV)")
 
+    def _reset_solver(self):
+        # Commands not sent yet are removed by the reset anyway.
+        self._buffer = []
+
+        self._write("(reset)")
+        self._write("(echo \"reset\")")
+
+        # Discard any pending output (for instance, error messages) so
+        # it is not taken as the answer to a later command.
+        response = self._read()
+
+        while response and response.strip('"') != "reset":
+            response = self._read()
+
+        return response != ""
+
     def _stop_solver(self):
         if self._process:
             self._process.kill()
@@ -79,18 +181,73 @@ class Z3Solver(object):
 
             self._process = None
 
+        self._buffer = []
+
     def _write(self, command):
+        # Commands are sent when a response is read, so answers taken
+        # from the cache save writing to the solver.
         logger.debug("> %s", command)
 
-        self._process.stdin.writelines(command + "\n")
+        self._buffer.append(command + "\n")
+
+    def _flush(self):
+        if self._buffer:
+            self._process.stdin.write("".join(self._buffer))
+
+            self._buffer = []
 
     def _read(self):
+        self._flush()
+
         response = self._process.stdout.readline()[:-1]
 
         logger.debug("< %s", response)
 
         return response
 
+    def _clear_solver(self):
+        # Reuse the solver process unless it is not running anymore.
+        if self._process and self._process.poll() is None and self._reset_solver():
+            self._init_solver()
+        else:
+            self._stop_solver()
+            self._start_solver()
+
+    def _assert_node(self, node):
+        self._write("(assert {})".format(serialize(node)))
+
+    def _declare(self, fun):
+        self._write(fun.declaration)
+
+    def _push_scope(self):
+        self._write("(push 1)")
+
+    def _pop_scope(self):
+        self._write("(pop 1)")
+
+    def _check_sat(self):
+        self._write("(check-sat)")
+
+        return self._read()
+
+    def _get_value(self, expr):
+        self._write("(get-value ({}))".format(expr))
+
+        response = self._read()
+
+        regex = r"\(\(([^\s]+|\(.*\))\s#x([^\s]+)\)\)"
+        match = re.search(regex, response).groups()[1]
+
+        return int(match, 16)
+
+    def _get_version(self):
+        self._write("(get-info :version)")
+
+        response = self._read()
+        match = re.search(r'"(.*)"', response)
+
+        return match.group(1) if match else response
+
     def __del__(self):
         self._stop_solver()
 
@@ -100,10 +257,50 @@ class Z3Solver(object):
 
         return "\n".join(declarations + constraints)
 
+    def _assert(self, node):
+        self._assert_node(node)
+
+        if self._cache:
+            self._query.update(canonical_form(node, self._names))
+
+    def _solve(self):
+        self._status = self._check_sat()
+        self._model = {}
+        self._solved = True
+
+    def _pin(self):
+        # Assert the values returned so far, so the new model agrees
+        # with them.
+        self._push_scope()
+
+        for _, expr, value in self._served:
+            self._assert_node((expr == value).node)
+
+        self._pinned = True
+
+    def _unpin(self):
+        if self._pinned:
+            self._pop_scope()
+
+            self._pinned = False
+            self._solved = False
+
+    def _query_key(self):
+        if self._version is None:
+            self._version = self._get_version()
+
+        return self._name, self._version, self._query.hexdigest()
+
     def add(self, constraint):
         assert isinstance(constraint, Bool)
 
-        self._write("(assert {})".format(constraint))
+        self._unpin()
+
+        if self._simplifier:
+            for node in self._simplifier.add(constraint.node, self._declarations):
+                self._assert(node)
+        else:
+            self._assert(constraint.node)
 
         self._constraints.append(constraint)
 
@@ -113,132 +310,352 @@ class Z3Solver(object):
         assert self._status in ("sat", "unsat", "unknown")
 
         if self._status == "unknown":
-            self._write("(check-sat)")
-            self._status = self._read()
+            entry = None
+
+            if self._cache:
+                key = self._query_key()
+                entry = self._cache.get(key)
+
+            if entry:
+                self._status, self._model = entry
+                self._solved = False
+            else:
+                self._solve()
+
+                if self._cache and self._status in ("sat", "unsat"):
+                    self._cache.put(key, self._status, self._model)
+
+            self._served = []
 
         return self._status
 
     def reset(self):
-        self._stop_solver()
-
+        # Remove all declarations and assertions.
         self._status = "unknown"
 
         self._declarations = {}
         self._constraints = []
+        self._scopes = []
 
-        self._start_solver()
+        self._query = hashlib.sha1()
+        self._names = {}
+        self._model = {}
+        self._solved = False
+        self._served = []
+        self._pinned = False
+
+        if self._simplifier:
+            self._simplifier.reset()
+
+        self._clear_solver()
+
+    def push(self):
+        # Declarations and assertions made from now on are removed by
+        # the matching pop.
+        self._unpin()
+
+        self._push_scope()
+
+        self._scopes.append((dict(self._declarations), len(self._constraints), self._query.copy(),
+                             dict(self._names)))
+
+        if self._simplifier:
+            self._simplifier.push()
+
+    def pop(self):
+        self._unpin()
+
+        self._pop_scope()
+
+        self._declarations, count, self._query, self._names = self._scopes.pop()
+
+        del self._constraints[count:]
+
+        if self._simplifier:
+            self._simplifier.pop()
+
+        self._status = "unknown"
 
     def get_value(self, expr):
+        if self._simplifier:
+            # Send the definitions held back so far, so the model covers
+            # all variables.
+            for node in self._simplifier.restore():
+                self._unpin()
+                self._assert(node)
+
+                self._status = "unknown"
+
         assert self.check() == "sat"
 
-        self._write("(get-value ({}))".format(expr))
+        key = canonical_hash(expr.node, dict(self._names)) if self._cache else None
 
-        response = self._read()
+        if key in self._model:
+            self._served.append((key, expr, self._model[key]))
 
-        regex = r"\(\(([^\s]+|\(.*\))\s#x([^\s]+)\)\)"
-        match = re.search(regex, response).groups()[1]
+            return self._model[key]
 
-        return int(match, 16)
+        if not self._solved:
+            # The model comes from the cache and does not have the
+            # value, solve again.
+            self._pin()
+            self._solve()
+
+            assert self._status == "sat"
+
+            self._model = dict((k, v) for k, _, v in self._served)
+
+        return self._add_value(key, expr, self._get_value(expr))
+
+    def _add_value(self, key, expr, value):
+        if key:
+            self._model[key] = value
+            self._served.append((key, expr, value))
+
+            self._cache.put(self._query_key(), self._status, self._model)
+
+        return value
 
     def declare_fun(self, name, fun):
         if name in self._declarations:
             raise Exception("Symbol already declare.")
 
+        self._unpin()
+
         self._declarations[name] = fun
-        self._write(fun.declaration)
+        self._declare(fun)
 
     @property
     def declarations(self):
         return self._declarations
 
+    @property
+    def simplify(self):
+        return self._simplifier is not None
 
-class CVC4Solver(object):
+    @property
+    def cache(self):
+        return self._cache
 
-    def __init__(self):
-        self._name = "cvc4"
+    @property
+    def simplifier_stats(self):
+        return self._simplifier.stats if self._simplifier else {}
 
-        self._status = "unknown"
 
-        self._declarations = {}
-        self._constraints = []
+class Z3PySolver(Z3Solver):
 
-        self._process = None
+    # Same as Z3Solver, but z3 runs in-process through its Python
+    # bindings. Expressions are built as z3 terms straight from their
+    # nodes (using the z3 C API), so there is no serialization, pipe or
+    # parsing involved.
 
-        self._check_solver()
+    def __init__(self, simplify=True, cache=None):
+        # z3 context and solver.
+        self._context = None
+        self._solver = None
 
-        self._start_solver()
+        # z3 terms (referenced ASTs) of the nodes built so far (see
+        # _term).
+        self._terms = {}
+
+        # Bit vector sorts, by size.
+        self._sorts = {}
+
+        # z3 C API functions, by operator.
+        self._functions = {}
+
+        # Model of the last check, fetched when first needed.
+        self._z3_model = None
+
+        super(Z3PySolver, self).__init__(simplify=simplify, cache=cache)
 
     def _check_solver(self):
-        if not _check_solver_installation(self._name):
-            raise SmtSolverNotFound("{} solver is not installed".format(self._name))
+        if z3 is None:
+            raise SmtSolverNotFound("z3 Python bindings are not installed")
 
     def _start_solver(self):
-        self._process = subprocess.Popen("cvc4 --incremental --lang=smt2", shell=True,
-                                         stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        # Each solver has a context of its own, so solvers can be used
+        # from different threads.
+        self._context = z3.Context()
+        self._solver = z3.SolverFor("QF_AUFBV", ctx=self._context)
 
-        # Set CVC4 declaration scopes.
-        self._write("(set-logic QF_AUFBV)")
-        self._write("(set-option :produce-models true)")
+        self._terms = {}
+        self._sorts = {}
+        self._z3_model = None
+
+        self._functions = dict([(op, getattr(z3, name)) for op, name in _Z3_FUNCTIONS.items()])
 
     def _stop_solver(self):
-        if self._process:
-            self._process.kill()
-            self._process.wait()
+        # Terms are released together with the context.
+        self._terms = {}
+        self._sorts = {}
+        self._z3_model = None
 
-            self._process = None
+        self._solver = None
+        self._context = None
 
-    def _write(self, command):
-        logger.debug("> %s", command)
+    def _clear_solver(self):
+        self._solver.reset()
 
-        self._process.stdin.writelines(command + "\n")
+        self._release_terms()
 
-    def _read(self):
-        response = self._process.stdout.readline()[:-1]
+        self._z3_model = None
 
-        logger.debug("< %s", response)
+    def _assert_node(self, node):
+        z3.Z3_solver_assert(self._context.ref(), self._solver.solver, self._term(node))
 
-        return response
+    def _declare(self, fun):
+        # Variables are created when first used (see _make_leaf).
+        pass
 
-    def __del__(self):
-        self._stop_solver()
+    def _push_scope(self):
+        self._solver.push()
 
-    def __str__(self):
-        declarations = [d.declaration for d in self._declarations.values()]
-        constraints = ["(assert {})".format(c) for c in self._constraints]
+    def _pop_scope(self):
+        self._solver.pop()
 
-        return "\n".join(declarations + constraints)
+        # Terms may refer to declarations removed by the pop.
+        self._release_terms()
 
-    def add(self, constraint):
-        assert isinstance(constraint, Bool)
+    def _check_sat(self):
+        self._z3_model = None
 
-        self._write("(assert {})".format(constraint))
+        return str(self._solver.check())
 
-        self._constraints.append(constraint)
+    def _get_value(self, expr):
+        if self._z3_model is None:
+            self._z3_model = self._solver.model()
 
-        self._status = "unknown"
+        term = z3.BitVecRef(self._term(expr.node), self._context)
 
-    def check(self):
-        assert self._status in ("sat", "unsat", "unknown")
+        return self._z3_model.eval(term, model_completion=True).as_long()
 
-        if self._status == "unknown":
-            self._write("(check-sat)")
-            self._status = self._read()
+    def _get_version(self):
+        return z3.get_version_string()
 
-        return self._status
+    def _release_terms(self):
+        ref = self._context.ref()
 
-    def reset(self):
-        self._stop_solver()
+        for ast in self._terms.itervalues():
+            z3.Z3_dec_ref(ref, ast)
 
-        self._status = "unknown"
+        self._terms = {}
 
-        self._declarations = {}
-        self._constraints = []
+    def _term(self, node):
+        # Return the z3 term of a node. Terms of shared nodes are built
+        # once.
+        terms = self._terms
 
-        self._start_solver()
+        if node in terms:
+            return terms[node]
 
-    def get_value(self, expr):
-        assert self.check() == "sat"
+        ref = self._context.ref()
+        stack = [(node, iter(node.children))]
+
+        while stack:
+            parent, children = stack[-1]
+
+            for child in children:
+                if child not in terms:
+                    stack.append((child, iter(child.children)))
+
+                    break
+            else:
+                stack.pop()
+
+                if parent.children:
+                    ast = self._make_term(parent.op, [terms[c] for c in parent.children])
+                else:
+                    ast = self._make_leaf(parent)
 
+                z3.Z3_inc_ref(ref, ast)
+
+                terms[parent] = ast
+
+        return terms[node]
+
+    def _make_leaf(self, node):
+        op = node.op
+        ref = self._context.ref()
+
+        if op == "true":
+            return z3.Z3_mk_true(ref)
+
+        if op == "false":
+            return z3.Z3_mk_false(ref)
+
+        if node.sort == "Bool":
+            sort = z3.Z3_mk_bool_sort(ref)
+        elif node.sort == "Array":
+            fun = self._declarations[op]
+
+            sort = z3.Z3_mk_array_sort(ref, self._get_sort(fun.key_size), self._get_sort(fun.value_size))
+        else:
+            sort = self._get_sort(node.sort)
+
+            if op.startswith("#"):
+                value = int(op[2:], 16 if op.startswith("#x") else 2)
+
+                return z3.Z3_mk_numeral(ref, str(value), sort)
+
+        return z3.Z3_mk_const(ref, z3.to_symbol(op, self._context), sort)
+
+    def _get_sort(self, size):
+        if size not in self._sorts:
+            self._sorts[size] = z3.BitVecSort(size, self._context)
+
+        return self._sorts[size].ast
+
+    def _make_term(self, op, args):
+        ref = self._context.ref()
+
+        if op in self._functions:
+            return self._functions[op](ref, *args)
+
+        if op in ("and", "or"):
+            array = (z3.Ast * len(args))(*args)
+
+            if op == "and":
+                return z3.Z3_mk_and(ref, len(args), array)
+            else:
+                return z3.Z3_mk_or(ref, len(args), array)
+
+        if op == "concat":
+            ast = args[0]
+
+            for arg in args[1:]:
+                ast = z3.Z3_mk_concat(ref, ast, arg)
+
+            return ast
+
+        match = _INDEXED_OP_RE.match(op)
+
+        if not match:
+            raise Exception("Invalid operator: {}".format(op))
+
+        name, indices = match.group(1), [int(i) for i in match.group(2).split()]
+
+        return getattr(z3, _Z3_INDEXED_FUNCTIONS[name])(ref, *(indices + args))
+
+
+class CVC4Solver(Z3Solver):
+
+    # Same as Z3Solver, but runs CVC4 instead.
+
+    _name = "cvc4"
+
+    def _start_solver(self):
+        self._process = subprocess.Popen("cvc4 --incremental --lang=smt2", shell=True,
+                                         stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+        self._init_solver()
+
+    def _init_solver(self):
+        # Set CVC4 declaration scopes.
+        self._write("(set-logic QF_AUFBV)")
+        self._write("(set-option :produce-models true)")
+
+    def _get_value(self, expr):
         self._write("(get-value ({}))".format(expr))
 
         response = self._read()
@@ -247,14 +664,3 @@ class CVC4Solver(object):
         match = re.search(regex, response).groups()[1]
 
         return int(match)
-
-    def declare_fun(self, name, fun):
-        if name in self._declarations:
-            raise Exception("Symbol already declare.")
-
-        self._declarations[name] = fun
-        self._write(fun.declaration)
-
-    @property
-    def declarations(self):
-        return self._declarations
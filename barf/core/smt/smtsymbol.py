@@ -41,21 +41,182 @@ def _cast_to_bitvec(value, size):
     return value
 
 
+# Expression DAG
+# ============================================================================ #
+# Interned expression nodes, keyed by operator, sort and children. Children
+# are interned before their parents so their identity (nodes do not
+# define equality) is enough to compare them structurally. The table
+# is emptied when it gets full, which only means that nodes built
+# before and after that are not shared.
+_nodes = {}
+
+_NODES_MAX = 1 << 15
+
+# Nodes with up to this many subterms (counted as in a tree, see
+# Node.weight) keep their SMT-LIB representation once it is built.
+_SMALL_SIZE = 128
+
+
+class Node(object):
+
+    """SMT expression node. It is made of an operator (or a symbol
+    name, for leaves), a sort (the size for bit vectors, "Bool" or
+    "Array") and a tuple of children nodes.
+    """
+
+    __slots__ = ["op", "sort", "children", "weight", "text"]
+
+    def __init__(self, op, sort, children):
+        self.op = op
+        self.sort = sort
+        self.children = children
+        self.weight = 1
+        self.text = None
+
+        for c in children:
+            self.weight += c.weight
+
+        self.weight = min(self.weight, _SMALL_SIZE + 1)
+
+
+def make_node(op, sort, children=()):
+    """Return the (unique) node for an operator, sort and children.
+    """
+    key = (op, sort, children)
+
+    node = _nodes.get(key)
+
+    if node is None:
+        if len(_nodes) >= _NODES_MAX:
+            _nodes.clear()
+
+        node = Node(op, sort, children)
+
+        _nodes[key] = node
+
+    return node
+
+
+def _small_text(node):
+    # Return the SMT-LIB representation of a small node.
+    if node.text is None:
+        if node.children:
+            node.text = "(" + node.op + " " + " ".join([_small_text(c) for c in node.children]) + ")"
+        else:
+            node.text = node.op
+
+    return node.text
+
+
+def _expand(node, names, out):
+    # Append the SMT-LIB representation of a node to *out*. Nodes in
+    # *names* (except the one being expanded) are written by name.
+    stack = [node]
+
+    while stack:
+        item = stack.pop()
+
+        if not isinstance(item, Node):
+            out.append(item)
+        elif item is not node and id(item) in names:
+            out.append(names[id(item)])
+        elif item.weight <= _SMALL_SIZE:
+            out.append(_small_text(item))
+        else:
+            stack.append(")")
+
+            for child in reversed(item.children):
+                stack.append(child)
+                stack.append(" ")
+
+            stack.append("(" + item.op)
+
+
+def serialize(node):
+    """Return the SMT-LIB representation of a node. Large subterms
+    that appear more than once are bound with a *let* and written once.
+    """
+    if node.weight <= _SMALL_SIZE:
+        return _small_text(node)
+
+    # Count references to each large node and sort them in post-order.
+    # Small nodes are always written in full.
+    refs = {id(node): 0}
+    order = []
+    stack = [(node, iter(node.children))]
+
+    while stack:
+        parent, children = stack[-1]
+
+        for child in children:
+            if child.weight <= _SMALL_SIZE:
+                continue
+
+            if id(child) in refs:
+                refs[id(child)] += 1
+            else:
+                refs[id(child)] = 1
+
+                stack.append((child, iter(child.children)))
+
+                break
+        else:
+            stack.pop()
+
+            order.append(parent)
+
+    shared = [n for n in order if refs[id(n)] > 1]
+    names = dict((id(n), "?x{}".format(i)) for i, n in enumerate(shared))
+
+    out = []
+
+    for n in shared:
+        out.append("(let ((" + names[id(n)] + " ")
+
+        _expand(n, names, out)
+
+        out.append(")) ")
+
+    _expand(node, names, out)
+
+    out.append(")" * len(shared))
+
+    return "".join(out)
+
+
+# Symbols
+# ============================================================================ #
 class Symbol(object):
 
+    sort = None
+
     def __init__(self, value, *children):
-        self._value = str(value) if len(children) == 0 else "({:s} {:s})".format(value, " ".join([str(c) for c in children]))
+        self._node = make_node(str(value), self.sort, tuple([c._node for c in children]))
+
+    @property
+    def node(self):
+        return self._node
 
     @property
     def value(self):
-        return self._value
+        # Full expansion, shared subterms are written every time.
+        if self._node.weight <= _SMALL_SIZE:
+            return _small_text(self._node)
+
+        out = []
+
+        _expand(self._node, {}, out)
+
+        return "".join(out)
 
     def __str__(self):
-        return self._value
+        return serialize(self._node)
 
 
 class Bool(Symbol):
 
+    sort = "Bool"
+
     def __init__(self, value, *children):
         super(Bool, self).__init__(value, *children)
 
@@ -97,9 +258,13 @@ class Bool(Symbol):
 class BitVec(Symbol):
 
     def __init__(self, size, value, *children):
+        self.size = size
+
         super(BitVec, self).__init__(value, *children)
 
-        self.size = size
+    @property
+    def sort(self):
+        return self.size
 
     @property
     def declaration(self):
@@ -220,8 +385,6 @@ class Constant(BitVec):
     def __init__(self, size, value, *children):
         super(Constant, self).__init__(size, self._cast_value(value, size), *children)
 
-        self.size = size
-
     def _cast_value(self, value, size):
         # Truncate value.
         value = value & ((1 << size) - 1)
@@ -237,6 +400,8 @@ class Constant(BitVec):
 
 class Array(Symbol):
 
+    sort = "Array"
+
     def __init__(self, key_size, value_size, value, *children):
         super(Array, self).__init__(value, *children)
 
@@ -261,9 +426,8 @@ class BitVecArray(object):
         return BitVec(self.value_size, "select", self.array, _cast_to_bitvec(key, self.key_size))
 
     def store(self, key, value):
-        return Array(self.key_size, self.value_size, "(store {} {} {})".format(self.array,
-                                                                               _cast_to_bitvec(key, self.key_size),
-                                                                               _cast_to_bitvec(value, self.value_size)))
+        return Array(self.key_size, self.value_size, "store", self.array, _cast_to_bitvec(key, self.key_size),
+                     _cast_to_bitvec(value, self.value_size))
 
     # Index operators
     def __getitem__(self, key):
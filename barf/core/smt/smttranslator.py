@@ -44,6 +44,7 @@ t2_0 (bvadd t0_1 t1_0))". It also send the following commands to the solver:
 (assert (= t2_0 (bvadd t1_0 t2_0)))
 
 """
+import copy
 import logging
 
 import barf.core.smt.smtfunction as smtfunction
@@ -85,6 +86,9 @@ class SmtTranslator(object):
         self._arch_regs_size = {}
         self._arch_alias_mapper = {}
 
+        # Saved translation states, one for each open solver scope.
+        self._scopes = []
+
         # Instructions translators (from REIL to SMT expressions)
         self._instr_translators = {
             # Arithmetic Instructions
@@ -169,6 +173,25 @@ class SmtTranslator(object):
 
         self._var_name_mappers = {}
 
+        self._scopes = []
+
+    def push(self):
+        """Save internal state and open a new solver scope.
+        """
+        self._solver.push()
+
+        var_name_mappers = dict((name, copy.copy(namer)) for name, namer in self._var_name_mappers.items())
+
+        self._scopes.append((self._mem_instance, self._mem_curr, var_name_mappers))
+
+    def pop(self):
+        """Restore the internal state saved by the last *push* and close
+        its solver scope.
+        """
+        self._solver.pop()
+
+        self._mem_instance, self._mem_curr, self._var_name_mappers = self._scopes.pop()
+
     def set_arch_alias_mapper(self, alias_mapper):
         """Set native register alias mapper.
 
@@ -26,17 +26,36 @@
 
 from __future__ import print_function
 
+import Queue
 import argparse
 import os
 import sys
+import threading
 import time
 
+from collections import OrderedDict
+
 from pygments import highlight
 from pygments.formatters import TerminalFormatter
 from pygments.lexers.asm import NasmLexer
 
 from barf.analysis.gadget.gadget import GadgetType
+from barf.analysis.gadget.gadgetdb import GadgetDatabase
+from barf.analysis.gadget.gadgetdb import hash_file
 from barf.barf import BARF
+from barf.core.smt.smtcache import SmtQueryCache
+
+
+# Maximum number of gadgets waiting between two stages of the
+# streaming pipeline.
+STREAM_QUEUE_SIZE = 1024
+
+# Maximum number of equivalence classes whose classification and
+# verification results are kept by the streaming pipeline.
+STREAM_CACHE_SIZE = 4096
+
+# End of stream marker.
+STREAM_END = None
 
 
 def filter_duplicates(candidates):
@@ -52,6 +71,18 @@ def filter_duplicates(candidates):
     return [cand for asm_instrs, cand in gadgets.items()]
 
 
+def verification_key(gadget):
+    # Typed gadgets with the same key have the same verification result.
+    return (
+        gadget.canonical_hash,
+        gadget.type,
+        tuple(str(oprnd) for oprnd in gadget.sources),
+        tuple(str(oprnd) for oprnd in gadget.destination),
+        tuple(str(reg) for reg in gadget.modified_registers),
+        gadget.operation,
+    )
+
+
 def sort_gadgets_by_type(gadgets):
     # Sort gadgets by type.
     gadgets_by_type = {}
@@ -93,6 +124,39 @@ def sort_gadgets_by_depth(gadgets):
     return gadgets_by_depth
 
 
+def print_gadget_raw(gadget, f, color, show_binary):
+    asm_instrs = [str(dinstr.asm_instr) for dinstr in gadget.instrs]
+
+    if color:
+        asm_instrs = map(lambda s: highlight(s, NasmLexer(), TerminalFormatter()), asm_instrs)
+
+    asm_instrs_str = " ; ".join(asm_instrs).replace("\n", "")
+
+    if show_binary:
+        try:
+            asm_bytes = ["%02x" % ord(b) for dinstr in gadget.instrs for b in dinstr.asm_instr.bytes]
+            asm_bytes_str = "".join(asm_bytes)
+
+            print("0x%08x: %32s | %s" % (gadget.address, asm_bytes_str, asm_instrs_str), file=f)
+        except:
+            print("[+] Error!")
+            print("\t0x%08x: %s" % (gadget.address, asm_instrs_str), file=f)
+    else:
+        print("0x%08x: %s" % (gadget.address, asm_instrs_str), file=f)
+
+
+def print_gadget_typed(gadget, f, address_size):
+    asm_instrs = [str(dinstr.asm_instr) for dinstr in gadget.instrs]
+    asm_instrs_str = " ; ".join(asm_instrs).replace("\n", "")
+
+    print(" 0x{addr:0{width}x} | {type} | {gadget} | {instrs} ".format(
+        addr=gadget.address,
+        width=address_size / 4,
+        type=GadgetType.to_string(gadget.type),
+        gadget=gadget,
+        instrs=asm_instrs_str), file=f)
+
+
 def print_gadgets_raw(gadgets, f, sort_mode, color, title, show_binary):
     # Print title
     print(title,            file=f)
@@ -108,24 +172,7 @@ def print_gadgets_raw(gadgets, f, sort_mode, color, title, show_binary):
 
     for key in sorted(gadgets_sorted.keys()):
         for gadget in gadgets_sorted[key]:
-            asm_instrs = [str(dinstr.asm_instr) for dinstr in gadget.instrs]
-
-            if color:
-                asm_instrs = map(lambda s: highlight(s, NasmLexer(), TerminalFormatter()), asm_instrs)
-
-            asm_instrs_str = " ; ".join(asm_instrs).replace("\n", "")
-
-            if show_binary:
-                try:
-                    asm_bytes = ["%02x" % ord(b) for dinstr in gadget.instrs for b in dinstr.asm_instr.bytes]
-                    asm_bytes_str = "".join(asm_bytes)
-
-                    print("0x%08x: %32s | %s" % (gadget.address, asm_bytes_str, asm_instrs_str), file=f)
-                except:
-                    print("[+] Error!")
-                    print("\t0x%08x: %s" % (gadget.address, asm_instrs_str), file=f)
-            else:
-                print("0x%08x: %s" % (gadget.address, asm_instrs_str), file=f)
+            print_gadget_raw(gadget, f, color, show_binary)
 
         if sort_mode == "depth":
             print("", file=f)
@@ -256,6 +303,29 @@ def init_parser():
         default=2,
         help="Gadget depth in number of instructions.")
 
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used to find gadgets (and of solver processes used to verify them).")
+
+    parser.add_argument(
+        "-s", "--stream",
+        action="store_true",
+        help="Classify and verify gadgets while they are found, printing them as soon as they are ready (unsorted).")
+
+    parser.add_argument(
+        "-d", "--db",
+        type=str,
+        default=None,
+        help="Gadget database file. The results of each step are loaded from it if available, and saved to it otherwise (not used with --stream).")
+
+    parser.add_argument(
+        "--smt-cache",
+        type=str,
+        default=None,
+        help="SMT query cache file. Solver answers are saved to it and reused by later runs.")
+
     parser.add_argument(
         "-u", "--unique",
         action="store_true",
@@ -324,10 +394,20 @@ def init_parser():
     return parser
 
 
-def do_find(b, args):
+def do_find(b, args, db=None, binary_id=None):
     start = time.time()
 
-    candidates = b.gadget_finder.find(b.binary.ea_start, b.binary.ea_end, byte_depth=args.bdepth, instrs_depth=args.idepth)
+    # Load gadgets from the database.
+    if db and db.is_stored(binary_id, "found"):
+        candidates = db.get_gadgets(binary_id)
+
+        end = time.time()
+        find_time = end - start
+
+        return candidates, find_time
+
+    candidates = b.gadget_finder.find(b.binary.ea_start, b.binary.ea_end, byte_depth=args.bdepth,
+                                      instrs_depth=args.idepth, jobs=args.jobs)
 
     end = time.time()
     find_time = end - start
@@ -339,35 +419,78 @@ def do_find(b, args):
         end = time.time()
         find_time = end - start
 
+    if db:
+        db.add_gadgets(binary_id, candidates)
+
     return candidates, find_time
 
 
-def do_classify(b, gadgets, args):
+def do_classify(b, gadgets, args, db=None, binary_id=None):
     start = time.time()
 
+    # Load classification from the database.
+    if db and db.is_stored(binary_id, "classified"):
+        classified = db.get_typed_gadgets(binary_id, gadgets)
+
+        end = time.time()
+        classify_time = end - start
+
+        return classified, classify_time, len(set(gadget.canonical_hash for gadget in gadgets))
+
     classified = []
 
+    # Classify one gadget per equivalence class (gadgets with the same
+    # canonical REIL form) and copy the result to the rest.
+    classes = {}
+
     for gadget in gadgets:
-        classified += b.gadget_classifier.classify(gadget)
+        key = gadget.canonical_hash
+
+        if key not in classes:
+            classes[key] = b.gadget_classifier.classify(gadget)
+
+            classified += classes[key]
+        else:
+            classified += [typed_gadget.clone(gadget) for typed_gadget in classes[key]]
 
     end = time.time()
 
     classify_time = end - start
 
-    return classified, classify_time
+    if db:
+        db.add_typed_gadgets(binary_id, classified)
+
+    return classified, classify_time, len(classes)
 
 
-def do_verify(b, classified, args):
+def do_verify(b, classified, args, db=None, binary_id=None):
     start = time.time()
 
     verified = []
     invalid = []
 
-    for gadget in classified:
-        valid = b.gadget_verifier.verify(gadget)
+    # Verification status is loaded from the database along with the
+    # classification.
+    if not (db and db.is_stored(binary_id, "verified")):
+        # Verify one gadget per equivalence class.
+        keys = [verification_key(gadget) for gadget in classified]
+
+        representatives = {}
+
+        for key, gadget in zip(keys, classified):
+            representatives.setdefault(key, gadget)
+
+        results = dict(zip(representatives.keys(),
+                           b.gadget_verifier.verify_many(representatives.values(), workers=args.jobs)))
 
-        if valid:
-            gadget.is_valid = True
+        for key, gadget in zip(keys, classified):
+            gadget.is_valid = results[key]
+
+        if db:
+            db.set_verified(binary_id, classified)
+
+    for gadget in classified:
+        if gadget.is_valid:
             verified += [gadget]
         else:
             invalid += [gadget]
@@ -418,15 +541,329 @@ def do_verify(b, classified, args):
     return verified, verify_time, discarded, invalid
 
 
-def main():
-    parser = init_parser()
-
-    args = parser.parse_args()
+def do_phases(b, args, output_fd, address_size, db=None, binary_id=None):
+    """Find, classify and verify gadgets one stage after the other. If a
+    gadget database is given, the results of each stage are loaded from
+    it when available, and stored in it otherwise.
 
+    Return the gadget counts and the time spent in each stage.
+    """
     find_time = 0.0
     classify_time = 0.0
     verify_time = 0.0
 
+    classified = []
+    verified = []
+    classes = 0
+
+    # Find gadgets.
+    candidates, find_time = do_find(b, args, db, binary_id)
+
+    print_gadgets_raw(candidates, output_fd, args.sort, args.color, "Raw Gadgets", args.show_binary)
+
+    # Classify gadgets.
+    if args.classify:
+        classified, classify_time, classes = do_classify(b, candidates, args, db, binary_id)
+
+        if args.show_classification:
+            print_gadgets_typed(classified, output_fd, address_size, "Classified Gadgets")
+
+    # Verify gadgets.
+    if args.verify:
+        if b.gadget_verifier:
+            verified, verify_time, discarded, invalid = do_verify(b, classified, args, db, binary_id)
+
+            print_gadgets_typed(verified, output_fd, address_size, "Verified Gadgets")
+
+            if args.show_invalid:
+                print_gadgets_typed(invalid, output_fd, address_size, "Invalid Gadgets (classified but didn't pass verification process)")
+
+            # print non-verified
+            candidates_by_addr = sort_gadgets_by_address(candidates)
+            verified_by_addr = sort_gadgets_by_address(verified)
+            discarded_by_addr = sort_gadgets_by_address(discarded)
+
+            diff = []
+
+            for addr in candidates_by_addr.keys():
+                if addr not in verified_by_addr and addr not in discarded_by_addr:
+                    diff += candidates_by_addr[addr]
+
+            print_gadgets_raw(diff, output_fd, args.sort, args.color, "Non-verified Gadgets", args.show_binary)
+        else:
+            print("Gadget verification not available. Check the log file for more information.")
+
+    counts = {
+        "candidates": len(candidates),
+        "classes": classes,
+        "classified": len(classified),
+        "verified": len(verified),
+        "verified_by_type": dict((ty, len(gadgets)) for ty, gadgets in sort_gadgets_by_type(verified).items()),
+    }
+
+    times = {
+        "find": find_time,
+        "classify": classify_time,
+        "verify": verify_time,
+    }
+
+    return counts, times
+
+
+class _BoundedCache(object):
+
+    """Map that only keeps its most recently used entries.
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """Return the value of a key (or None if it is not stored).
+        """
+        if key not in self._entries:
+            return None
+
+        value = self._entries.pop(key)
+
+        self._entries[key] = value
+
+        return value
+
+    def put(self, key, value):
+        """Store the value of a key, dropping the least recently used
+        entry if the map is full.
+        """
+        self._entries.pop(key, None)
+        self._entries[key] = value
+
+        if len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+
+
+def do_stream(b, args, f, address_size):
+    """Find, classify and verify gadgets in a pipeline. Each stage runs
+    in its own thread and passes gadgets to the next one through a
+    bounded queue, so stages overlap (for instance, the SMT solver
+    works while the emulator classifies). The gadgets that reach the
+    end of the pipeline are printed as soon as they are available.
+
+    The gadgets in flight are bounded by the queue sizes, and the
+    classification and verification results are only kept for the most
+    recently used equivalence classes (see STREAM_CACHE_SIZE). With -u,
+    the keys of the gadgets seen so far are kept too.
+
+    Return the gadget counts and the time spent in each stage.
+    """
+    counts = {
+        "candidates": 0,
+        "classes": 0,
+        "classified": 0,
+        "verified": 0,
+        "verified_by_type": {},
+    }
+
+    times = {
+        "find": 0.0,
+        "classify": 0.0,
+        "verify": 0.0,
+    }
+
+    errors = []
+
+    def find_stage(output_queue):
+        seen = set()
+
+        gadgets = b.gadget_finder.find_iter(b.binary.ea_start, b.binary.ea_end, byte_depth=args.bdepth,
+                                            instrs_depth=args.idepth)
+
+        while True:
+            start = time.time()
+
+            gadget = next(gadgets, STREAM_END)
+
+            times["find"] += time.time() - start
+
+            if gadget is STREAM_END:
+                break
+
+            # Filter duplicate gadgets.
+            if args.unique:
+                asm_instrs = " ; ".join([str(dinstr.asm_instr) for dinstr in gadget.instrs])
+
+                if asm_instrs in seen:
+                    continue
+
+                seen.add(asm_instrs)
+
+            counts["candidates"] += 1
+
+            output_queue.put(gadget)
+
+    # Classification and verification results by equivalence class
+    # (each one is only used by its stage's thread).
+    classes = _BoundedCache(STREAM_CACHE_SIZE)
+    results = _BoundedCache(STREAM_CACHE_SIZE)
+
+    def classify_stage(gadget, output_queue):
+        start = time.time()
+
+        key = gadget.canonical_hash
+
+        typed_gadgets = classes.get(key)
+
+        if typed_gadgets is None:
+            classified = b.gadget_classifier.classify(gadget)
+
+            classes.put(key, classified)
+
+            # Classes dropped from the cache are counted again if they
+            # show up later.
+            counts["classes"] += 1
+        else:
+            classified = [typed_gadget.clone(gadget) for typed_gadget in typed_gadgets]
+
+        times["classify"] += time.time() - start
+
+        for typed_gadget in classified:
+            counts["classified"] += 1
+
+            output_queue.put(typed_gadget)
+
+    seen_verified = set()
+
+    def verify_stage(gadget, output_queue):
+        start = time.time()
+
+        key = verification_key(gadget)
+
+        valid = results.get(key)
+
+        if valid is None:
+            valid = b.gadget_verifier.verify(gadget)
+
+            results.put(key, valid)
+
+        times["verify"] += time.time() - start
+
+        if not valid:
+            return
+
+        gadget.is_valid = True
+
+        # Filter by operand size.
+        if args.r:
+            if not all([op.size == args.r for op in gadget.sources]) or \
+                not all([op.size == args.r for op in gadget.destination]):
+                return
+
+        # Filter duplicate gadgets.
+        if args.unique:
+            key = gadget.type, str(gadget)
+
+            if key in seen_verified:
+                return
+
+            seen_verified.add(key)
+
+        counts["verified"] += 1
+        counts["verified_by_type"][gadget.type] = counts["verified_by_type"].get(gadget.type, 0) + 1
+
+        output_queue.put(gadget)
+
+    def run_stage(stage, input_queue, output_queue):
+        try:
+            if input_queue is None:
+                stage(output_queue)
+            else:
+                for gadget in iter(input_queue.get, STREAM_END):
+                    stage(gadget, output_queue)
+        except:
+            errors.append(sys.exc_info())
+
+            # Keep draining the input queue so the previous stage
+            # does not block.
+            if input_queue is not None:
+                for _ in iter(input_queue.get, STREAM_END):
+                    pass
+        finally:
+            output_queue.put(STREAM_END)
+
+    # Set up pipeline.
+    stages = [find_stage]
+
+    if args.classify:
+        stages += [classify_stage]
+
+    if args.verify:
+        stages += [verify_stage]
+
+    threads = []
+    input_queue = None
+
+    for stage in stages:
+        output_queue = Queue.Queue(STREAM_QUEUE_SIZE)
+
+        thread = threading.Thread(target=run_stage, args=(stage, input_queue, output_queue))
+        thread.daemon = True
+
+        threads.append(thread)
+
+        input_queue = output_queue
+
+    if args.verify:
+        title = "Verified Gadgets"
+    elif args.classify:
+        title = "Classified Gadgets"
+    else:
+        title = "Raw Gadgets"
+
+    print(title,            file=f)
+    print("=" * len(title), file=f)
+    print(" " * len(title), file=f)
+
+    for thread in threads:
+        thread.start()
+
+    # Print gadgets as they come out of the pipeline.
+    count = 0
+
+    for gadget in iter(input_queue.get, STREAM_END):
+        if args.classify:
+            print_gadget_typed(gadget, f, address_size)
+        else:
+            print_gadget_raw(gadget, f, args.color, args.show_binary)
+
+        f.flush()
+
+        count += 1
+
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        exc_type, exc_value, exc_traceback = errors[0]
+
+        raise exc_type, exc_value, exc_traceback
+
+    print("", file=f)
+
+    # Print summary.
+    summary_item = "[+] {name} : {value}".format(name=title, value=count)
+    summary_ruler = " " * len(summary_item)
+
+    print(summary_item,  file=f)
+    print(summary_ruler, file=f)
+
+    return counts, times
+
+
+def main():
+    parser = init_parser()
+
+    args = parser.parse_args()
+
     output_fd = sys.stdout
     filename = os.path.abspath(args.filename)
 
@@ -435,9 +872,11 @@ def main():
 
         sys.exit(1)
 
+    smt_cache = SmtQueryCache(filename=args.smt_cache) if args.smt_cache else None
+
     # create an instance of BARF
     try:
-        barf = BARF(filename)
+        barf = BARF(filename, smt_cache=smt_cache)
 
         address_size = barf.arch_info.address_size
     except Exception as err:
@@ -455,47 +894,38 @@ def main():
     if args.verify:
         args.classify = True
 
-    # Find gadgets.
-    candidates, find_time = do_find(barf, args)
+    if args.stream:
+        if args.verify and not barf.gadget_verifier:
+            print("Gadget verification not available. Check the log file for more information.")
 
-    print_gadgets_raw(candidates, output_fd, args.sort, args.color, "Raw Gadgets", args.show_binary)
+            args.verify = False
 
-    # Classify gadgets.
-    if args.classify:
-        classified, classify_time = do_classify(barf, candidates, args)
+        start = time.time()
 
-        if args.show_classification:
-            print_gadgets_typed(classified, output_fd, address_size, "Classified Gadgets")
+        counts, times = do_stream(barf, args, output_fd, address_size)
 
-    # Verify gadgets.
-    if args.verify:
-        if barf.gadget_verifier:
-            verified, verify_time, discarded, invalid = do_verify(barf, classified, args)
+        # Stages overlap, report elapsed time.
+        total_time = time.time() - start
+    else:
+        db, binary_id = None, None
 
-            print_gadgets_typed(verified, output_fd, address_size, "Verified Gadgets")
+        if args.db:
+            options = "bdepth={} idepth={} unique={}".format(args.bdepth, args.idepth, args.unique)
 
-            if args.show_invalid:
-                print_gadgets_typed(invalid, output_fd, address_size, "Invalid Gadgets (classified but didn't pass verification process)")
+            db = GadgetDatabase(args.db)
+            binary_id = db.add_binary(hash_file(filename), options)
 
-            # print non-verified
-            candidates_by_addr = sort_gadgets_by_address(candidates)
-            verified_by_addr = sort_gadgets_by_address(verified)
-            discarded_by_addr = sort_gadgets_by_address(discarded)
+        counts, times = do_phases(barf, args, output_fd, address_size, db, binary_id)
 
-            diff = []
+        if db:
+            db.close()
 
-            for addr in candidates_by_addr.keys():
-                if addr not in verified_by_addr and addr not in discarded_by_addr:
-                    diff += candidates_by_addr[addr]
+        total_time = times["find"] + times["classify"] + times["verify"]
 
-            print_gadgets_raw(diff, output_fd, args.sort, args.color, "Non-verified Gadgets", args.show_binary)
-        else:
-            print("Gadget verification not available. Check the log file for more information.")
+    find_time, classify_time, verify_time = times["find"], times["classify"], times["verify"]
 
     # Print processing time.
     if args.time:
-        total_time = find_time + classify_time + verify_time
-
         print("Time Report", file=output_fd)
         print("===========", file=output_fd)
         print("           ", file=output_fd)
@@ -504,6 +934,33 @@ def main():
         print("  Verification Stage : {0:8.3f}s".format(verify_time),   file=output_fd)
         print("               Total : {0:8.3f}s".format(total_time),    file=output_fd)
 
+        stats = barf.gadget_finder.decode_cache_stats
+
+        print("           ", file=output_fd)
+        print("   Decode Cache Hits : {0:8d} ({1:.1%})".format(stats["hits"], stats["hit_rate"]), file=output_fd)
+        print(" Decode Cache Misses : {0:8d}".format(stats["misses"]), file=output_fd)
+
+        if args.classify:
+            print("   Gadget Candidates : {0:8d}".format(counts["candidates"]), file=output_fd)
+            print("    Semantic Classes : {0:8d}".format(counts["classes"]), file=output_fd)
+
+            # Gadget types ruled out before emulation.
+            pruned = barf.gadget_classifier.prune_stats
+
+            print("           ", file=output_fd)
+            print("Pruned Gadget Types", file=output_fd)
+
+            for g_type in sorted(pruned):
+                print("{0:>20s} : {1:8d}".format(GadgetType.to_string(g_type), pruned[g_type]), file=output_fd)
+
+        if smt_cache:
+            stats = smt_cache.stats
+
+            print("           ", file=output_fd)
+            print("      SMT Cache Hits : {0:8d} ({1:d} from disk)".format(stats["hits"], stats["disk_hits"]),
+                  file=output_fd)
+            print("    SMT Cache Misses : {0:8d}".format(stats["misses"]), file=output_fd)
+
     if args.summary:
         summary_fd = open(args.summary, "a")
 
@@ -511,43 +968,35 @@ def main():
         fmt += "{ftime:.3f} {ctime:.3f} {vtime:.3f} "            # time
         fmt += "{no_operation} {jump} {move_register} {load_constant} {arithmetic} {load_memory} {store_memory} {arithmetic_load} {arithmetic_store} {undefined}"
 
-        by_type = sort_gadgets_by_type(verified)
-
-        if GadgetType.NoOperation not in by_type: by_type[GadgetType.NoOperation] = []
-        if GadgetType.Jump not in by_type: by_type[GadgetType.Jump] = []
-        if GadgetType.MoveRegister not in by_type: by_type[GadgetType.MoveRegister] = []
-        if GadgetType.LoadConstant not in by_type: by_type[GadgetType.LoadConstant] = []
-        if GadgetType.Arithmetic not in by_type: by_type[GadgetType.Arithmetic] = []
-        if GadgetType.LoadMemory not in by_type: by_type[GadgetType.LoadMemory] = []
-        if GadgetType.StoreMemory not in by_type: by_type[GadgetType.StoreMemory] = []
-        if GadgetType.ArithmeticLoad not in by_type: by_type[GadgetType.ArithmeticLoad] = []
-        if GadgetType.ArithmeticStore not in by_type: by_type[GadgetType.ArithmeticStore] = []
-        if GadgetType.Undefined not in by_type: by_type[GadgetType.Undefined] = []
+        by_type = counts["verified_by_type"]
 
         line = fmt.format(
-            gadgets=len(candidates),
-            classify=len(classified),
-            verify=len(verified),
+            gadgets=counts["candidates"],
+            classify=counts["classified"],
+            verify=counts["verified"],
             size=barf.binary.ea_end-barf.binary.ea_start,
             ftime=find_time,
             ctime=classify_time,
             vtime=verify_time,
-            no_operation=len(by_type[GadgetType.NoOperation]),
-            jump=len(by_type[GadgetType.Jump]),
-            move_register=len(by_type[GadgetType.MoveRegister]),
-            load_constant=len(by_type[GadgetType.LoadConstant]),
-            arithmetic=len(by_type[GadgetType.Arithmetic]),
-            load_memory=len(by_type[GadgetType.LoadMemory]),
-            store_memory=len(by_type[GadgetType.StoreMemory]),
-            arithmetic_load=len(by_type[GadgetType.ArithmeticLoad]),
-            arithmetic_store=len(by_type[GadgetType.ArithmeticStore]),
-            undefined=len(by_type[GadgetType.Undefined])
+            no_operation=by_type.get(GadgetType.NoOperation, 0),
+            jump=by_type.get(GadgetType.Jump, 0),
+            move_register=by_type.get(GadgetType.MoveRegister, 0),
+            load_constant=by_type.get(GadgetType.LoadConstant, 0),
+            arithmetic=by_type.get(GadgetType.Arithmetic, 0),
+            load_memory=by_type.get(GadgetType.LoadMemory, 0),
+            store_memory=by_type.get(GadgetType.StoreMemory, 0),
+            arithmetic_load=by_type.get(GadgetType.ArithmeticLoad, 0),
+            arithmetic_store=by_type.get(GadgetType.ArithmeticStore, 0),
+            undefined=by_type.get(GadgetType.Undefined, 0)
         )
 
         summary_fd.write(line + "\n")
 
         summary_fd.close()
 
+    if smt_cache:
+        smt_cache.close()
+
     # Close output file.
     if args.output:
         output_fd.close()
@@ -29,6 +29,7 @@ from barf.arch.x86.x86base import X86ArchitectureInformation
 from barf.arch.x86.x86disassembler import X86Disassembler
 from barf.arch.x86.x86translator import X86Translator
 from barf.core.reil import ReilContainer
+from barf.core.reil import ReilContainerInvalidAddressError
 from barf.core.reil import ReilMnemonic
 from barf.core.reil import ReilRegisterOperand
 from barf.core.reil import ReilSequence
@@ -114,7 +115,7 @@ class ReilContainerEx(object):
         self.__bb_builder = CFGRecoverer(RecursiveDescent(self.__disassembler, self.__binary.text_section,
                                                           self.__translator, self.__arch))
 
-        self.__container = {}
+        self.__container = ReilContainer()
         self.__symbols = symbols
 
         self.__symbols_by_addr = {}
@@ -162,46 +163,26 @@ class ReilContainerEx(object):
         return reil_container
 
     def add(self, sequence):
-        base_addr, _ = split_address(sequence.address)
-
-        if base_addr in self.__container.keys():
-            raise Exception("Invalid sequence")
-        else:
-            self.__container[base_addr] = sequence
+        self.__container.add(sequence)
 
     def fetch(self, address):
-        base_addr, index = split_address(address)
+        try:
+            return self.__container.fetch(address)
+        except ReilContainerInvalidAddressError:
+            base_addr, _ = split_address(address)
 
-        if base_addr not in self.__container.keys():
             self.__resolve_address(base_addr)
 
-        return self.__container[base_addr].get(index)
+        return self.__container.fetch(address)
 
     def get_next_address(self, address):
-        base_addr, index = split_address(address)
-
-        if base_addr not in self.__container.keys():
-            raise Exception("Invalid address.")
-
-        addr = address
-
-        if index < len(self.__container[base_addr]) - 1:
-            addr += 1
-        else:
-            addr = self.__container[base_addr].next_sequence_address
-
-        return addr
+        return self.__container.get_next_address(address)
 
     def dump(self):
-        for base_addr in sorted(self.__container.keys()):
-            self.__container[base_addr].dump()
-
-            print("-" * 80)
+        self.__container.dump()
 
     def __iter__(self):
-        for addr in sorted(self.__container.keys()):
-            for instr in self.__container[addr]:
-                yield instr
+        return iter(self.__container)
 
     def __resolve_address(self, address):
         if address not in self.__symbols_by_addr:
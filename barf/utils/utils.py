@@ -99,16 +99,45 @@ class ExecutionCache(object):
 
     def add(self, address, instruction, container):
         # NOTE Does not take into account self modifying code.
-        if address in self.__container.keys():
+        if address in self.__container:
             raise Exception("Invalid instruction")
 
         self.__container[address] = (instruction, container)
 
     def retrieve(self, address):
-        if address not in self.__container.keys():
+        if address not in self.__container:
             # print("cache miss!")
             raise InvalidAddressError()
 
         # print("cache hit!")
 
         return self.__container[address]
+
+
+class TranslationBlock(object):
+
+    """A straight-line sequence of native instructions together with
+    their REIL translation. Blocks are linked to the blocks executed
+    after them (by native address).
+    """
+
+    __slots__ = [
+        'address',
+        'instrs',
+        'hooked',
+        'successors',
+    ]
+
+    def __init__(self, address, instrs, hooked=False):
+        # Native address of the first instruction.
+        self.address = address
+
+        # A list of tuples of the form (native instruction, REIL
+        # instructions).
+        self.instrs = instrs
+
+        # Whether there is a hook at the block address.
+        self.hooked = hooked
+
+        # Successor blocks by native address.
+        self.successors = {}
@@ -0,0 +1,86 @@
+#! /usr/bin/env python
+
+# Copyright (c) 2014, Fundacion Dr. Manuel Sadosky
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+
+"""
+Compare batched REIL emulation (ReilBatchEmulator) against executing
+the same instruction list once per register context.
+
+"""
+
+import random
+import time
+
+from barf.arch import ARCH_X86_MODE_32
+from barf.arch.x86.x86base import X86ArchitectureInformation
+from barf.arch.x86.x86parser import X86Parser
+from barf.arch.x86.x86translator import X86Translator
+from barf.core.reil import ReilBatchEmulator
+from barf.core.reil import ReilEmulator
+
+
+def translate(asm_instrs):
+    parser = X86Parser(ARCH_X86_MODE_32)
+    translator = X86Translator(ARCH_X86_MODE_32)
+
+    instrs = []
+
+    for index, asm in enumerate(asm_instrs):
+        asm_instr = parser.parse(asm)
+        asm_instr.address = 0x1000 + index
+        asm_instr.size = 1
+
+        instrs += translator.translate(asm_instr)
+
+    return instrs
+
+
+def main():
+    arch_info = X86ArchitectureInformation(ARCH_X86_MODE_32)
+
+    instrs = translate(["add eax, ebx", "xor ecx, eax", "mov [esp], ecx", "pop edx", "ret"])
+
+    print("{:>8s} {:>12s} {:>12s}".format("contexts", "sequential", "batched"))
+
+    for count in [10, 100, 1000, 10000]:
+        contexts = [dict((reg, random.getrandbits(32)) for reg in arch_info.registers_gp_base)
+                    for _ in xrange(count)]
+
+        start = time.time()
+
+        for context in contexts:
+            ReilEmulator(arch_info).execute_lite(instrs, context=dict(context))
+
+        sequential = time.time() - start
+
+        start = time.time()
+
+        ReilBatchEmulator(arch_info).execute_lite(instrs, contexts)
+
+        batched = time.time() - start
+
+        print("{:>8d} {:>11.3f}s {:>11.3f}s".format(count, sequential, batched))
+
+
+if __name__ == "__main__":
+    main()
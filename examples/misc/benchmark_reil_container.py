@@ -0,0 +1,111 @@
+#! /usr/bin/env python
+
+# Copyright (c) 2014, Fundacion Dr. Manuel Sadosky
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Measure REIL emulation throughput for containers of increasing size.
+
+The same number of instructions is executed for every container size,
+so throughput should be roughly flat as the container grows.
+
+"""
+
+import time
+
+from barf.arch import ARCH_X86_MODE_32
+from barf.arch.x86.x86base import X86ArchitectureInformation
+from barf.core.reil import ReilContainer
+from barf.core.reil import ReilEmulator
+from barf.core.reil import ReilImmediateOperand
+from barf.core.reil import ReilInstructionBuilder
+from barf.core.reil import ReilRegisterOperand
+from barf.core.reil import ReilSequence
+
+
+def build_container(size, sequence_size=4):
+    """Build a container of *size* REIL instructions in which each
+    sequence increments eax *sequence_size* times.
+    """
+    builder = ReilInstructionBuilder()
+
+    eax = ReilRegisterOperand("eax", 32)
+    one = ReilImmediateOperand(0x1, 32)
+
+    container = ReilContainer()
+
+    sequence_prev = None
+
+    for base_addr in xrange(0x1000, 0x1000 + size / sequence_size):
+        sequence = ReilSequence()
+
+        for index in xrange(sequence_size):
+            instr = builder.gen_add(eax, one, eax)
+            instr.address = (base_addr << 8) | index
+
+            sequence.append(instr)
+
+        if sequence_prev:
+            sequence_prev.next_sequence_address = sequence.address
+
+        container.add(sequence)
+
+        sequence_prev = sequence
+
+    return container
+
+
+def main():
+    arch_info = X86ArchitectureInformation(ARCH_X86_MODE_32)
+    emulator = ReilEmulator(arch_info)
+
+    sequence_size = 4
+    instrs_count = 100000
+
+    print("{:>10s} {:>10s} {:>16s}".format("size", "executed", "instrs/s"))
+
+    for size in [10**3, 10**4, 10**5, 10**6]:
+        container = build_container(size, sequence_size=sequence_size)
+
+        # Execute (at most) the last *instrs_count* instructions, as many
+        # times as needed.
+        start_seq = 0x1000 + (size - min(size, instrs_count)) / sequence_size
+        end_seq = 0x1000 + size / sequence_size
+
+        executed = 0
+
+        start = time.time()
+
+        while executed < instrs_count:
+            emulator.execute(container, start=start_seq << 8, end=end_seq << 8, registers={"eax": 0x0})
+
+            executed += (end_seq - start_seq) * sequence_size
+
+        total = time.time() - start
+
+        print("{:>10d} {:>10d} {:>16.0f}".format(size, executed, executed / total))
+
+
+if __name__ == "__main__":
+    main()
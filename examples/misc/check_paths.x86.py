@@ -4,85 +4,22 @@ import logging
 
 from barf import BARF
 
-from barf.core.reil import ReilMnemonic
+from barf.analysis.codeanalyzer import PathExplorer
 
 logger = logging.getLogger(__name__)
 
 
-def check_path_satisfiability(code_analyzer, path, start_address):
-        """Check satisfiability of a basic block path.
-        """
-        start_instr_found = False
-        sat = False
+def get_values(code_analyzer):
+    """Return the expressions to get from the model of each path.
+    """
+    ebp = code_analyzer.get_register_expr("ebp", mode="post")
 
-        # Traverse basic blocks, translate its instructions to SMT
-        # expressions and add them as assertions.
-        for bb_curr, bb_next in zip(path[:-1], path[1:]):
-            logger.info("BB @ {:#x}".format(bb_curr.address))
-
-            # For each dual instruction...
-            for dinstr in bb_curr:
-                # If the start instruction have not been found, keep
-                # looking...
-                if not start_instr_found:
-                    if dinstr.address == start_address:
-                        start_instr_found = True
-                    else:
-                        continue
-
-                logger.info("{:#x} {}".format(dinstr.address, dinstr.asm_instr))
-
-                # For each REIL instruction...
-                for reil_instr in dinstr.ir_instrs:
-                    logger.info("{:#x} {:02d} {}".format(reil_instr.address >> 0x8, reil_instr.address & 0xff,
-                                                         reil_instr))
-
-                    if reil_instr.mnemonic == ReilMnemonic.JCC:
-                        # Check that the JCC is the last instruction of
-                        # the basic block (skip CALL instructions.)
-                        if dinstr.address + dinstr.asm_instr.size - 1 != bb_curr.end_address:
-                            logger.error("Unexpected JCC instruction: {:#x} {} ({})".format(dinstr.address,
-                                                                                            dinstr.asm_instr,
-                                                                                            reil_instr))
-
-                            # raise Exception()
-
-                            continue
-
-                        # Make sure branch target address from current
-                        # basic block is the start address of the next.
-                        assert(bb_curr.taken_branch == bb_next.address or
-                               bb_curr.not_taken_branch == bb_next.address or
-                               bb_curr.direct_branch == bb_next.address)
-
-                        # Set branch condition accordingly.
-                        if bb_curr.taken_branch == bb_next.address:
-                            branch_var_goal = 0x1
-                        elif bb_curr.not_taken_branch == bb_next.address:
-                            branch_var_goal = 0x0
-                        else:
-                            continue
-
-                        # Add branch condition goal constraint.
-                        code_analyzer.add_constraint(code_analyzer.get_operand_expr(reil_instr.operands[0]) == branch_var_goal)
-
-                        # The JCC instruction was the last within the
-                        # current basic block. End this iteration and
-                        # start next one.
-                        break
-
-                    # Translate and add SMT expressions to the solver.
-                    code_analyzer.add_instruction(reil_instr)
-
-            sat = code_analyzer.check() == 'sat'
-
-            logger.info("BB @ {:#x} sat? {}".format(bb_curr.address, sat))
-
-            if not sat:
-                break
-
-        # Return satisfiability.
-        return sat
+    return {
+        "rv": code_analyzer.get_memory_expr(ebp-0x10, 4, mode="post"),
+        "cookie1": code_analyzer.get_memory_expr(ebp-0xc, 4, mode="post"),
+        "cookie2": code_analyzer.get_memory_expr(ebp-0x8, 4, mode="post"),
+        "cookie3": code_analyzer.get_memory_expr(ebp-0x4, 4, mode="post"),
+    }
 
 
 if __name__ == "__main__":
@@ -126,27 +63,16 @@ if __name__ == "__main__":
 
     barf.code_analyzer.add_constraint(esp == 0xffffceec)
 
-    # Traverse paths and check satisfiability
-    for bb_path in cfg.all_simple_bb_paths(start_addr, end_addr):
+    # Traverse satisfiable paths. Paths are walked depth-first, so the
+    # instructions of a shared prefix are added (and checked) only once
+    # and unsatisfiable prefixes are pruned.
+    explorer = PathExplorer(barf.code_analyzer, cfg)
+
+    for bb_path, values in explorer.explore(start_addr, end_addr, get_values):
         print("[+] Path: {0}".format(" -> ".join([hex(bb.address) for bb in bb_path])))
+        print("[+] Satisfiable! Possible assignments:")
 
-        if check_path_satisfiability(barf.code_analyzer, bb_path, start_addr):
-            print("[+] Satisfiable! Possible assignments:")
-
-            ebp = barf.code_analyzer.get_register_expr("ebp", mode="post")
-            rv = barf.code_analyzer.get_memory_expr(ebp-0x10, 4, mode="post")
-            cookie1 = barf.code_analyzer.get_memory_expr(ebp-0xc, 4, mode="post")
-            cookie2 = barf.code_analyzer.get_memory_expr(ebp-0x8, 4, mode="post")
-            cookie3 = barf.code_analyzer.get_memory_expr(ebp-0x4, 4, mode="post")
-
-            rv_val = barf.code_analyzer.get_expr_value(rv)
-            cookie1_val = barf.code_analyzer.get_expr_value(cookie1)
-            cookie2_val = barf.code_analyzer.get_expr_value(cookie2)
-            cookie3_val = barf.code_analyzer.get_expr_value(cookie3)
-
-            print("- cookie1: 0x{0:08x} ({0})".format(cookie1_val))
-            print("- cookie2: 0x{0:08x} ({0})".format(cookie2_val))
-            print("- cookie3: 0x{0:08x} ({0})".format(cookie3_val))
-            print("- rv:      0x{0:08x} ({0})".format(rv_val))
-        else:
-            print("[-] Unsatisfiable!")
+        print("- cookie1: 0x{0:08x} ({0})".format(values["cookie1"]))
+        print("- cookie2: 0x{0:08x} ({0})".format(values["cookie2"]))
+        print("- cookie3: 0x{0:08x} ({0})".format(values["cookie3"]))
+        print("- rv:      0x{0:08x} ({0})".format(values["rv"]))
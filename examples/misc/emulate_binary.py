@@ -72,20 +72,11 @@ def split_command_line(argv):
 
 
 def read_c_string(reil_emulator, address, max_length=1024):
-    i = 0
-    data = bytearray()
-    while i < max_length:
-        b = reil_emulator.read_memory(address + i, 1)
-        if b == 0:
-            break
-        data.append(b)
-        i += 1
-    return data.decode()
+    return reil_emulator.read_memory_string(address, max_length).decode()
 
 
 def write_c_string(reil_emulator, address, string):
-    for i, b in enumerate(string):
-        reil_emulator.write_memory(address + i, 1, b)
+    reil_emulator.write_memory_region(address, bytearray(string))
 
 
 def atoi_hook(emulator, state):
@@ -176,9 +167,8 @@ def load_args(addr_size, args, argv_args_addr, argv_base_addr, reil_emulator):
     for index, arg in enumerate(args):
         argv_entry_addr[index] = base_addr
 
-        for b in bytearray(arg + "\x00"):
-            reil_emulator.write_memory(base_addr, 1, b)
-            base_addr += 1
+        reil_emulator.write_memory_region(base_addr, arg + "\x00")
+        base_addr += len(arg) + 1
 
     # Build args array.
     for index in xrange(len(args)):
@@ -63,13 +63,11 @@ if __name__ == "__main__":
         # Set argv.
         argv_0_addr = 0x00001900
         argv_0_data = bytearray(filename + "\x00")
-        for i, b in enumerate(argv_0_data):
-            reil_emulator.write_memory(argv_0_addr + i, 1, b)
+        reil_emulator.write_memory_region(argv_0_addr, argv_0_data)
 
         argv_1_addr = argv_0_addr + len(argv_0_data)
         argv_1_data = bytearray(arg + "\x00")
-        for i, b in enumerate(argv_1_data):
-            reil_emulator.write_memory(argv_1_addr + i, 1, b)
+        reil_emulator.write_memory_region(argv_1_addr, argv_1_data)
 
         argv_base_addr = 0x00001800
         reil_emulator.write_memory(argv_base_addr + 0x00, 4, argv_0_addr)
@@ -134,6 +134,43 @@ class CodeAnalyzerTests(unittest.TestCase):
         self.assertNotEqual(self._code_analyzer.get_expr_value(mem_pre[eax_pre + 0x1000]), 42)
         self.assertEqual(self._code_analyzer.get_expr_value(mem_post[eax_pre + 0x1000]), 42)
 
+    def test_push_pop(self):
+        # Parser x86 instructions.
+        asm_instrs = [self._x86_parser.parse(i) for i in [
+            "add eax, ebx",
+        ]]
+
+        # Add REIL instruction to the analyzer.
+        for reil_instr in self.__asm_to_reil(asm_instrs):
+            self._code_analyzer.add_instruction(reil_instr)
+
+        eax_pre = self._code_analyzer.get_register_expr("eax", mode="pre")
+        ebx_pre = self._code_analyzer.get_register_expr("ebx", mode="pre")
+
+        self._code_analyzer.add_constraint(ebx_pre == 1)
+
+        # Instructions and constraints inside a scope.
+        self._code_analyzer.push()
+
+        for reil_instr in self.__asm_to_reil([self._x86_parser.parse("mov eax, 7")]):
+            self._code_analyzer.add_instruction(reil_instr)
+
+        eax_post = self._code_analyzer.get_register_expr("eax", mode="post")
+
+        self._code_analyzer.add_constraint(eax_post != 7)
+
+        self.assertEqual(self._code_analyzer.check(), 'unsat')
+
+        self._code_analyzer.pop()
+
+        # Back to the state after the first instruction.
+        eax_post = self._code_analyzer.get_register_expr("eax", mode="post")
+
+        self._code_analyzer.add_constraint(eax_pre == 41)
+
+        self.assertEqual(self._code_analyzer.check(), 'sat')
+        self.assertEqual(self._code_analyzer.get_expr_value(eax_post), 42)
+
     def __asm_to_reil(self, instructions):
         # Set address for each instruction.
         for addr, asm_instr in enumerate(instructions):
@@ -0,0 +1,144 @@
+# Copyright (c) 2014, Fundacion Dr. Manuel Sadosky
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+import unittest
+
+from barf.analysis.basicblock import BasicBlock
+from barf.analysis.basicblock import ControlFlowGraph
+from barf.analysis.codeanalyzer import CodeAnalyzer
+from barf.analysis.codeanalyzer import PathExplorer
+from barf.arch import ARCH_X86_MODE_32
+from barf.arch.x86.x86base import X86ArchitectureInformation
+from barf.arch.x86.x86parser import X86Parser
+from barf.arch.x86.x86translator import X86Translator
+from barf.core.reil import DualInstruction
+from barf.core.smt.smtsolver import Z3Solver as SmtSolver
+from barf.core.smt.smttranslator import SmtTranslator
+
+
+class PathExplorerTests(unittest.TestCase):
+
+    def setUp(self):
+        self._arch_info = X86ArchitectureInformation(ARCH_X86_MODE_32)
+
+        self._smt_solver = SmtSolver()
+
+        self._smt_translator = SmtTranslator(self._smt_solver, self._arch_info.address_size)
+        self._smt_translator.set_arch_alias_mapper(self._arch_info.alias_mapper)
+        self._smt_translator.set_arch_registers_size(self._arch_info.registers_size)
+
+        self._x86_parser = X86Parser(architecture_mode=ARCH_X86_MODE_32)
+
+        self._x86_translator = X86Translator(architecture_mode=ARCH_X86_MODE_32)
+
+        self._code_analyzer = CodeAnalyzer(self._smt_solver, self._smt_translator, self._arch_info)
+
+    def test_explore(self):
+        # 0x1000:   cmp eax, 0x41
+        # 0x1003:   jne 0x100f
+        # 0x1005:   cmp eax, 0x42
+        # 0x1008:   jne 0x100f
+        # 0x100a:   mov ebx, 0x1
+        # 0x100f:   ret
+        bb1 = self.__build_basic_block([(0x1000, 3, "cmp eax, 0x41"), (0x1003, 2, "jne 0x100f")])
+        bb1.taken_branch = 0x100f
+        bb1.not_taken_branch = 0x1005
+
+        bb2 = self.__build_basic_block([(0x1005, 3, "cmp eax, 0x42"), (0x1008, 2, "jne 0x100f")])
+        bb2.taken_branch = 0x100f
+        bb2.not_taken_branch = 0x100a
+
+        bb3 = self.__build_basic_block([(0x100a, 5, "mov ebx, 0x1")])
+        bb3.direct_branch = 0x100f
+
+        bb4 = self.__build_basic_block([(0x100f, 1, "ret")])
+
+        cfg = ControlFlowGraph([bb1, bb2, bb3, bb4])
+
+        explorer = PathExplorer(self._code_analyzer, cfg)
+
+        values = lambda analyzer: {"eax": analyzer.get_register_expr("eax", mode="pre")}
+
+        paths = [(tuple([bb.address for bb in path]), model) for path, model in explorer.explore(0x1000, 0x100f, values)]
+
+        # The path through bb3 (eax == 0x41 and eax == 0x42) is pruned.
+        self.assertEqual(len(list(cfg.all_simple_bb_paths(0x1000, 0x100f))), 3)
+        self.assertEqual(len(paths), 2)
+
+        paths = dict(paths)
+
+        self.assertNotEqual(paths[(0x1000, 0x100f)]["eax"], 0x41)
+        self.assertEqual(paths[(0x1000, 0x1005, 0x100f)]["eax"], 0x41)
+
+        # All scopes are closed.
+        self.assertEqual(self._code_analyzer.check(), "sat")
+
+        self._code_analyzer.add_constraint(self._code_analyzer.get_register_expr("eax", mode="pre") == 0x41)
+
+        self.assertEqual([[bb.address for bb in path] for path, _ in explorer.explore(0x1000, 0x100f)],
+                         [[0x1000, 0x1005, 0x100f]])
+
+    def test_explore_same_target(self):
+        # 0x1000:   cmp eax, 0x41
+        # 0x1003:   jne 0x1005
+        # 0x1005:   mov ebx, 0x1
+        # 0x100a:   ret
+        bb1 = self.__build_basic_block([(0x1000, 3, "cmp eax, 0x41"), (0x1003, 2, "jne 0x1005")])
+        bb1.taken_branch = 0x1005
+        bb1.not_taken_branch = 0x1005
+
+        bb2 = self.__build_basic_block([(0x1005, 5, "mov ebx, 0x1")])
+        bb2.direct_branch = 0x100a
+
+        bb3 = self.__build_basic_block([(0x100a, 1, "ret")])
+
+        cfg = ControlFlowGraph([bb1, bb2, bb3])
+
+        explorer = PathExplorer(self._code_analyzer, cfg)
+
+        # Both branches lead to bb2, so the path does not depend on the
+        # branch condition (which is false here).
+        self._code_analyzer.add_constraint(self._code_analyzer.get_register_expr("eax", mode="pre") == 0x41)
+
+        self.assertEqual([[bb.address for bb in path] for path, _ in explorer.explore(0x1000, 0x100a)],
+                         [[0x1000, 0x1005, 0x100a]])
+
+    def __build_basic_block(self, instrs):
+        bb = BasicBlock()
+
+        for address, size, instr in instrs:
+            asm_instr = self._x86_parser.parse(instr)
+            asm_instr.address = address
+            asm_instr.size = size
+
+            bb.instrs.append(DualInstruction(address, asm_instr, self._x86_translator.translate(asm_instr)))
+
+        return bb
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -29,12 +29,15 @@ from barf.analysis.gadget.gadget import GadgetType
 from barf.analysis.gadget.gadgetclassifier import GadgetClassifier
 from barf.analysis.gadget.gadgetfinder import GadgetFinder
 from barf.analysis.gadget.gadgetverifier import GadgetVerifier
+from barf.arch import ARCH_ARM
+from barf.arch import ARCH_ARM_MODE_ARM
 from barf.arch import ARCH_X86
 from barf.arch import ARCH_X86_MODE_32
 from barf.arch import ARCH_X86_MODE_64
 from barf.arch.x86.x86base import X86ArchitectureInformation
 from barf.arch.x86.x86disassembler import X86Disassembler
 from barf.arch.x86.x86translator import X86Translator
+from barf.core.bi import Memory
 from barf.core.reil import ReilEmptyOperand
 from barf.core.reil import ReilEmulator
 from barf.core.reil import ReilImmediateOperand
@@ -949,6 +952,64 @@ class GadgetClassifierTests(unittest.TestCase):
         self.assertEquals(len(g_candidates), 3)
         self.assertEquals(len(g_classified), 0)
 
+    def test_single_emulation(self):
+        binary  = "\x89\xd8"                 # 0x00 : (2) mov eax, ebx
+        binary += "\xc3"                     # 0x02 : (1) ret
+
+        g_finder = GadgetFinder(X86Disassembler(), binary, X86Translator(), ARCH_X86, ARCH_X86_MODE_32)
+
+        g_candidates = g_finder.find(0x00000000, 0x00000002)
+
+        # Count emulator runs.
+        execute_lite = self._ir_emulator.execute_lite
+        executions = []
+
+        def execute_lite_counter(instructions, context=None):
+            executions.append(instructions)
+
+            return execute_lite(instructions, context)
+
+        self._ir_emulator.execute_lite = execute_lite_counter
+
+        g_classified = self._g_classifier.classify(g_candidates[0])
+
+        self.assertEquals(len(g_classified), 1)
+        self.assertEquals(g_classified[0].type, GadgetType.MoveRegister)
+
+        # The gadget is emulated once per iteration, regardless of the
+        # number of gadget types.
+        self.assertEquals(len(executions), self._g_classifier._emu_iters)
+
+    def test_prune_types(self):
+        binary  = "\x89\xd8"                 # 0x00 : (2) mov eax, ebx
+        binary += "\xc3"                     # 0x02 : (1) ret
+        binary += "\x89\x18"                 # 0x03 : (2) mov [eax], ebx
+        binary += "\xc3"                     # 0x05 : (1) ret
+
+        g_finder = GadgetFinder(X86Disassembler(), binary, X86Translator(), ARCH_X86, ARCH_X86_MODE_32)
+
+        g_candidates = g_finder.find(0x00000000, 0x00000005)
+
+        # There is no memory store in the first gadget.
+        self._g_classifier.classify(g_candidates[0])
+
+        pruned = self._g_classifier.prune_stats
+
+        self.assertEquals(pruned[GadgetType.StoreMemory], 1)
+        self.assertEquals(pruned[GadgetType.ArithmeticStore], 1)
+        self.assertEquals(pruned[GadgetType.LoadMemory], 0)
+        self.assertEquals(pruned[GadgetType.MoveRegister], 0)
+
+        # The second one stores to memory (and it is not arithmetic).
+        g_classified = self._g_classifier.classify(g_candidates[1])
+
+        pruned = self._g_classifier.prune_stats
+
+        self.assertEquals(pruned[GadgetType.StoreMemory], 1)
+        self.assertEquals(pruned[GadgetType.NoOperation], 1)
+
+        self.assertTrue(GadgetType.StoreMemory in [g.type for g in g_classified])
+
     def print_candidates(self, candidates):
         print "Candidates :"
 
@@ -965,6 +1026,121 @@ class GadgetClassifierTests(unittest.TestCase):
             print "-" * 10
 
 
+class GadgetFinderTests(unittest.TestCase):
+
+    def test_find_tails(self):
+        binary  = "\x89\xd8"                 # 0x00 : (2) mov eax, ebx
+        binary += "\xc3"                     # 0x02 : (1) ret
+        binary += "\x01\xd8"                 # 0x03 : (2) add eax, ebx
+        binary += "\xff\xe0"                 # 0x05 : (2) jmp eax
+
+        memory = Memory()
+        memory.add_vma(0x1000, bytearray(binary))
+
+        g_finder = GadgetFinder(X86Disassembler(), memory, X86Translator(), ARCH_X86, ARCH_X86_MODE_32)
+
+        self.assertEquals(g_finder.find_tails(0x1000, 0x1006), [0x1002, 0x1005])
+
+        g_candidates = g_finder.find(0x1000, 0x1006)
+
+        self.assertEquals([g.address for g in g_candidates], [0x1000, 0x1003])
+
+    def test_decode_cache(self):
+        binary  = "\x89\xd8"                 # 0x00 : (2) mov eax, ebx
+        binary += "\xc3"                     # 0x02 : (1) ret
+        binary += "\x5b"                     # 0x03 : (1) pop ebx
+        binary += "\xc3"                     # 0x04 : (1) ret
+
+        g_finder = GadgetFinder(X86Disassembler(), binary, X86Translator(), ARCH_X86, ARCH_X86_MODE_32)
+
+        g_candidates = g_finder.find(0x00, 0x04)
+
+        self.assertEquals([g.address for g in g_candidates], [0x00, 0x03])
+
+        # Each address is decoded once, the second tail reuses the
+        # instructions decoded for the first one.
+        stats = g_finder.decode_cache_stats
+
+        self.assertEquals(stats["misses"], 4)
+        self.assertEquals(stats["hits"], 5)
+
+    def test_find_parallel(self):
+        binary  = "\x89\xd8"                 # 0x00 : (2) mov eax, ebx
+        binary += "\xc3"                     # 0x02 : (1) ret
+        binary += "\x5b"                     # 0x03 : (1) pop ebx
+        binary += "\xc3"                     # 0x04 : (1) ret
+        binary += "\x01\xd8"                 # 0x05 : (2) add eax, ebx
+        binary += "\xff\xe0"                 # 0x07 : (2) jmp eax
+        binary += "\x31\xc0"                 # 0x09 : (2) xor eax, eax
+        binary += "\xc3"                     # 0x0b : (1) ret
+
+        g_finder = GadgetFinder(X86Disassembler(), binary, X86Translator(), ARCH_X86, ARCH_X86_MODE_32)
+
+        g_candidates = g_finder.find(0x00, 0x0b, instrs_depth=3)
+        g_candidates_parallel = g_finder.find(0x00, 0x0b, instrs_depth=3, jobs=2)
+
+        self.assertEquals([str(g) for g in g_candidates_parallel], [str(g) for g in g_candidates])
+
+    def test_find_iter(self):
+        binary  = "\x89\xd8"                 # 0x00 : (2) mov eax, ebx
+        binary += "\xc3"                     # 0x02 : (1) ret
+        binary += "\x5b"                     # 0x03 : (1) pop ebx
+        binary += "\xc3"                     # 0x04 : (1) ret
+
+        g_finder = GadgetFinder(X86Disassembler(), binary, X86Translator(), ARCH_X86, ARCH_X86_MODE_32)
+
+        g_candidates = g_finder.find(0x00, 0x04)
+        g_candidates_iter = g_finder.find_iter(0x00, 0x04)
+
+        # Gadgets are generated lazily.
+        self.assertEquals(next(g_candidates_iter).address, 0x00)
+        self.assertEquals([g.address for g in g_candidates_iter], [0x03])
+
+        self.assertEquals([g.address for g in g_candidates], [0x00, 0x03])
+
+    def test_canonical_form(self):
+        binary  = "\x01\xd8"                 # 0x00 : (2) add eax, ebx
+        binary += "\xc3"                     # 0x02 : (1) ret
+        binary += "\x01\xd8"                 # 0x03 : (2) add eax, ebx
+        binary += "\xc3"                     # 0x05 : (1) ret
+        binary += "\x01\xc8"                 # 0x06 : (2) add eax, ecx
+        binary += "\xc3"                     # 0x08 : (1) ret
+
+        g_finder = GadgetFinder(X86Disassembler(), binary, X86Translator(), ARCH_X86, ARCH_X86_MODE_32)
+
+        g_candidates = g_finder.find(0x00, 0x08)
+
+        self.assertEquals([g.address for g in g_candidates], [0x00, 0x03, 0x06])
+
+        # Same instructions at different addresses (and translated with
+        # different temporaries) share the canonical form.
+        self.assertEquals(g_candidates[0].canonical_form, g_candidates[1].canonical_form)
+        self.assertEquals(g_candidates[0].canonical_hash, g_candidates[1].canonical_hash)
+
+        self.assertNotEquals(g_candidates[0].canonical_hash, g_candidates[2].canonical_hash)
+
+        # Classification results can be copied to equivalent gadgets.
+        arch_info = X86ArchitectureInformation(ARCH_X86_MODE_32)
+
+        g_classifier = GadgetClassifier(ReilEmulator(arch_info), arch_info)
+
+        g_classified = g_classifier.classify(g_candidates[0])
+        g_cloned = [g.clone(g_candidates[1]) for g in g_classified]
+
+        self.assertEquals([g.address for g in g_cloned], [0x03] * len(g_classified))
+        self.assertEquals([str(g) for g in g_cloned], [str(g) for g in g_classified])
+
+    def test_find_tails_arm(self):
+        binary  = "\x1e\xff\x2f\xe1"         # 0x00 : (4) bx lr
+        binary += "\x31\xff\x2f\xe1"         # 0x04 : (4) blx r1
+        binary += "\x10\x80\xbd\xe8"         # 0x08 : (4) pop {r4, pc}
+        binary += "\x1e\xff\x2f"             # 0x0c : (3) truncated bx lr
+
+        g_finder = GadgetFinder(None, binary, None, ARCH_ARM, ARCH_ARM_MODE_ARM)
+
+        self.assertEquals(g_finder.find_tails(0x00, len(binary) - 1), [0x00, 0x04, 0x08])
+
+
 class GadgetVerifierTests(unittest.TestCase):
 
     def setUp(self):
@@ -1483,6 +1659,35 @@ class GadgetVerifierTests(unittest.TestCase):
         self.assertTrue(ReilRegisterOperand("edx", 32) in g_classified[0].modified_registers)
         self.assertTrue(ReilRegisterOperand("esp", 32) in g_classified[0].modified_registers)
 
+    def test_verify_many(self):
+        binary  = "\x89\xd8"                 # 0x00 : (2) mov eax, ebx
+        binary += "\xc3"                     # 0x02 : (1) ret
+        binary += "\x01\xd8"                 # 0x03 : (2) add eax, ebx
+        binary += "\xc3"                     # 0x05 : (1) ret
+
+        g_finder = GadgetFinder(X86Disassembler(), binary, X86Translator(), ARCH_X86, ARCH_X86_MODE_32)
+
+        g_candidates = g_finder.find(0x00000000, 0x00000005)
+
+        g_classified = []
+
+        for gadget in g_candidates:
+            g_classified += self._g_classifier.classify(gadget)
+
+        # Add a wrongly classified gadget.
+        g_invalid = g_classified[0].clone(g_candidates[1])
+
+        g_classified += [g_invalid]
+
+        verified = [self._g_verifier.verify(gadget) for gadget in g_classified]
+
+        self.assertEquals(self._g_verifier.verify_many(g_classified, workers=3), verified)
+
+        self.assertEquals([gadget.is_valid for gadget in g_classified], verified)
+
+        self.assertTrue(all(verified[:-1]))
+        self.assertFalse(g_invalid.is_valid)
+
     def print_candidates(self, candidates):
         print "Candidates :"
 
@@ -0,0 +1,137 @@
+# Copyright (c) 2014, Fundacion Dr. Manuel Sadosky
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import unittest
+
+from barf.analysis.codeanalyzer import CodeAnalyzer
+from barf.analysis.gadget.gadget import GadgetType
+from barf.analysis.gadget.gadgetclassifier import GadgetClassifier
+from barf.analysis.gadget.gadgetdb import GadgetDatabase
+from barf.analysis.gadget.gadgetfinder import GadgetFinder
+from barf.analysis.gadget.gadgetverifier import GadgetVerifier
+from barf.arch import ARCH_X86
+from barf.arch import ARCH_X86_MODE_32
+from barf.arch.x86.x86base import X86ArchitectureInformation
+from barf.arch.x86.x86disassembler import X86Disassembler
+from barf.arch.x86.x86translator import X86Translator
+from barf.core.reil import ReilEmulator
+from barf.core.reil import ReilRegisterOperand
+from barf.core.smt.smtsolver import Z3Solver as SmtSolver
+from barf.core.smt.smttranslator import SmtTranslator
+
+
+class GadgetDatabaseTests(unittest.TestCase):
+
+    def setUp(self):
+        self._arch_info = X86ArchitectureInformation(ARCH_X86_MODE_32)
+
+        self._smt_solver = SmtSolver()
+        self._smt_translator = SmtTranslator(self._smt_solver, self._arch_info.address_size)
+        self._smt_translator.set_arch_alias_mapper(self._arch_info.alias_mapper)
+        self._smt_translator.set_arch_registers_size(self._arch_info.registers_size)
+
+        self._code_analyzer = CodeAnalyzer(self._smt_solver, self._smt_translator, self._arch_info)
+
+        self._g_classifier = GadgetClassifier(ReilEmulator(self._arch_info), self._arch_info)
+        self._g_verifier = GadgetVerifier(self._code_analyzer, self._arch_info)
+
+        self._db = GadgetDatabase(":memory:")
+
+    def tearDown(self):
+        self._db.close()
+
+    def test_store_and_load(self):
+        binary_id = self._db.add_binary("0123", "idepth=2")
+
+        self.assertEquals(self._db.add_binary("0123", "idepth=2"), binary_id)
+        self.assertNotEquals(self._db.add_binary("0123", "idepth=3"), binary_id)
+
+        self.assertFalse(self._db.is_stored(binary_id, "found"))
+        self.assertEquals(self._db.get_gadgets(binary_id), None)
+
+        g_candidates, g_classified = self._find_and_classify()
+
+        self._db.add_gadgets(binary_id, g_candidates)
+        self._db.add_typed_gadgets(binary_id, g_classified)
+
+        self.assertTrue(self._db.is_stored(binary_id, "classified"))
+        self.assertFalse(self._db.is_stored(binary_id, "verified"))
+
+        self._g_verifier.verify_many(g_classified)
+        self._db.set_verified(binary_id, g_classified)
+
+        # Load gadgets back.
+        g_candidates_db = self._db.get_gadgets(binary_id)
+        g_classified_db = self._db.get_typed_gadgets(binary_id, g_candidates_db)
+
+        self.assertEquals([str(g) for g in g_candidates_db], [str(g) for g in g_candidates])
+        self.assertEquals([str(g) for g in g_classified_db], [str(g) for g in g_classified])
+        self.assertEquals([g.address for g in g_classified_db], [g.address for g in g_classified])
+        self.assertEquals([g.is_valid for g in g_classified_db], [g.is_valid for g in g_classified])
+
+    def test_find(self):
+        binary_id = self._db.add_binary("0123")
+
+        g_candidates, g_classified = self._find_and_classify()
+
+        self._db.add_gadgets(binary_id, g_candidates)
+        self._db.add_typed_gadgets(binary_id, g_classified)
+
+        g_found = self._db.find(type=GadgetType.MoveRegister, dst="eax")
+
+        self.assertEquals(len(g_found), 1)
+        self.assertEquals(g_found[0].address, 0x00)
+        self.assertEquals(g_found[0].sources, [ReilRegisterOperand("ebx", 32)])
+
+        g_found = self._db.find(type=GadgetType.Arithmetic, operation="+", binary_hash="0123")
+
+        self.assertEquals([g.address for g in g_found], [0x03])
+        self.assertEquals(g_found[0].operation, "+")
+
+        self.assertEquals(self._db.find(type=GadgetType.MoveRegister, binary_hash="4567"), [])
+
+    def _find_and_classify(self):
+        binary  = "\x89\xd8"                 # 0x00 : (2) mov eax, ebx
+        binary += "\xc3"                     # 0x02 : (1) ret
+        binary += "\x01\xd8"                 # 0x03 : (2) add eax, ebx
+        binary += "\xc3"                     # 0x05 : (1) ret
+
+        g_finder = GadgetFinder(X86Disassembler(), binary, X86Translator(), ARCH_X86, ARCH_X86_MODE_32)
+
+        g_candidates = g_finder.find(0x00000000, 0x00000005)
+        g_classified = []
+
+        for gadget in g_candidates:
+            g_classified += self._g_classifier.classify(gadget)
+
+        return g_candidates, g_classified
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -327,7 +327,7 @@ class ArmTranslationTests(unittest.TestCase):
             addr = base_addr + idx
 
             # TODO: Don't access variable directly.
-            if addr in reil_mem_out._memory:
+            if addr in reil_mem_out:
                 self.assertTrue(b == reil_mem_out.read(addr, 1))
             else:
                 # Memory in pyasmjit is initialized to 0.
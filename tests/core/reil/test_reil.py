@@ -0,0 +1,86 @@
+# Copyright (c) 2014, Fundacion Dr. Manuel Sadosky
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+from barf.core.reil import ReilContainer
+from barf.core.reil import ReilContainerInvalidAddressError
+from barf.core.reil import ReilParser
+from barf.core.reil import ReilSequence
+
+
+class ReilContainerTests(unittest.TestCase):
+
+    def setUp(self):
+        self._parser = ReilParser()
+
+    def test_fetch(self):
+        container = ReilContainer()
+
+        seq0 = self.__build_sequence(0x1000, ["add [DWORD eax, DWORD ebx, DWORD t0]", "str [DWORD t0, EMPTY, DWORD eax]"])
+
+        container.add(seq0)
+
+        self.assertEqual(str(seq0.get(0)), str(container.fetch(0x1000 << 8 | 0x00)))
+        self.assertEqual(str(seq0.get(1)), str(container.fetch(0x1000 << 8 | 0x01)))
+
+        self.assertRaises(ReilContainerInvalidAddressError, container.fetch, 0x1000 << 8 | 0x02)
+        self.assertRaises(ReilContainerInvalidAddressError, container.fetch, 0x1001 << 8 | 0x00)
+
+    def test_get_next_address(self):
+        container = ReilContainer()
+
+        seq0 = self.__build_sequence(0x1000, ["add [DWORD eax, DWORD ebx, DWORD t0]", "str [DWORD t0, EMPTY, DWORD eax]"])
+        seq1 = self.__build_sequence(0x1002, ["str [DWORD ebx, EMPTY, DWORD eax]"])
+
+        container.add(seq0)
+        container.add(seq1)
+
+        # Next sequence address set after the sequence was added.
+        seq0.next_sequence_address = seq1.address
+
+        self.assertEqual(0x1000 << 8 | 0x01, container.get_next_address(0x1000 << 8 | 0x00))
+        self.assertEqual(0x1002 << 8 | 0x00, container.get_next_address(0x1000 << 8 | 0x01))
+        self.assertEqual(None, container.get_next_address(0x1002 << 8 | 0x00))
+
+        self.assertRaises(Exception, container.add, seq1)
+        self.assertEqual(3, len(list(container)))
+
+    def __build_sequence(self, address, instrs):
+        sequence = ReilSequence()
+
+        for index, instr in enumerate(self._parser.parse(instrs)):
+            instr.address = address << 8 | index
+
+            sequence.append(instr)
+
+        return sequence
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
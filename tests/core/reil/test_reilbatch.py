@@ -0,0 +1,127 @@
+# Copyright (c) 2014, Fundacion Dr. Manuel Sadosky
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+import barf.core.reil.reilbatch
+
+from barf.arch import ARCH_X86_MODE_32
+from barf.arch.x86.x86base import X86ArchitectureInformation
+from barf.arch.x86.x86parser import X86Parser
+from barf.arch.x86.x86translator import X86Translator
+from barf.core.reil import ReilBatchEmulator
+from barf.core.reil import ReilEmulator
+
+
+class ReilBatchEmulatorTests(unittest.TestCase):
+
+    def setUp(self):
+        self._arch_info = X86ArchitectureInformation(ARCH_X86_MODE_32)
+
+        self._emulator = ReilBatchEmulator(self._arch_info)
+
+        self._asm_parser = X86Parser()
+        self._translator = X86Translator()
+
+        self._contexts = []
+
+        for value in [0x0, 0x1, 0x7fffffff, 0x80000000, 0xffffffff, 0x12345678]:
+            self._contexts += [{
+                "eax" : value,
+                "ebx" : (value * 3) & 0xffffffff,
+                "ecx" : 0x5,
+                "edx" : 0x0,
+                "esp" : 0x1000,
+                "eflags" : 0x202,
+            }]
+
+    def test_execute_lite(self):
+        instrs = self.__translate(["add eax, ebx", "shl ebx, cl", "sar eax, 3", "mov [esp], eax", "xchg ah, bl"])
+
+        results = self._emulator.execute_lite(instrs, self._contexts)
+
+        self.assertEqual(len(results), len(self._contexts))
+
+        for context, (regs, mem) in zip(self._contexts, results):
+            emulator = ReilEmulator(self._arch_info)
+
+            regs_expected, mem_expected = emulator.execute_lite(instrs, context=dict(context))
+
+            self.assertEqual(regs, regs_expected)
+            self.assertEqual(mem.read(0x1000, 4), mem_expected.read(0x1000, 4))
+            self.assertEqual(mem.get_write_count(), mem_expected.get_write_count())
+
+        self.assertEqual(self._emulator.read_registers, emulator.read_registers)
+        self.assertEqual(self._emulator.written_registers, emulator.written_registers)
+
+    def test_execute_lite_failed_lanes(self):
+        instrs = self.__translate(["div eax"])
+
+        results = self._emulator.execute_lite(instrs, self._contexts)
+
+        self.assertEqual(results[0], None)
+
+        for context, (regs, _) in zip(self._contexts[1:], results[1:]):
+            self.assertEqual(regs["eax"], 0x1)
+            self.assertEqual(regs["edx"], 0x0)
+
+    def test_execute_lite_no_numpy(self):
+        numpy = barf.core.reil.reilbatch.numpy
+
+        instrs = self.__translate(["add eax, ebx", "mov [esp], eax"])
+
+        try:
+            results_batch = self._emulator.execute_lite(instrs, self._contexts)
+
+            barf.core.reil.reilbatch.numpy = None
+
+            results_lanes = self._emulator.execute_lite(instrs, self._contexts)
+        finally:
+            barf.core.reil.reilbatch.numpy = numpy
+
+        for (regs_batch, mem_batch), (regs_lanes, mem_lanes) in zip(results_batch, results_lanes):
+            self.assertEqual(regs_batch, regs_lanes)
+            self.assertEqual(mem_batch.read(0x1000, 4), mem_lanes.read(0x1000, 4))
+
+    # Auxiliary methods
+    # ======================================================================== #
+    def __translate(self, asm_instrs):
+        instrs = []
+
+        for index, asm in enumerate(asm_instrs):
+            asm_instr = self._asm_parser.parse(asm)
+            asm_instr.address = 0xdeadbeef + index
+            asm_instr.size = 1
+
+            instrs += self._translator.translate(asm_instr)
+
+        return instrs
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
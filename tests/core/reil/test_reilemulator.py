@@ -22,6 +22,7 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import random
 import unittest
 
 from barf.arch import ARCH_X86_MODE_32
@@ -109,6 +110,101 @@ class ReilMemoryTests(unittest.TestCase):
         self.assertEqual(addr0, addrs[0])
         self.assertEqual(addr1, addrs[1])
 
+    def test_write_read_cross_page(self):
+        address_size = 32
+        memory = ReilMemory(address_size)
+
+        addr = 0x00001ffd
+        write_val = 0xdeadbeefcafecafe
+
+        memory.write(addr, 64 / 8, write_val)
+        read_val = memory.read(addr, 64 / 8)
+
+        self.assertEqual(write_val, read_val)
+        self.assertEqual(0xfe, memory.read(addr, 1))
+        self.assertEqual(0xdeadbeef, memory.read(addr + 4, 4))
+
+    def test_write_read_wide(self):
+        address_size = 32
+        memory = ReilMemory(address_size)
+
+        addr = 0x00001000
+        write_val = 0x00112233445566778899aabbccddeeff
+
+        memory.write(addr, 128 / 8, write_val)
+        read_val = memory.read(addr, 128 / 8)
+
+        self.assertEqual(write_val, read_val)
+        self.assertEqual(0xccddeeff, memory.read(addr, 4))
+
+    def test_try_read(self):
+        address_size = 32
+        memory = ReilMemoryEx(address_size)
+
+        addr = 0x00001000
+
+        self.assertEqual((False, None), memory.try_read(addr, 4))
+        self.assertEqual((False, None), memory.try_read_prev(addr, 4))
+
+        memory.write(addr, 32 / 8, 0xdeadbeef)
+        memory.write(addr, 16 / 8, 0x1234)
+
+        self.assertEqual((True, 0xdead1234), memory.try_read(addr, 4))
+        self.assertEqual((True, 0xbeef), memory.try_read_prev(addr, 2))
+        self.assertEqual((False, None), memory.try_read_prev(addr, 4))
+        self.assertEqual((False, None), memory.try_read(addr, 8))
+        self.assertEqual(2, memory.get_write_count())
+        self.assertEqual(range(addr, addr + 4), memory.get_addresses())
+
+    def test_write_read_region(self):
+        address_size = 32
+        memory = ReilMemoryEx(address_size)
+
+        addr = 0x00000ff0
+        data = bytearray(xrange(0x00, 0xff)) * 40
+
+        memory.write_region(addr, data)
+
+        self.assertEqual(data, memory.read_region(addr, len(data)))
+        self.assertEqual(0x03020100, memory.read(addr, 4))
+        self.assertEqual((True, 0x13121110), memory.try_read(addr + 0x10, 4))
+        self.assertEqual((False, None), memory.try_read(addr + len(data) - 2, 4))
+        self.assertEqual(1, memory.get_write_count())
+
+    def test_read_string(self):
+        address_size = 32
+        memory = ReilMemoryEx(address_size)
+
+        addr = 0x00001ff0
+
+        memory.write_region(addr, bytearray(b"barf\x00"))
+
+        self.assertEqual(bytearray(b"ba"), memory.read_string(addr, 2))
+
+        # Bytes (and pages) past the terminator are not accessed.
+        state = random.getstate()
+
+        self.assertEqual(bytearray(b"barf"), memory.read_string(addr, 1024))
+        self.assertEqual(random.getstate(), state)
+        self.assertEqual(True, memory.is_valid(addr, 5))
+        self.assertEqual(False, memory.is_valid(addr + 5))
+
+    def test_uninitialized_read(self):
+        address_size = 32
+
+        # Uninitialized memory is filled from the random module, so it
+        # can be reproduced by seeding it.
+        values = []
+
+        for _ in xrange(2):
+            random.seed(0x1234)
+
+            memory = ReilMemory(address_size)
+
+            values.append([memory.read(addr, 8) for addr in [0x00001000, 0x00002ffc, 0xfffffff8]])
+
+        self.assertEqual(values[0], values[1])
+
 
 class ReilEmulatorTests(unittest.TestCase):
 
@@ -290,6 +386,190 @@ class ReilEmulatorTests(unittest.TestCase):
 
         self.assertRaises(ReilCpuInvalidAddressError, self._emulator.execute, reil_instrs, start=0xdeadbef0 << 8, registers=regs_initial)
 
+    def test_snapshot_restore(self):
+        asm_instrs  = self._asm_parser.parse("mov [eax], ebx")
+
+        self.__set_address(0xdeadbeef, [asm_instrs])
+
+        reil_instrs = self._translator.translate(asm_instrs)
+
+        regs_initial = {
+            "eax" : 0x00001000,
+            "ebx" : 0x12345678,
+        }
+
+        self._emulator.registers = dict(regs_initial)
+        self._emulator.write_memory(0x00001000, 4, 0xdeadbeef)
+        self._emulator.set_register_taint("ebx", True)
+
+        snapshot = self._emulator.snapshot()
+
+        for _ in xrange(2):
+            self._emulator.execute_lite(reil_instrs)
+
+            self.assertEqual(self._emulator.read_memory(0x00001000, 4), 0x12345678)
+            self.assertEqual(self._emulator.get_memory_taint(0x00001000, 4), True)
+            self.assertTrue("ebx" in self._emulator.read_registers)
+
+            self._emulator.restore(snapshot)
+
+            self.assertEqual(self._emulator.read_memory(0x00001000, 4), 0xdeadbeef)
+            self.assertEqual(self._emulator.get_memory_taint(0x00001000, 4), False)
+            self.assertEqual(self._emulator.get_register_taint("ebx"), True)
+            self.assertEqual(self._emulator.registers, regs_initial)
+            self.assertEqual(len(self._emulator.read_registers), 0)
+            self.assertEqual(self._emulator.memory.get_write_count(), 1)
+
+    def test_register_alias_access(self):
+        asm_instrs  = self._asm_parser.parse("mov ah, bl")
+
+        self.__set_address(0xdeadbeef, [asm_instrs])
+
+        reil_instrs = self._translator.translate(asm_instrs)
+
+        self._emulator.registers = {
+            "eax" : 0x12345678,
+            "ebx" : 0x000000ab,
+        }
+
+        for _ in xrange(2):
+            self._emulator.execute_lite(reil_instrs)
+
+            self.assertEqual(self._emulator.registers["eax"], 0x1234ab78)
+            self.assertEqual(self._emulator.registers["ebx"], 0x000000ab)
+
+        self.assertTrue("ah" in self._emulator.written_registers)
+        self.assertTrue("bl" in self._emulator.read_registers)
+
+    def test_execute_sequence(self):
+        asm_instrs = [self._asm_parser.parse(asm) for asm in [
+            "add eax, ebx",
+            "shl eax, cl",
+            "mov [eax], bh",
+            "rep stosd",
+        ]]
+
+        self.__set_address(0xdeadbeef, asm_instrs)
+
+        for asm_instr in asm_instrs:
+            asm_instr.size = 1
+
+        regs_initial = {
+            "eax" : 0x00000100,
+            "ebx" : 0x00001200,
+            "ecx" : 0x00000003,
+            "edi" : 0x00002000,
+            "eflags" : 0x00000202,
+        }
+
+        results = []
+
+        for jit in [False, True]:
+            self._emulator.reset()
+            self._emulator.jit = jit
+            self._emulator.registers = dict(regs_initial)
+
+            next_addrs = []
+
+            for asm_instr in asm_instrs:
+                next_addrs += [self._emulator.execute_sequence(self._translator.translate(asm_instr))]
+
+                self.assertEqual(len(self._emulator.temporal_registers), 0)
+
+            results += [(
+                next_addrs,
+                self._emulator.registers,
+                self._emulator.read_memory(0x00002000, 12),
+                self._emulator.read_memory(0x00009800, 1),
+                self._emulator.read_registers,
+                self._emulator.written_registers,
+            )]
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[1][0], [None, None, None, (0xdeadbeef + 4) << 8])
+        self.assertEqual(results[1][1]["eax"], 0x00009800)
+        self.assertEqual(results[1][1]["ecx"], 0x00000000)
+        self.assertEqual(results[1][2], 0x000098000000980000009800)
+        self.assertEqual(results[1][3], 0x12)
+
+    def test_execute_sequence_invalidate(self):
+        asm_instr = self._asm_parser.parse("add eax, ebx")
+
+        self.__set_address(0xdeadbeef, [asm_instr])
+
+        self._emulator.registers = {
+            "eax" : 0x1,
+            "ebx" : 0x2,
+        }
+
+        self._emulator.execute_sequence(self._translator.translate(asm_instr))
+
+        self.assertEqual(self._emulator.registers["eax"], 0x3)
+
+        # Same address, different code.
+        asm_instr = self._asm_parser.parse("sub eax, ebx")
+
+        self.__set_address(0xdeadbeef, [asm_instr])
+
+        self._emulator.invalidate_code(0xdeadbeef << 8)
+        self._emulator.execute_sequence(self._translator.translate(asm_instr))
+
+        self.assertEqual(self._emulator.registers["eax"], 0x1)
+
+    def test_execute_sequence_memory(self):
+        asm_instr = self._asm_parser.parse("mov eax, [0x1000]")
+
+        self.__set_address(0xdeadbeef, [asm_instr])
+
+        reil_instrs = self._translator.translate(asm_instr)
+
+        results = []
+
+        for jit in [False, True]:
+            self._emulator.reset()
+            self._emulator.jit = jit
+
+            values = []
+
+            for value in [0x11111111, 0x22222222]:
+                memory = ReilMemoryEx(self._arch_info.address_size)
+                memory.write(0x1000, 4, value)
+
+                # Code compiled for the previous memory must not be
+                # reused.
+                self._emulator.cpu.memory = memory
+                self._emulator.execute_sequence(reil_instrs)
+
+                values += [self._emulator.registers["eax"]]
+
+            results += [values]
+
+        self.assertEqual(results[0], [0x11111111, 0x22222222])
+        self.assertEqual(results[1], [0x11111111, 0x22222222])
+
+    def test_temporal_registers(self):
+        asm_instrs  = self._asm_parser.parse("add eax, ebx")
+
+        self.__set_address(0xdeadbeef, [asm_instrs])
+
+        reil_instrs = self._translator.translate(asm_instrs)
+
+        self._emulator.registers = {
+            "eax" : 0x1,
+            "ebx" : 0x2,
+        }
+
+        self._emulator.execute_lite(reil_instrs)
+
+        self.assertEqual(self._emulator.registers["eax"], 0x3)
+        self.assertTrue(len(self._emulator.temporal_registers) > 0)
+        self.assertFalse(any(name in self._emulator.registers for name in self._emulator.temporal_registers))
+
+        self._emulator.clear_temporal_registers()
+
+        self.assertEqual(len(self._emulator.temporal_registers), 0)
+        self.assertEqual(self._emulator.registers["eax"], 0x3)
+
     # Auxiliary methods
     # ======================================================================== #
     def __set_address(self, address, asm_instrs):
@@ -421,6 +701,71 @@ class ReilEmulatorTaintTests(unittest.TestCase):
 
         self.assertEqual(self._emulator.get_register_taint("eax"), True)
 
+    def test_taint_disabled(self):
+        asm_instrs  = self._asm_parser.parse("add eax, ebx")
+
+        self.__set_address(0xdeadbeef, [asm_instrs])
+
+        reil_instrs = self._translator.translate(asm_instrs)
+
+        self.assertEqual(self._emulator.taint_enabled, False)
+
+        self._emulator.execute_lite(reil_instrs, context={"eax" : 0x1, "ebx" : 0x2})
+
+        self.assertEqual(self._emulator.get_register_taint("eax"), False)
+
+        # Tainting a location enables taint propagation.
+        self._emulator.set_register_taint("ebx", True)
+
+        self.assertEqual(self._emulator.taint_enabled, True)
+
+        self._emulator.disable_taint()
+        self._emulator.execute_sequence(reil_instrs)
+
+        self.assertEqual(self._emulator.get_register_taint("eax"), False)
+
+        self._emulator.enable_taint()
+        self._emulator.execute_sequence(reil_instrs)
+
+        self.assertEqual(self._emulator.get_register_taint("eax"), True)
+        self.assertEqual(self._emulator.get_register_taint("al"), True)
+
+    def test_taint_reset(self):
+        self._emulator.set_memory_taint(0x1000, 4, True)
+
+        self.assertEqual(self._emulator.taint_enabled, True)
+
+        # Nothing is tainted after a reset, so taint propagation is
+        # disabled again.
+        self._emulator.reset_tainter()
+
+        self.assertEqual(self._emulator.taint_enabled, False)
+        self.assertEqual(self._emulator.get_memory_taint(0x1000, 4), False)
+
+        # Unless it was enabled explicitly.
+        self._emulator.enable_taint()
+        self._emulator.set_register_taint("eax", True)
+        self._emulator.reset_tainter()
+
+        self.assertEqual(self._emulator.taint_enabled, True)
+        self.assertEqual(self._emulator.get_register_taint("eax"), False)
+
+    def test_taint_memory_cross_page(self):
+        self._emulator.set_memory_taint(0x1ffe, 4, True)
+
+        self.assertEqual(self._emulator.get_memory_taint(0x1ffc, 2), False)
+        self.assertEqual(self._emulator.get_memory_taint(0x1ffd, 2), True)
+        self.assertEqual(self._emulator.get_memory_taint(0x2001, 2), True)
+        self.assertEqual(self._emulator.get_memory_taint(0x2002, 2), False)
+
+        self._emulator.clear_memory_taint(0x1fff, 2)
+
+        self.assertEqual(self._emulator.get_memory_taint(0x1ffe, 1), True)
+        self.assertEqual(self._emulator.get_memory_taint(0x1fff, 2), False)
+        self.assertEqual(self._emulator.get_memory_taint(0x2001, 1), True)
+
+    # Auxiliary methods
+    # ======================================================================== #
     def __set_address(self, address, asm_instrs):
         addr = address
 
@@ -0,0 +1,161 @@
+# Copyright (c) 2014, Fundacion Dr. Manuel Sadosky
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import shutil
+import tempfile
+import unittest
+
+from barf.core.smt.smtcache import SmtQueryCache
+from barf.core.smt.smtcache import canonical_form
+from barf.core.smt.smtsolver import Z3Solver as SmtSolver
+from barf.core.smt.smtsymbol import BitVec
+
+
+class SmtQueryCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def test_canonical_form(self):
+        x, y, a, b = [BitVec(32, name) for name in ["x", "y", "a", "b"]]
+
+        # Formulas that only differ in variable names have the same
+        # canonical form.
+        self.assertEqual(canonical_form((x == y + 1).node, {}), canonical_form((a == b + 1).node, {}))
+        self.assertNotEqual(canonical_form((x == y + 1).node, {}), canonical_form((a == a + 1).node, {}))
+        self.assertNotEqual(canonical_form((x == y + 1).node, {}), canonical_form((b == a - 1).node, {}))
+
+        # Names are shared between constraints.
+        names = {}
+
+        canonical_form((x == 1).node, names)
+
+        self.assertEqual(canonical_form((y == x).node, names), canonical_form((b == a).node, {"a": "v0"}))
+
+    def test_lru(self):
+        cache = SmtQueryCache(size=2)
+
+        cache.put(("z3", "1", "q1"), "sat", {})
+        cache.put(("z3", "1", "q2"), "unsat", {})
+
+        self.assertEqual(cache.get(("z3", "1", "q1")), ("sat", {}))
+
+        cache.put(("z3", "1", "q3"), "sat", {})
+
+        self.assertEqual(cache.get(("z3", "1", "q2")), None)
+        self.assertEqual(cache.get(("z3", "1", "q1")), ("sat", {}))
+        self.assertEqual(cache.get(("z3", "2", "q1")), None)
+
+        self.assertEqual(cache.stats["hits"], 2)
+        self.assertEqual(cache.stats["misses"], 2)
+
+    def test_disk(self):
+        filename = os.path.join(self._dir, "cache.db")
+
+        cache = SmtQueryCache(filename=filename)
+        cache.put(("z3", "1", "q1"), "sat", {"e1": 42})
+        cache.close()
+
+        cache = SmtQueryCache(filename=filename)
+
+        self.assertEqual(cache.get(("z3", "1", "q1")), ("sat", {"e1": 42}))
+        self.assertEqual(cache.get(("z3", "1", "q1")), ("sat", {"e1": 42}))
+        self.assertEqual(cache.get(("cvc4", "1", "q1")), None)
+
+        self.assertEqual(cache.stats["disk_hits"], 1)
+
+        cache.close()
+
+
+class SmtSolverCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self._cache = SmtQueryCache()
+
+    def test_query(self):
+        for suffix in ["1", "2"]:
+            solver = SmtSolver(cache=self._cache)
+
+            x = BitVec(32, "x" + suffix)
+            y = BitVec(32, "y" + suffix)
+
+            solver.declare_fun(x.value, x)
+            solver.declare_fun(y.value, y)
+
+            solver.add(x == y + 1)
+            solver.add(y.ult(5))
+
+            self.assertEqual(solver.check(), "sat")
+
+            solver.push()
+            solver.add(x == 0)
+
+            self.assertEqual(solver.check(), "unsat")
+
+            solver.pop()
+
+            self.assertEqual(solver.check(), "sat")
+
+        # Only the first two checks of the first solver reach the solver.
+        self.assertEqual(self._cache.stats["hits"], 4)
+        self.assertEqual(self._cache.stats["misses"], 2)
+
+    def test_model(self):
+        values = []
+
+        for suffix in ["1", "2"]:
+            solver = SmtSolver(cache=self._cache)
+
+            x = BitVec(32, "x" + suffix)
+            y = BitVec(32, "y" + suffix)
+            z = BitVec(32, "z" + suffix)
+
+            solver.declare_fun(x.value, x)
+            solver.declare_fun(y.value, y)
+            solver.declare_fun(z.value, z)
+
+            solver.add(x + y + z == 10)
+
+            self.assertEqual(solver.check(), "sat")
+
+            # The first solver asks for x, the second one also for y and
+            # z, which are not in the cached model.
+            values.append(solver.get_value(x))
+
+            if suffix == "2":
+                self.assertEqual(values[0], values[1])
+                self.assertEqual((solver.get_value(x) + solver.get_value(y) + solver.get_value(z)) & 0xffffffff, 10)
+
+        self.assertEqual(self._cache.stats["hits"], 1)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
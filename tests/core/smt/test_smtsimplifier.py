@@ -0,0 +1,153 @@
+# Copyright (c) 2014, Fundacion Dr. Manuel Sadosky
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import unittest
+
+from barf.core.smt.smtfunction import concat
+from barf.core.smt.smtfunction import extract
+from barf.core.smt.smtfunction import ite
+from barf.core.smt.smtfunction import zero_extend
+from barf.core.smt.smtsimplifier import SmtSimplifier
+from barf.core.smt.smtsolver import Z3Solver as SmtSolver
+from barf.core.smt.smtsymbol import BitVec
+from barf.core.smt.smtsymbol import Bool
+from barf.core.smt.smtsymbol import Constant
+from barf.core.smt.smtsymbol import serialize
+
+
+class SmtSimplifierTests(unittest.TestCase):
+
+    def setUp(self):
+        self._simplifier = SmtSimplifier()
+
+    def test_constant_folding(self):
+        x = BitVec(32, "x")
+        c = Constant(32, 2)
+
+        self.assertEqual(self.__simplify(c + 3), "#x00000005")
+        self.assertEqual(self.__simplify((c * 4) - 1), "#x00000007")
+        self.assertEqual(self.__simplify(x + (c - 2)), "x")
+        self.assertEqual(self.__simplify(c.ult(1)), "false")
+        self.assertEqual(self.__simplify(zero_extend(extract(c, 0, 8), 64)), "#x0000000000000002")
+
+    def test_identities(self):
+        x = BitVec(32, "x")
+        y = BitVec(32, "y")
+        b = Bool("b")
+
+        self.assertEqual(self.__simplify(x + 0), "x")
+        self.assertEqual(self.__simplify(x & 0), "#x00000000")
+        self.assertEqual(self.__simplify(x | 0xffffffff), "#xffffffff")
+        self.assertEqual(self.__simplify(x ^ x), "#x00000000")
+        self.assertEqual(self.__simplify(~~x), "x")
+        self.assertEqual(self.__simplify(ite(32, b, y, y)), "y")
+        self.assertEqual(self.__simplify(ite(32, x == x, x, y)), "x")
+        self.assertEqual(self.__simplify(b & True), "b")
+        self.assertEqual(self.__simplify(b | True), "true")
+
+    def test_extract_concat(self):
+        x = BitVec(32, "x")
+        y = BitVec(8, "y")
+
+        self.assertEqual(self.__simplify(extract(extract(x, 8, 16), 4, 8)), "((_ extract 19 12) x)")
+        self.assertEqual(self.__simplify(extract(zero_extend(y, 32), 0, 8)), "y")
+        self.assertEqual(self.__simplify(extract(zero_extend(y, 32), 8, 8)), "#x00")
+        self.assertEqual(self.__simplify(extract(concat(8, y, extract(x, 0, 8)), 8, 8)), "y")
+
+        # Adjacent extracts of the same expression.
+        x_bytes = [extract(x, i, 8) for i in reversed(xrange(0, 32, 8))]
+
+        self.assertEqual(self.__simplify(concat(8, *x_bytes)), "x")
+        self.assertEqual(self.__simplify(concat(8, Constant(8, 0), y)), "((_ zero_extend 8) y)")
+
+    def test_stats(self):
+        x = BitVec(32, "x")
+
+        self._simplifier.add((x + 0 == x * 1).node, {"x": x})
+
+        stats = self._simplifier.stats
+
+        self.assertEqual(stats["constraints"], 1)
+        self.assertEqual(stats["nodes_in"], 6)
+        self.assertEqual(stats["nodes_out"], 1)
+
+    def __simplify(self, expr):
+        return serialize(self._simplifier.simplify(expr.node))
+
+
+class SmtSolverSimplifyTests(unittest.TestCase):
+
+    def setUp(self):
+        self._solver = SmtSolver()
+
+    def test_dead_definitions(self):
+        x = BitVec(32, "x")
+        y = BitVec(32, "y")
+        z = BitVec(32, "z")
+
+        for name, var in [("x", x), ("y", y), ("z", z)]:
+            self._solver.declare_fun(name, var)
+
+        # *y* is not used anywhere else, so its definition is held back.
+        self._solver.add(y == x + 1)
+        self._solver.add(z == x * 2)
+        self._solver.add(z == 6)
+
+        stats = self._solver.simplifier_stats
+
+        self.assertEqual(stats["held_back"], 2)
+        self.assertEqual(stats["restored"], 1)
+
+        self.assertEqual(self._solver.check(), "sat")
+
+        # Values come from a model that includes all definitions.
+        self.assertEqual(self._solver.get_value(x) + 1, self._solver.get_value(y))
+
+    def test_dead_definitions_push_pop(self):
+        x = BitVec(32, "x")
+        y = BitVec(32, "y")
+
+        self._solver.declare_fun("x", x)
+        self._solver.declare_fun("y", y)
+
+        self._solver.add(y == x + 1)
+
+        self._solver.push()
+        self._solver.add(y == x)
+        self.assertEqual(self._solver.check(), "unsat")
+        self._solver.pop()
+
+        self._solver.add(x == 1)
+
+        self.assertEqual(self._solver.check(), "sat")
+        self.assertEqual(self._solver.get_value(y), 2)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
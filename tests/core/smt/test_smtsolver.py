@@ -25,10 +25,15 @@
 import unittest
 
 from barf.core.reil import ReilParser
+from barf.core.smt.smtfunction import concat
+from barf.core.smt.smtfunction import extract
+from barf.core.smt.smtfunction import sign_extend
 from barf.core.smt.smtsymbol import BitVec
 from barf.core.smt.smtsymbol import Bool
 from barf.core.smt.smtsolver import Z3Solver as SmtSolver
 # from barf.core.smt.smtsolver import CVC4Solver as SmtSolver
+from barf.core.smt.smtsolver import Z3PySolver
+from barf.core.smt.smtsolver import z3
 
 
 class SmtSolverBitVecTests(unittest.TestCase):
@@ -468,6 +473,116 @@ class SmtSolverBitVecTests(unittest.TestCase):
         # TODO Implement.
         pass
 
+    # Shared subterms.
+    def test_shared(self):
+        x = BitVec(32, "x")
+        y = BitVec(32, "y")
+
+        self._solver.declare_fun("x", x)
+        self._solver.declare_fun("y", y)
+
+        z = x + 1
+
+        for _ in xrange(8):
+            z = z * z
+
+        self._solver.add(z == y)
+        self._solver.add(x == 2)
+
+        self.assertEqual(self._solver.check(), "sat")
+
+        self.assertEqual(self._solver.get_value(z), pow(3, 2 ** 8, 2 ** 32))
+        self.assertEqual(self._solver.get_value(y), pow(3, 2 ** 8, 2 ** 32))
+
+
+class SmtSolverScopeTests(unittest.TestCase):
+
+    def setUp(self):
+        self._solver = SmtSolver()
+
+    def test_push_pop(self):
+        x = BitVec(32, "x")
+
+        self._solver.declare_fun("x", x)
+        self._solver.add(x == 1)
+
+        self._solver.push()
+
+        y = BitVec(32, "y")
+
+        self._solver.declare_fun("y", y)
+        self._solver.add(x == y)
+        self._solver.add(y == 2)
+
+        self.assertEqual(self._solver.check(), "unsat")
+
+        self._solver.pop()
+
+        # Declarations and assertions of the scope are gone.
+        self.assertEqual(self._solver.declarations.keys(), ["x"])
+        self.assertEqual(self._solver.check(), "sat")
+        self.assertEqual(self._solver.get_value(x), 1)
+
+        self._solver.declare_fun("y", y)
+        self._solver.add(y == 2)
+
+        self.assertEqual(self._solver.check(), "sat")
+
+    def test_reset(self):
+        process = self._solver._process
+
+        x = BitVec(32, "x")
+
+        self._solver.declare_fun("x", x)
+        self._solver.add(x == 1)
+        self._solver.add(x == 2)
+
+        self.assertEqual(self._solver.check(), "unsat")
+
+        self._solver.reset()
+
+        # The solver process is reused.
+        self.assertTrue(self._solver._process is process)
+
+        self.assertEqual(self._solver.declarations, {})
+
+        self._solver.declare_fun("x", x)
+        self._solver.add(x == 2)
+
+        self.assertEqual(self._solver.check(), "sat")
+        self.assertEqual(self._solver.get_value(x), 2)
+
+
+@unittest.skipIf(z3 is None, "z3 Python bindings are not installed")
+class Z3PySolverBitVecTests(SmtSolverBitVecTests):
+
+    def setUp(self):
+        super(Z3PySolverBitVecTests, self).setUp()
+
+        self._solver = Z3PySolver()
+
+    def test_extend_extract(self):
+        x = BitVec(8, "x")
+        y = BitVec(32, "y")
+
+        self._solver.declare_fun("x", x)
+        self._solver.declare_fun("y", y)
+
+        self._solver.add(y == sign_extend(x, 32))
+        self._solver.add(extract(y, 24, 8) == 0xff)
+        self._solver.add(extract(y, 0, 8) == 0x80)
+
+        self.assertEqual(self._solver.check(), "sat")
+        self.assertEqual(self._solver.get_value(x), 0x80)
+        self.assertEqual(self._solver.get_value(concat(8, extract(y, 24, 8), x)), 0xff80)
+
+
+@unittest.skipIf(z3 is None, "z3 Python bindings are not installed")
+class Z3PySolverScopeTests(SmtSolverScopeTests):
+
+    def setUp(self):
+        self._solver = Z3PySolver()
+
 
 def main():
     unittest.main()
@@ -382,6 +382,35 @@ class BitVecArrayTests(unittest.TestCase):
         self.assertEqual(c.value, "(select a #x00000001)")
 
 
+class NodeTests(unittest.TestCase):
+
+    def test_interning(self):
+        x = BitVec(32, "x")
+        y = BitVec(32, "y")
+
+        self.assertTrue((x + y).node is (x + y).node)
+        self.assertTrue((x + y).node.children[0] is x.node)
+        self.assertFalse((x + y).node is (y + x).node)
+
+    def test_serialize_shared(self):
+        x = BitVec(32, "x")
+        z = x + 1
+
+        for _ in xrange(8):
+            z = z * z
+
+        # Large subterms are written once.
+        s = str(z == 0)
+
+        self.assertTrue(s.startswith("(let ((?x0 "))
+        self.assertTrue(len(s) < 4096)
+        self.assertEqual(s.count("("), s.count(")"))
+
+        # Small terms and the value are written in full.
+        self.assertEqual(str(x * (x + 1)), "(bvmul x (bvadd x #x00000001))")
+        self.assertEqual(z.value.count("bvadd"), 2 ** 8)
+
+
 def main():
     unittest.main()
 